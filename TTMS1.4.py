@@ -10,6 +10,7 @@ from tkcalendar import DateEntry
 from fpdf import FPDF
 import re
 import shutil
+from collections import Counter
 import pandas as pd
 import os
 from matplotlib import pyplot as plt
@@ -24,25 +25,32 @@ from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolb
 from PIL import Image, ImageTk
 import matplotlib.pyplot as plt
 import seaborn as sns
+from ttms_workbook import WorkbookEngine, row_key
 # Load the workbook
 # At the start of your program
 WORKBOOK_PATH = "TTMS.xlsx"
 
+def report_workbook_conflict(conflict_path):
+    messagebox.showwarning(
+        "Workbook Changed",
+        f"{WORKBOOK_PATH} was saved by another TTMS instance. Your latest changes were "
+        f"written to {conflict_path} and the screens now show the other instance's data.")
+
+
+def report_workbook_error(error):
+    messagebox.showerror("Error", f"Failed to save workbook: {error}")
+
+
+# Parsed once and shared by every screen; see ttms_workbook
+workbook_engine = WorkbookEngine(WORKBOOK_PATH, on_conflict=report_workbook_conflict,
+                                 on_error=report_workbook_error)
+
 def initialize_workbook():
     """
     Initialize the workbook by checking if it exists, creating it if needed,
     and ensuring all required sheets are present.
     """
     try:
-        # Try to load existing workbook
-        if os.path.exists(WORKBOOK_PATH):
-            workbook = openpyxl.load_workbook(WORKBOOK_PATH)
-        else:
-            # Create new workbook if it doesn't exist
-            workbook = openpyxl.Workbook()
-            # Remove default sheet
-            workbook.remove(workbook.active)
-
         # Required sheets and their headers
         required_sheets = {
             "Users": ["Username", "Password", "Role", "Full Name", "Contact", "Address", "CNIC", "Email"],
@@ -59,6 +67,20 @@ def initialize_workbook():
             "LeaveManagement":["Driver ID", "Start Date", "End Date", "Leave Type", "Status", "Reason"]
         }
 
+        # A complete existing file is not parsed here; screens that edit it load it
+        if os.path.exists(WORKBOOK_PATH) and set(required_sheets) <= set(workbook_engine.sheet_names()):
+            return workbook_engine
+
+        # Try to load existing workbook
+        if os.path.exists(WORKBOOK_PATH):
+            workbook = workbook_engine.load()
+        else:
+            # Create new workbook if it doesn't exist
+            workbook = openpyxl.Workbook()
+            # Remove default sheet
+            workbook.remove(workbook.active)
+            workbook_engine.adopt(workbook)
+
         # Create or verify each required sheet
         for sheet_name, headers in required_sheets.items():
             if sheet_name not in workbook.sheetnames:
@@ -72,26 +94,21 @@ def initialize_workbook():
                     sheet.append(["admin", "admin123", "Admin"])
 
         # Save the workbook
-        workbook.save(WORKBOOK_PATH)
-        return workbook
+        workbook_engine.save()
+        return workbook_engine
 
     except Exception as e:
         messagebox.showerror("Error", f"Failed to initialize workbook: {e}")
         return None
-workbook = initialize_workbook()
-if workbook is None:
+if initialize_workbook() is None:
     sys.exit(1)  # Exit if workbook initialization fails
 
 def authenticate_user(username, password):
-    # Load the workbook and Users sheet
+    # Look the user up without parsing the whole workbook at login
     try:
-        workbook = openpyxl.load_workbook(WORKBOOK_PATH)
-        sheet = workbook["Users"]
-
-        # Search for user
-        for row in sheet.iter_rows(min_row=2, values_only=True):
-            if row[0] == username and row[1] == password:
-                return row[2]# Return the role if authentication succeeds
+        user = workbook_engine.lookup("Users", username)
+        if user is not None and user[1] == password:
+            return user[2]  # Return the role if authentication succeeds
         return None
     except Exception as e:
         messagebox.showerror("Error", f"Failed to load workbook: {e}")
@@ -106,11 +123,9 @@ def login_window(theme_color="#1a237e", window_size=(400, 500)):
 
         if username and password:
             role = authenticate_user(username, password)
-            workbook = openpyxl.load_workbook(WORKBOOK_PATH)
-            sheet = workbook["Users"]
-            for row in sheet.iter_rows(min_row=2, values_only=True):
-                if row[0] == username:
-                    fullname=row[3]
+            user = workbook_engine.lookup("Users", username)
+            if user is not None and len(user) > 3:
+                fullname = user[3]
 
             if role:
                 messagebox.showinfo("Success", f"Welcome {username}! ✨")
@@ -123,6 +138,7 @@ def login_window(theme_color="#1a237e", window_size=(400, 500)):
             messagebox.showwarning("Warning", "Please fill all fields ⚠️")
 
     root = tk.Tk()
+    workbook_engine.attach(root)  # pending saves flush on this window's loop
     root.title("Login")
     def resource_path(relative_path):
         """ Get absolute path to resource, works for dev and for PyInstaller """
@@ -303,6 +319,7 @@ def admin_dashboard(user_type="Admin",username=None, login_window=None):
         return frame
 
     root = tk.Tk()
+    workbook_engine.attach(root)
     root.title("TruckFlow Solutions - Admin Dashboard")
     root.geometry("1000x600")
     root.minsize(1024, 600)
@@ -470,6 +487,7 @@ def manager_dashboard(user_type="Manager",username=None, login_window=None):
         return frame
 
     root = tk.Tk()
+    workbook_engine.attach(root)
     root.title("TruckFlow Solutions - Manager Dashboard")
     root.geometry("1000x600")
     root.minsize(1024, 600)
@@ -613,6 +631,7 @@ def accountant_dashboard(user_type="Accountant",username=None, login_window=None
         return frame
 
     root = tk.Tk()
+    workbook_engine.attach(root)
     root.title("TruckFlow Solutions - Accountant Dashboard")
     root.geometry("1000x600")
     root.minsize(1024, 600)
@@ -752,6 +771,7 @@ def dispatcher_dashboard(user_type="Dispatcher",username=None, login_window=None
         return frame
 
     root = tk.Tk()
+    workbook_engine.attach(root)
     root.title("TruckFlow Solutions - Dispatcher Dashboard")
     root.geometry("1000x600")
     root.minsize(1024, 600)
@@ -868,9 +888,7 @@ def driver_management_gui(user_role=""):
     def load_drivers():
         """Load driver data from the Excel sheet."""
         try:
-            workbook = openpyxl.load_workbook(WORKBOOK_PATH)
-            sheet = workbook["Drivers"]
-            drivers = [row for row in sheet.iter_rows(min_row=2, values_only=True)]
+            drivers = list(workbook_engine.rows("Drivers"))
             return drivers
         except Exception as e:
             messagebox.showerror("Error", f"Failed to load drivers: {e}")
@@ -878,10 +896,8 @@ def driver_management_gui(user_role=""):
     def save_driver(driver_data):
         """Save new driver to the Excel sheet."""
         try:
-            workbook = openpyxl.load_workbook(WORKBOOK_PATH)
-            sheet = workbook["Drivers"]
-            sheet.append(driver_data)
-            workbook.save(WORKBOOK_PATH)
+            workbook_engine.append("Drivers", driver_data)
+            workbook_engine.save()
             messagebox.showinfo("Success", "Driver added successfully!")
         except Exception as e:
             messagebox.showerror("Error", f"Failed to save driver: {e}")
@@ -892,7 +908,7 @@ def driver_management_gui(user_role=""):
             messagebox.showerror("Error", "Invalid amount format")
             return
         try:
-            workbook = openpyxl.load_workbook(WORKBOOK_PATH)
+            workbook = workbook_engine.load()
             if "SalaryHistory" not in workbook.sheetnames:
                 workbook.create_sheet("SalaryHistory")
                 sheet = workbook["SalaryHistory"]
@@ -904,22 +920,17 @@ def driver_management_gui(user_role=""):
 
             # Check current salary status before recording new payment
             drivers_sheet = workbook["Drivers"]
+            driver_row = workbook_engine.find_row("Drivers", driver_id)
             salary_status = None
-            for row in drivers_sheet.iter_rows(min_row=2):
-                if str(row[0].value) == str(driver_id):
-                    salary_status = row[7].value  # Assuming column 8 is salary status
-                    break
+            if driver_row is not None:
+                salary_status = drivers_sheet.cell(row=driver_row, column=8).value  # Column 8 is salary status
 
             if salary_status == "Unpaid":
                 sheet.append([driver_id, amount, payment_date, "Paid"])
-                workbook.save(WORKBOOK_PATH)
 
                 # Update salary status in main driver sheet
-                for row in drivers_sheet.iter_rows(min_row=2):
-                    if str(row[0].value) == str(driver_id):
-                        row[7].value = "Paid"
-                        break
-                workbook.save(WORKBOOK_PATH)
+                drivers_sheet.cell(row=driver_row, column=8, value="Paid")
+                workbook_engine.save()
                 messagebox.showinfo("Success", "Salary payment recorded successfully!")
             else:
                 messagebox.showinfo("Notice", "Salary already paid. No action required.")
@@ -931,21 +942,17 @@ def driver_management_gui(user_role=""):
     def generate_salary_report(return_data=False):
         """Generate monthly salary report"""
         try:
-            workbook = openpyxl.load_workbook(WORKBOOK_PATH)
-            sheet = workbook["SalaryHistory"]
-
             current_month = datetime.now().strftime("%Y-%m")
             monthly_data = []
             unpaid_reminders = []
-            for row in sheet.iter_rows(min_row=2, values_only=True):
+            for row in workbook_engine.stream("SalaryHistory"):
                 if row[2]:  # Check if payment date is not None
                     payment_date = datetime.strptime(row[2], "%Y-%m-%d")
                     if payment_date.strftime("%Y-%m") == current_month:
                         monthly_data.append(row)
 
             # Check for unpaid salaries
-            drivers_sheet = workbook["Drivers"]
-            for row in drivers_sheet.iter_rows(min_row=2, values_only=True):
+            for row in workbook_engine.stream("Drivers"):
                 if row[7] == "Unpaid":  # Assuming column 8 is salary status
                     unpaid_reminders.append(f"Unpaid salary for Driver {row[1]} (ID: {row[0]})")
 
@@ -997,13 +1004,10 @@ def driver_management_gui(user_role=""):
     def track_driver_status():
         """Track driver availability and trip status for the current month"""
         try:
-            workbook = openpyxl.load_workbook(WORKBOOK_PATH)
-            sheet = workbook["Drivers"]
-
             status_count = {"Available": 0, "On Trip": 0, "Off Duty": 0}
             driver_stats = {}
 
-            for row in sheet.iter_rows(min_row=2, values_only=True):
+            for row in workbook_engine.stream("Drivers"):
                 driver_id = row[0]
                 current_status = row[11]  # Assuming column 12 is trip status
                 status_count[current_status] = status_count.get(current_status, 0) + 1
@@ -1098,13 +1102,14 @@ def driver_management_gui(user_role=""):
     def update_driver(row_num, updated_data):
         """Update existing driver data."""
         try:
-            workbook = openpyxl.load_workbook(WORKBOOK_PATH)
+            workbook = workbook_engine.load()
             sheet = workbook["Drivers"]
 
             for col_num, value in enumerate(updated_data, start=1):
                 sheet.cell(row=row_num, column=col_num, value=value)
+            workbook_engine.invalidate("Drivers")  # the ID may have been edited
 
-            workbook.save(WORKBOOK_PATH)
+            workbook_engine.save()
             messagebox.showinfo("Success", "Driver updated successfully!")
         except Exception as e:
             messagebox.showerror("Error", f"Failed to update driver: {e}")
@@ -1112,21 +1117,21 @@ def driver_management_gui(user_role=""):
     def update_trip_count(row_num):
         """Increment trip count when trip status changes to 'On Trip'."""
         try:
-            workbook = openpyxl.load_workbook(WORKBOOK_PATH)
+            workbook = workbook_engine.load()
             sheet = workbook["Drivers"]
             current_count = sheet.cell(row=row_num, column=9).value  # Assuming column 9 is Trip Count
             sheet.cell(row=row_num, column=9, value=(current_count or 0) + 1)
-            workbook.save(WORKBOOK_PATH)
+            workbook_engine.save()
         except Exception as e:
             messagebox.showerror("Error", f"Failed to update trip count: {e}")
 
-    def delete_driver(row_num):
+    def delete_driver(driver_id):
         """Delete a driver from the Excel sheet."""
         try:
-            workbook = openpyxl.load_workbook(WORKBOOK_PATH)
-            sheet = workbook["Drivers"]
-            sheet.delete_rows(row_num)
-            workbook.save(WORKBOOK_PATH)
+            if not workbook_engine.delete("Drivers", driver_id):
+                messagebox.showerror("Error", "Driver not found!")
+                return
+            workbook_engine.save()
             messagebox.showinfo("Success", "Driver deleted successfully!")
         except Exception as e:
             messagebox.showerror("Error", f"Failed to delete driver: {e}")
@@ -1134,12 +1139,10 @@ def driver_management_gui(user_role=""):
     def check_license_expiry():
         """Check for upcoming license expirations."""
         try:
-            workbook = openpyxl.load_workbook(WORKBOOK_PATH)
-            sheet = workbook["Drivers"]
             today = datetime.now()
             notifications = []
 
-            for row in sheet.iter_rows(min_row=2, values_only=True):
+            for row in workbook_engine.stream("Drivers"):
                 license_expiry = datetime.strptime(row[3], "%Y-%m-%d")  # Assuming column 3 is License Expiry
                 days_to_expiry = (license_expiry - today).days
                 if days_to_expiry <= 30:
@@ -1222,7 +1225,11 @@ def driver_management_gui(user_role=""):
             messagebox.showerror("Error", "No driver selected!")
             return
 
-        selected_row_index = driver_table.item(selected_item)["values"][0]
+        # values[0] is the display index; rows are found by DriverID
+        row_num = workbook_engine.find_row("Drivers", driver_table.item(selected_item)["values"][1])
+        if row_num is None:
+            messagebox.showerror("Error", "Driver not found!")
+            return
         updated_data = [
             id_entry.get(),
             name_entry.get(),
@@ -1238,9 +1245,9 @@ def driver_management_gui(user_role=""):
             trip_status_combo.get()
         ]
         if trip_status_combo.get() == "On Trip":
-            update_trip_count(selected_row_index + 1)
+            update_trip_count(row_num)
 
-        update_driver(selected_row_index + 1, updated_data)
+        update_driver(row_num, updated_data)
         load_data_into_table()
 
     def delete_selected_driver():
@@ -1250,8 +1257,7 @@ def driver_management_gui(user_role=""):
             messagebox.showerror("Error", "No driver selected!")
             return
 
-        selected_row_index = driver_table.item(selected_item)["values"][0]
-        delete_driver(selected_row_index)
+        delete_driver(driver_table.item(selected_item)["values"][1])
         load_data_into_table()
 
     def on_driver_select(event):
@@ -1285,9 +1291,8 @@ def driver_management_gui(user_role=""):
     def manage_driver_leave():
         """Manage driver leave requests and tracking"""
         try:
-            workbook = openpyxl.load_workbook(WORKBOOK_PATH)
-            sheet = workbook["LeaveManagement"]
-
+            # Each action below reads the shared workbook, so it sees other screens' saves
+            workbook_engine.sheet("LeaveManagement")
 
             # Create leave management window
             leave_window = ThemedTk(theme="arc")
@@ -1325,8 +1330,7 @@ def driver_management_gui(user_role=""):
             def submit_leave_request():
                 """Submit new leave request"""
                 try:
-                    sheet = workbook["LeaveManagement"]
-                    sheet.append([
+                    workbook_engine.append("LeaveManagement", [
                         driver_id_entry.get(),
                         start_date.get(),
                         end_date.get(),
@@ -1334,7 +1338,7 @@ def driver_management_gui(user_role=""):
                         "Pending",
                         reason_entry.get()
                     ])
-                    workbook.save(WORKBOOK_PATH)
+                    workbook_engine.save()
                     messagebox.showinfo("Success", "Leave request submitted successfully!")
                     refresh_leave_table()
                 except Exception as e:
@@ -1356,7 +1360,7 @@ def driver_management_gui(user_role=""):
             def refresh_leave_table():
                 """Refresh the leave requests table"""
                 leave_table.delete(*leave_table.get_children())
-                sheet = workbook["LeaveManagement"]
+                sheet = workbook_engine.sheet("LeaveManagement")
                 for row in sheet.iter_rows(min_row=2, values_only=True):
                     leave_table.insert("", "end", values=row)
 
@@ -1371,20 +1375,16 @@ def driver_management_gui(user_role=""):
                 driver_id = item['values'][0]
 
                 # Update leave status
-                sheet = workbook["LeaveManagement"]
-                for row in sheet.iter_rows(min_row=2):
-                    if str(row[0].value) == str(driver_id):
-                        row[4].value = "Approved"
-                        break
+                leave_row = workbook_engine.find_row("LeaveManagement", driver_id)
+                if leave_row is not None:
+                    workbook_engine.sheet("LeaveManagement").cell(row=leave_row, column=5, value="Approved")
 
                 # Update driver status in main sheet
-                drivers_sheet = workbook["Drivers"]
-                for row in drivers_sheet.iter_rows(min_row=2):
-                    if str(row[0].value) == str(driver_id):
-                        row[11].value = "On Leave"  # Update status column
-                        break
+                driver_row = workbook_engine.find_row("Drivers", driver_id)
+                if driver_row is not None:
+                    workbook_engine.sheet("Drivers").cell(row=driver_row, column=12, value="On Leave")  # Status column
 
-                workbook.save(WORKBOOK_PATH)
+                workbook_engine.save()
                 refresh_leave_table()
                 messagebox.showinfo("Success", "Leave request approved!")
 
@@ -1398,13 +1398,11 @@ def driver_management_gui(user_role=""):
                 item = leave_table.item(selected[0])
                 driver_id = item['values'][0]
 
-                sheet = workbook["LeaveManagement"]
-                for row in sheet.iter_rows(min_row=2):
-                    if str(row[0].value) == str(driver_id):
-                        row[4].value = "Rejected"
-                        break
+                leave_row = workbook_engine.find_row("LeaveManagement", driver_id)
+                if leave_row is not None:
+                    workbook_engine.sheet("LeaveManagement").cell(row=leave_row, column=5, value="Rejected")
 
-                workbook.save(WORKBOOK_PATH)
+                workbook_engine.save()
                 refresh_leave_table()
                 messagebox.showinfo("Success", "Leave request rejected!")
 
@@ -1494,6 +1492,7 @@ def driver_management_gui(user_role=""):
                 os.makedirs('backup')
 
             backup_path = f"backup/drivers_backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
+            workbook_engine.flush()  # the copy must include changes still waiting to be written
             shutil.copy2(WORKBOOK_PATH, backup_path)
             messagebox.showinfo("Success", f"Database backed up to {backup_path}")
         except Exception as e:
@@ -1502,11 +1501,9 @@ def driver_management_gui(user_role=""):
     def calculate_driver_performance():
         """Calculate driver performance metrics and display them"""
         try:
-            workbook = openpyxl.load_workbook(WORKBOOK_PATH)
-            sheet = workbook["Drivers"]
             performance_data = {}
 
-            for row in sheet.iter_rows(min_row=2, values_only=True):
+            for row in workbook_engine.stream("Drivers"):
                 driver_id = row[0]
                 trips = int(row[10])
                 on_time_deliveries = int(row[13]) if len(row) > 13 else 0
@@ -1583,6 +1580,7 @@ def driver_management_gui(user_role=""):
 
     # Create themed root window
     root = ThemedTk(theme="arc")
+    workbook_engine.attach(root)
     root.title("Driver Management System")
     root.geometry("1000x700")
     root.minsize(1024, 700)
@@ -1808,10 +1806,8 @@ def truck_management_gui(user_role=""):
 
     def load_trucks():
         try:
-            workbook = openpyxl.load_workbook(WORKBOOK_PATH)
-            sheet = workbook["Trucks"]
             trucks = []
-            for row in sheet.iter_rows(min_row=2, values_only=True):
+            for row in workbook_engine.rows("Trucks"):
                 trucks.append(row)
             return trucks
         except Exception as e:
@@ -1820,17 +1816,13 @@ def truck_management_gui(user_role=""):
 
     def save_truck(truck_data):
         try:
-            workbook = openpyxl.load_workbook(WORKBOOK_PATH)
-            sheet = workbook["Trucks"]
-
             # Check for duplicate truck ID
-            for row in sheet.iter_rows(min_row=2, values_only=True):
-                if row[0] == truck_data[0]:
-                    messagebox.showerror("Error", "Truck ID already exists!")
-                    return False
+            if workbook_engine.contains("Trucks", truck_data[0]):
+                messagebox.showerror("Error", "Truck ID already exists!")
+                return False
 
-            sheet.append(truck_data)
-            workbook.save(WORKBOOK_PATH)
+            workbook_engine.append("Trucks", truck_data)
+            workbook_engine.save()
             messagebox.showinfo("Success", "Truck added successfully!")
             return True
         except Exception as e:
@@ -1867,7 +1859,7 @@ def truck_management_gui(user_role=""):
     def track_maintenance_expense(truck_id, amount, description, date=None):
         """Record maintenance expense for a truck"""
         try:
-            workbook = openpyxl.load_workbook(WORKBOOK_PATH)
+            workbook = workbook_engine.load()
             if "MaintenanceHistory" not in workbook.sheetnames:
                 workbook.create_sheet("MaintenanceHistory")
                 sheet = workbook["MaintenanceHistory"]
@@ -1881,7 +1873,7 @@ def truck_management_gui(user_role=""):
 
             # Reset odometer after maintenance
             reset_odometer(truck_id)
-            workbook.save(WORKBOOK_PATH)
+            workbook_engine.save()
             messagebox.showinfo("Success", "Maintenance expense recorded successfully!")
         except Exception as e:
             messagebox.showerror("Error", f"Failed to record maintenance expense: {e}")
@@ -1889,7 +1881,7 @@ def truck_management_gui(user_role=""):
     def track_fuel_expense(truck_id, amount, liters, date=None):
         """Record fuel expense for a truck"""
         try:
-            workbook = openpyxl.load_workbook(WORKBOOK_PATH)
+            workbook = workbook_engine.load()
             if "FuelHistory" not in workbook.sheetnames:
                 workbook.create_sheet("FuelHistory")
                 sheet = workbook["FuelHistory"]
@@ -1899,7 +1891,7 @@ def truck_management_gui(user_role=""):
 
             date = date or datetime.now().strftime("%Y-%m-%d")
             sheet.append([truck_id, amount, liters, date])
-            workbook.save(WORKBOOK_PATH)
+            workbook_engine.save()
             messagebox.showinfo("Success", "Fuel expense recorded successfully!")
         except Exception as e:
             messagebox.showerror("Error", f"Faile: {e}")
@@ -1907,48 +1899,46 @@ def truck_management_gui(user_role=""):
     def update_odometer(truck_id, distance):
         """Update odometer reading for a truck"""
         try:
-            workbook = openpyxl.load_workbook(WORKBOOK_PATH)
+            workbook = workbook_engine.load()
             sheet = workbook["Trucks"]
 
-            for row in sheet.iter_rows(min_row=2):
-                if str(row[0].value) == str(truck_id):
-                    current_reading = row[5].value or 0  # Assuming column 6 is odometer reading
-                    new_reading = current_reading + distance
-                    row[5].value = new_reading
+            row_num = workbook_engine.find_row("Trucks", truck_id)
+            if row_num is not None:
+                current_reading = sheet.cell(row=row_num, column=6).value or 0  # Assuming column 6 is odometer reading
+                new_reading = current_reading + distance
+                sheet.cell(row=row_num, column=6, value=new_reading)
 
-                    # Check if maintenance is needed
-                    if new_reading >= 2000:
-                        messagebox.showwarning("Maintenance Required",f"Truck {truck_id} has reached {new_reading}km. Maintenance is required!")
-                    break
+                # Check if maintenance is needed
+                if new_reading >= 2000:
+                    messagebox.showwarning("Maintenance Required",f"Truck {truck_id} has reached {new_reading}km. Maintenance is required!")
 
-            workbook.save(WORKBOOK_PATH)
+            workbook_engine.save()
         except Exception as e:
             messagebox.showerror("Error", f"Failed to update odometer: {e}")
 
     def reset_odometer(truck_id):
         """Reset odometer after maintenance"""
         try:
-            workbook = openpyxl.load_workbook(WORKBOOK_PATH)
+            workbook = workbook_engine.load()
             sheet = workbook["Trucks"]
 
-            for row in sheet.iter_rows(min_row=2):
-                if str(row[0].value) == str(truck_id):
-                    row[5].value = 0  # Reset odometer reading
-                    break
+            row_num = workbook_engine.find_row("Trucks", truck_id)
+            if row_num is not None:
+                sheet.cell(row=row_num, column=6, value=0)  # Reset odometer reading
 
-            workbook.save(WORKBOOK_PATH)
+            workbook_engine.save()
         except Exception as e:
             messagebox.showerror("Error", f"Failed to reset odometer: {e}")
 
     def get_current_odometer(truck_id):
         """Get current odometer reading for a truck"""
         try:
-            workbook = openpyxl.load_workbook(WORKBOOK_PATH)
+            workbook = workbook_engine.load()
             sheet = workbook["Trucks"]
 
-            for row in sheet.iter_rows(min_row=2, values_only=True):
-                if str(row[0]) == str(truck_id):
-                    return row[5] or 0  # Assuming column 6 is odometer reading
+            row_num = workbook_engine.find_row("Trucks", truck_id)
+            if row_num is not None:
+                return sheet.cell(row=row_num, column=6).value or 0  # Assuming column 6 is odometer reading
             return 0
         except Exception as e:
             messagebox.showerror("Error", f"Failed to get odometer reading: {e}")
@@ -2031,14 +2021,7 @@ def truck_management_gui(user_role=""):
 
         # Find the actual row in Excel
         truck_id = truck_table.item(selected_item)["values"][0]
-        workbook = openpyxl.load_workbook(WORKBOOK_PATH)
-        sheet = workbook["Trucks"]
-        row_num = None
-
-        for idx, row in enumerate(sheet.iter_rows(min_row=2), start=2):
-            if str(row[0].value) == str(truck_id):
-                row_num = idx
-                break
+        row_num = workbook_engine.find_row("Trucks", truck_id)
 
         if row_num:
             update_truck(row_num, updated_data)
@@ -2058,28 +2041,18 @@ def truck_management_gui(user_role=""):
             return
 
         truck_id = truck_table.item(selected_item)["values"][0]
-        workbook = openpyxl.load_workbook(WORKBOOK_PATH)
-        sheet = workbook["Trucks"]
-        row_num = None
-
-        for idx, row in enumerate(sheet.iter_rows(min_row=2), start=2):
-            if str(row[0].value) == str(truck_id):
-                row_num = idx
-                break
 
-        if row_num:
-            delete_truck(row_num)
+        if workbook_engine.contains("Trucks", truck_id):
+            delete_truck(truck_id)
             load_data_into_table()
             clear_form()
         else:
             messagebox.showerror("Error", "Could not find truck to delete!")
 
-    def delete_truck(row_num):
+    def delete_truck(truck_id):
         try:
-            workbook = openpyxl.load_workbook(WORKBOOK_PATH)
-            sheet = workbook["Trucks"]
-            sheet.delete_rows(row_num)
-            workbook.save(WORKBOOK_PATH)
+            workbook_engine.delete("Trucks", truck_id)
+            workbook_engine.save()
             messagebox.showinfo("Success", "Truck deleted successfully!")
         except Exception as e:
             messagebox.showerror("Error", f"Failed to delete truck: {e}")
@@ -2087,13 +2060,14 @@ def truck_management_gui(user_role=""):
 
     def update_truck(row_num, updated_data):
         try:
-            workbook = openpyxl.load_workbook(WORKBOOK_PATH)
+            workbook = workbook_engine.load()
             sheet = workbook["Trucks"]
 
             for col_num, value in enumerate(updated_data):
                 sheet.cell(row=row_num, column=col_num + 1, value=value)
+            workbook_engine.invalidate("Trucks")  # the ID may have been edited
 
-            workbook.save(WORKBOOK_PATH)
+            workbook_engine.save()
             messagebox.showinfo("Success", "Truck updated successfully!")
         except Exception as e:
             messagebox.showerror("Error", f"Failed to update truck: {e}")
@@ -2103,13 +2077,10 @@ def truck_management_gui(user_role=""):
     def generate_maintenance_report(start_date=None, end_date=None):
         """Generate a maintenance expense report for a date range"""
         try:
-            workbook = openpyxl.load_workbook(WORKBOOK_PATH)
-            sheet = workbook["MaintenanceHistory"]
-
             report_data = []
             total_expense = 0
 
-            for row in sheet.iter_rows(min_row=2, values_only=True):
+            for row in workbook_engine.stream("MaintenanceHistory"):
                 maintenance_date = datetime.strptime(row[3], "%Y-%m-%d")
                 if ((not start_date or maintenance_date >= start_date) and
                         (not end_date or maintenance_date <= end_date)):
@@ -2170,7 +2141,7 @@ def truck_management_gui(user_role=""):
     def export_to_csv():
         """Export truck data to CSV file"""
         try:
-            trucks = load_trucks()
+            trucks = list(workbook_engine.stream("Trucks"))
             filename = filedialog.asksaveasfilename(
                 defaultextension=".csv",
                 filetypes=[("CSV files", "*.csv")]
@@ -2209,6 +2180,7 @@ def truck_management_gui(user_role=""):
             messagebox.showerror("Error", f"Failed to check maintenance schedule: {e}")
 
     root = ThemedTk(theme="arc")  # Using themed Tk for better appearance
+    workbook_engine.attach(root)
     root.title("Truck Management System")
     root.geometry("1000x700")
     root.minsize(1024, 700)
@@ -2445,10 +2417,8 @@ def order_management_gui(user_role=""):
 
     def load_orders():
         try:
-            workbook = openpyxl.load_workbook(WORKBOOK_PATH)
-            sheet = workbook["Orders"]
             orders = []
-            for i, row in enumerate(sheet.iter_rows(min_row=2, values_only=True), start=2):
+            for i, row in enumerate(workbook_engine.rows("Orders"), start=2):
                 orders.append((i, *row))  # Include row index for tracking
             return orders
         except Exception as e:
@@ -2457,14 +2427,10 @@ def order_management_gui(user_role=""):
 
     def save_order(order_data):
         try:
-            workbook = openpyxl.load_workbook(WORKBOOK_PATH)
-            sheet = workbook["Orders"]
-
             # Check if order ID already exists
-            for row in sheet.iter_rows(min_row=2, values_only=True):
-                if row[0] == order_data[0]:
-                    messagebox.showerror("Error", "Order ID already exists!")
-                    return False
+            if workbook_engine.contains("Orders", order_data[0]):
+                messagebox.showerror("Error", "Order ID already exists!")
+                return False
 
             # Calculate remaining amount
             total_amount = float(order_data[11])  # TotalAmount is at index 10
@@ -2472,8 +2438,8 @@ def order_management_gui(user_role=""):
             remaining = total_amount - paid_amount
 
             # Append all data including remaining amount
-            sheet.append(order_data)
-            workbook.save(WORKBOOK_PATH)
+            workbook_engine.append("Orders", order_data)
+            workbook_engine.save()
             messagebox.showinfo("Success", "Order added successfully!")
             return True
         except ValueError as ve:
@@ -2493,7 +2459,7 @@ def order_management_gui(user_role=""):
             from reportlab.lib.units import inch
             from datetime import datetime
 
-            orders = load_orders()
+            orders = list(workbook_engine.stream("Orders"))
             if not orders:
                 messagebox.showwarning("Warning", "No data to export")
                 return
@@ -2515,10 +2481,10 @@ def order_management_gui(user_role=""):
             # Remove first column from headers
             modified_columns = order_columns[1:]
 
-            # Create table data without first column
+            # Sheet rows have no "Row" column to skip
             table_data = [modified_columns]
             for order in orders:
-                table_data.append([str(x) for x in order[1:]])  # Skip first column
+                table_data.append([str(x) for x in order])
 
             page_width = page_size[0] - (0.5 * inch)
             num_columns = len(modified_columns)
@@ -2560,7 +2526,7 @@ def order_management_gui(user_role=""):
         try:
             from datetime import datetime
 
-            orders = load_orders()
+            orders = list(workbook_engine.stream("Orders"))
             if not orders:
                 messagebox.showwarning("Warning", "No data to export")
                 return
@@ -2579,9 +2545,9 @@ def order_management_gui(user_role=""):
                 cell.font = openpyxl.styles.Font(bold=True)
                 cell.fill = openpyxl.styles.PatternFill(start_color="366092", end_color="366092", fill_type="solid")
 
-            # Add data (skip first column)
+            # Add data
             for row, order in enumerate(orders, 2):
-                for col, value in enumerate(order[1:], 1):
+                for col, value in enumerate(order, 1):
                     sheet.cell(row=row, column=col, value=value)
 
             workbook.save(filename)
@@ -2725,12 +2691,12 @@ def order_management_gui(user_role=""):
     # Add data validation for contact numbers
 
 
-    def delete_order(row_id):
+    def delete_order(order_id):
         try:
-            workbook = openpyxl.load_workbook(WORKBOOK_PATH)
-            sheet = workbook["Orders"]
-            sheet.delete_rows(row_id)
-            workbook.save(WORKBOOK_PATH)
+            if not workbook_engine.delete("Orders", order_id):
+                messagebox.showerror("Error", "Order not found!")
+                return
+            workbook_engine.save()
             load_data_into_table()
             messagebox.showinfo("Success", "Order deleted successfully!")
         except Exception as e:
@@ -2738,7 +2704,7 @@ def order_management_gui(user_role=""):
 
     def update_order(row_id, updated_data):
         try:
-            workbook = openpyxl.load_workbook(WORKBOOK_PATH)
+            workbook = workbook_engine.load()
             sheet = workbook["Orders"]
 
             # Update fields in the row
@@ -2750,8 +2716,9 @@ def order_management_gui(user_role=""):
             paid_amount = float(updated_data[12])  # Paid Amount is 8th index (0-based)
             remaining = total_amount - paid_amount
             sheet.cell(row=row_id, column=len(updated_data) + 1, value=remaining)
+            workbook_engine.invalidate("Orders")  # the ID may have been edited
 
-            workbook.save(WORKBOOK_PATH)
+            workbook_engine.save()
             load_data_into_table()  # Refresh data in the Treeview
             messagebox.showinfo("Success", "Order updated successfully!")
         except ValueError as ve:
@@ -2811,9 +2778,9 @@ def order_management_gui(user_role=""):
             messagebox.showerror("Error", "Please select an order to delete.")
             return
 
-        row_id = int(order_table.item(selected[0])["values"][0])
+        order_id = order_table.item(selected[0])["values"][1]
         if messagebox.askyesno("Confirm Delete", "Are you sure you want to delete this order?"):
-            delete_order(row_id)
+            delete_order(order_id)
 
     def update_selected_order():
         selected = order_table.selection()
@@ -2849,7 +2816,11 @@ def order_management_gui(user_role=""):
 
             ]
 
-            row_id = int(order_table.item(selected[0])["values"][0])
+            # Look the row up by OrderID; the "Row" column is only a display index
+            row_id = workbook_engine.find_row("Orders", order_table.item(selected[0])["values"][1])
+            if row_id is None:
+                messagebox.showerror("Error", "Order not found!")
+                return
             update_order(row_id, updated_data)
         except ValueError as ve:
             messagebox.showerror("Input Error", f"Invalid input: {ve}")
@@ -2995,6 +2966,7 @@ def order_management_gui(user_role=""):
             pass
     # Root window
     root = ThemedTk(theme="arc")
+    workbook_engine.attach(root)
     root.title("Order Management System")
     root.geometry("1000x700")
     root.minsize(1024, 700)
@@ -3215,13 +3187,13 @@ def dispatch_management_gui(user_role=""):
 
     def is_driver_compliant(driver_id):
         try:
-            workbook = openpyxl.load_workbook(WORKBOOK_PATH)
+            workbook = workbook_engine.load()
             sheet = workbook["Drivers"]
-            for row in sheet.iter_rows(min_row=2, values_only=True):
-                if row[0] == driver_id:
-                    expiry_date = row[5]
-                    if datetime.datetime.strptime(expiry_date, "%Y-%m-%d") < datetime.datetime.now():
-                        return False
+            row_num = workbook_engine.find_row("Drivers", driver_id)
+            if row_num is not None:
+                expiry_date = sheet.cell(row=row_num, column=6).value
+                if datetime.datetime.strptime(expiry_date, "%Y-%m-%d") < datetime.datetime.now():
+                    return False
             return True
         except Exception as e:
             messagebox.showerror("Error", f"Failed to check driver compliance: {e}")
@@ -3229,21 +3201,20 @@ def dispatch_management_gui(user_role=""):
 
     def update_dispatch_status(dispatch_id, new_status):
         try:
-            workbook = openpyxl.load_workbook(WORKBOOK_PATH)
+            workbook = workbook_engine.load()
             dispatch_sheet = workbook["Dispatch"]
             orders_sheet = workbook["Orders"]
 
-            for row in dispatch_sheet.iter_rows(min_row=2):
-                if str(row[0].value) == str(dispatch_id):
-                    row[4].value = new_status
-                    break
+            # Dispatch rows are keyed by their OrderID
+            dispatch_row = workbook_engine.find_row("Dispatch", dispatch_id)
+            if dispatch_row is not None:
+                dispatch_sheet.cell(row=dispatch_row, column=5, value=new_status)
 
-            for row in orders_sheet.iter_rows(min_row=2):
-                if str(row[0].value) == str(dispatch_id):
-                    row[8].value = new_status
-                    break
+            order_row = workbook_engine.find_row("Orders", dispatch_id)
+            if order_row is not None:
+                orders_sheet.cell(row=order_row, column=9, value=new_status)
 
-            workbook.save(WORKBOOK_PATH)
+            workbook_engine.save()
 
             for item in dispatch_table.get_children():
                 if dispatch_table.item(item)['values'][0] == dispatch_id:
@@ -3264,19 +3235,13 @@ def dispatch_management_gui(user_role=""):
         if messagebox.askyesno("Confirm Delete", "Are you sure you want to delete this dispatch?"):
             try:
                 dispatch_id = dispatch_table.item(selected_item)['values'][0]
-                workbook = openpyxl.load_workbook(WORKBOOK_PATH)
-                sheet = workbook["Dispatch"]
-
-                for row_idx, row in enumerate(sheet.iter_rows(min_row=2), start=2):
-                    if str(row[0].value) == str(dispatch_id):
-                        sheet.delete_rows(row_idx)
-                        update_order_status(dispatch_id, "Pending")
-                        driver_id = dispatch_table.item(selected_item)['values'][1]
-                        truck_id = dispatch_table.item(selected_item)['values'][2]
-                        update_driver_status(driver_id, "Available")
-                        update_truck_status(truck_id, "Operational")
-                        break
-                workbook.save(WORKBOOK_PATH)
+                if workbook_engine.delete("Dispatch", dispatch_id):
+                    update_order_status(dispatch_id, "Pending")
+                    driver_id = dispatch_table.item(selected_item)['values'][1]
+                    truck_id = dispatch_table.item(selected_item)['values'][2]
+                    update_driver_status(driver_id, "Available")
+                    update_truck_status(truck_id, "Operational")
+                workbook_engine.save()
                 load_data_into_table()
                 messagebox.showinfo("Success", "Dispatch deleted successfully")
             except Exception as e:
@@ -3328,10 +3293,8 @@ def dispatch_management_gui(user_role=""):
 
     def load_dispatch_data():
         try:
-            workbook = openpyxl.load_workbook(WORKBOOK_PATH)
-            sheet = workbook["Dispatch"]
             dispatches = []
-            for row in sheet.iter_rows(min_row=2, values_only=True):
+            for row in workbook_engine.rows("Dispatch"):
                 dispatches.append(row)
             return dispatches
         except Exception as e:
@@ -3340,10 +3303,8 @@ def dispatch_management_gui(user_role=""):
 
     def save_dispatch(dispatch_data):
         try:
-            workbook = openpyxl.load_workbook(WORKBOOK_PATH)
-            sheet = workbook["Dispatch"]
-            sheet.append(dispatch_data)
-            workbook.save(WORKBOOK_PATH)
+            workbook_engine.append("Dispatch", dispatch_data)
+            workbook_engine.save()
             messagebox.showinfo("Success", "Dispatch assignment saved successfully!")
         except Exception as e:
             messagebox.showerror("Error", f"Failed to save dispatch: {e}")
@@ -3351,25 +3312,23 @@ def dispatch_management_gui(user_role=""):
 
     def check_truck_compatibility(truck_id, order_id):
         try:
-            workbook = openpyxl.load_workbook(WORKBOOK_PATH)
+            workbook = workbook_engine.load()
             trucks_sheet = workbook["Trucks"]
             orders_sheet = workbook["Orders"]
 
             truck_capacity = None
             truck_permit = None
-            for row in trucks_sheet.iter_rows(min_row=2, values_only=True):
-                if str(row[0]) == str(truck_id):
-                    truck_capacity = float(row[4])
-                    truck_permit = row[3]
-                    break
+            truck_row = workbook_engine.find_row("Trucks", truck_id)
+            if truck_row is not None:
+                truck_capacity = float(trucks_sheet.cell(row=truck_row, column=5).value)
+                truck_permit = trucks_sheet.cell(row=truck_row, column=4).value
 
             order_weight = None
             order_region = None
-            for row in orders_sheet.iter_rows(min_row=2, values_only=True):
-                if str(row[0]) == str(order_id):
-                    order_weight = float(row[9])
-                    order_region = row[6]
-                    break
+            order_row = workbook_engine.find_row("Orders", order_id)
+            if order_row is not None:
+                order_weight = float(orders_sheet.cell(row=order_row, column=10).value)
+                order_region = orders_sheet.cell(row=order_row, column=7).value
 
             if truck_capacity < order_weight:
                 messagebox.showerror("Error", "Order weight exceeds truck capacity!")
@@ -3387,25 +3346,25 @@ def dispatch_management_gui(user_role=""):
 
     def update_truck_odometer(truck_id, distance):
         try:
-            workbook = openpyxl.load_workbook(WORKBOOK_PATH)
+            workbook = workbook_engine.load()
             sheet = workbook["Trucks"]
-            for row in sheet.iter_rows(min_row=2):
-                if str(row[0].value) == str(truck_id):
-                    current_odometer = float(row[6].value) if row[6].value else 0
-                    row[6].value = current_odometer + float(distance)
-                    break
-            workbook.save(WORKBOOK_PATH)
+            row_num = workbook_engine.find_row("Trucks", truck_id)
+            if row_num is not None:
+                odometer = sheet.cell(row=row_num, column=7)
+                current_odometer = float(odometer.value) if odometer.value else 0
+                odometer.value = current_odometer + float(distance)
+            workbook_engine.save()
         except Exception as e:
             messagebox.showerror("Error", f"Failed to update truck odometer: {e}")
             log_error(f"Failed to update truck odometer: {e}")
 
     def get_order_distance(order_id):
         try:
-            workbook = openpyxl.load_workbook(WORKBOOK_PATH)
+            workbook = workbook_engine.load()
             sheet = workbook["Orders"]
-            for row in sheet.iter_rows(min_row=2, values_only=True):
-                if str(row[0]) == str(order_id):
-                    return float(row[7])
+            row_num = workbook_engine.find_row("Orders", order_id)
+            if row_num is not None:
+                return float(sheet.cell(row=row_num, column=8).value)
             return 0
         except Exception as e:
             messagebox.showerror("Error", f"Failed to get order distance: {e}")
@@ -3413,10 +3372,8 @@ def dispatch_management_gui(user_role=""):
 
     def get_available_drivers():
         try:
-            workbook = openpyxl.load_workbook(WORKBOOK_PATH)
-            sheet = workbook["Drivers"]
             available_drivers = []
-            for row in sheet.iter_rows(min_row=2, values_only=True):
+            for row in workbook_engine.rows("Drivers"):
                 if row[11] == "Available":
                     available_drivers.append(f"{row[0]} - {row[1]}")
             return available_drivers
@@ -3427,10 +3384,8 @@ def dispatch_management_gui(user_role=""):
 
     def get_available_trucks():
         try:
-            workbook = openpyxl.load_workbook(WORKBOOK_PATH)
-            sheet = workbook["Trucks"]
             available_trucks = []
-            for row in sheet.iter_rows(min_row=2, values_only=True):
+            for row in workbook_engine.rows("Trucks"):
                 if row[2] == "Operational":
                     available_trucks.append(f"{row[0]} - {row[1]}")
             return available_trucks
@@ -3441,23 +3396,20 @@ def dispatch_management_gui(user_role=""):
 
     def update_truck_status(truck_id, new_status):
         try:
-            workbook = openpyxl.load_workbook(WORKBOOK_PATH)
+            workbook = workbook_engine.load()
             sheet = workbook["Trucks"]
-            for row in sheet.iter_rows(min_row=2):
-                if str(row[0].value) == str(truck_id):
-                    row[2].value = new_status
-                    break
-            workbook.save(WORKBOOK_PATH)
+            row_num = workbook_engine.find_row("Trucks", truck_id)
+            if row_num is not None:
+                sheet.cell(row=row_num, column=3, value=new_status)
+            workbook_engine.save()
         except Exception as e:
             messagebox.showerror("Error", f"Failed to update truck status: {e}")
             log_error(f"Failed to update truck status: {e}")
 
     def get_pending_orders():
         try:
-            workbook = openpyxl.load_workbook(WORKBOOK_PATH)
-            sheet = workbook["Orders"]
             pending_orders = []
-            for row in sheet.iter_rows(min_row=2, values_only=True):
+            for row in workbook_engine.rows("Orders"):
                 if row[8] == "Pending":
                     pending_orders.append(f"{row[0]} - {row[1]}")
             return pending_orders
@@ -3468,29 +3420,28 @@ def dispatch_management_gui(user_role=""):
 
     def update_order_status(order_id, new_status):
         try:
-            workbook = openpyxl.load_workbook(WORKBOOK_PATH)
+            workbook = workbook_engine.load()
             sheet = workbook["Orders"]
-            for row in sheet.iter_rows(min_row=2):
-                if row[0].value == order_id:
-                    row[8].value = new_status
-                    break
-            workbook.save(WORKBOOK_PATH)
+            row_num = workbook_engine.find_row("Orders", order_id)
+            if row_num is not None:
+                sheet.cell(row=row_num, column=9, value=new_status)
+            workbook_engine.save()
         except Exception as e:
             messagebox.showerror("Error", f"Failed to update order status: {e}")
             log_error(f"Failed to update order status: {e}")
 
     def update_driver_status(driver_id, new_status):
         try:
-            workbook = openpyxl.load_workbook(WORKBOOK_PATH)
+            workbook = workbook_engine.load()
             sheet = workbook["Drivers"]
-            for row in sheet.iter_rows(min_row=2):
-                if str(row[0].value) == str(driver_id):
-                    row[11].value = new_status
-                    if new_status == "On Trip":
-                        current_trips = int(row[10].value) if row[10].value else 0
-                        row[10].value = current_trips + 1
-                    break
-            workbook.save(WORKBOOK_PATH)
+            row_num = workbook_engine.find_row("Drivers", driver_id)
+            if row_num is not None:
+                sheet.cell(row=row_num, column=12, value=new_status)
+                if new_status == "On Trip":
+                    trips = sheet.cell(row=row_num, column=11)
+                    current_trips = int(trips.value) if trips.value else 0
+                    trips.value = current_trips + 1
+            workbook_engine.save()
         except Exception as e:
             messagebox.showerror("Error", f"Failed to update driver status: {e}")
             log_error(f"Failed to update driver status: {e}")
@@ -3584,10 +3535,8 @@ def dispatch_management_gui(user_role=""):
 
     def load_orders_data():
         try:
-            workbook = openpyxl.load_workbook(WORKBOOK_PATH)
-            sheet = workbook["Orders"]
             orders = []
-            for row in sheet.iter_rows(min_row=2, values_only=True):
+            for row in workbook_engine.rows("Orders"):
                 if row[8] == "Pending":  # Only show pending orders
                     orders.append(row)
             return orders
@@ -3597,10 +3546,8 @@ def dispatch_management_gui(user_role=""):
 
     def load_drivers_data():
         try:
-            workbook = openpyxl.load_workbook(WORKBOOK_PATH)
-            sheet = workbook["Drivers"]
             drivers = []
-            for row in sheet.iter_rows(min_row=2, values_only=True):
+            for row in workbook_engine.rows("Drivers"):
                 if row[11] == "Available":  # Only show available drivers
                     drivers.append(row)
             return drivers
@@ -3610,10 +3557,8 @@ def dispatch_management_gui(user_role=""):
 
     def load_trucks_data():
         try:
-            workbook = openpyxl.load_workbook(WORKBOOK_PATH)
-            sheet = workbook["Trucks"]
             trucks = []
-            for row in sheet.iter_rows(min_row=2, values_only=True):
+            for row in workbook_engine.rows("Trucks"):
                 if row[2] == "Operational":  # Only show operational trucks
                     trucks.append(row)
             return trucks
@@ -3665,7 +3610,7 @@ def dispatch_management_gui(user_role=""):
         """Export dispatch data to various formats"""
         try:
             # Get all dispatch data
-            dispatches = load_dispatch_data()
+            dispatches = list(workbook_engine.stream("Dispatch"))
             if not dispatches:
                 messagebox.showerror("Error", "No dispatch data to export")
                 return
@@ -3757,6 +3702,7 @@ def dispatch_management_gui(user_role=""):
         return tree, container
 
     root = ThemedTk(theme="arc")
+    workbook_engine.attach(root)
     root.title("Dispatch Management System")
     root.geometry("1024x768")
     root.minsize(1024, 600)
@@ -3965,7 +3911,7 @@ def accounts_management_gui(user_role=""):
 
     def load_financial_data():
         try:
-            workbook = openpyxl.load_workbook(WORKBOOK_PATH)
+            workbook = workbook_engine.load()
             sheet = workbook["Financials"]
             data = []
             for row in sheet.iter_rows(min_row=2, values_only=True):
@@ -3977,10 +3923,10 @@ def accounts_management_gui(user_role=""):
 
     def save_transaction(transaction_data):
         try:
-            workbook = openpyxl.load_workbook(WORKBOOK_PATH)
+            workbook = workbook_engine.load()
             sheet = workbook["Financials"]
             sheet.append(transaction_data)
-            workbook.save(WORKBOOK_PATH)
+            workbook_engine.save()
             messagebox.showinfo("Success", "Transaction recorded successfully!")
             return True
         except Exception as e:
@@ -3989,14 +3935,7 @@ def accounts_management_gui(user_role=""):
 
     def generate_invoice(order_id):
         try:
-            workbook = openpyxl.load_workbook(WORKBOOK_PATH)
-            orders_sheet = workbook["Orders"]
-            invoice_data = None
-
-            for row in orders_sheet.iter_rows(min_row=2, values_only=True):
-                if str(row[0]) == order_id:
-                    invoice_data = row
-                    break
+            invoice_data = workbook_engine.row_values("Orders", order_id)
 
             if invoice_data:
                 timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -4049,26 +3988,26 @@ def accounts_management_gui(user_role=""):
 
     def update_order_payment_status(order_id, paid_amount):
         try:
-            workbook = openpyxl.load_workbook(WORKBOOK_PATH)
+            workbook = workbook_engine.load()
             sheet = workbook["Orders"]
 
-            for row in sheet.iter_rows(min_row=2):
-                if str(row[0].value) == order_id:
-                    total_amount = float(row[11].value)
-                    current_paid = float(row[12].value)
-                    current_remaining=float(row[14].value)
-                    new_remianing=current_remaining-paid_amount
-                    row[14].value=new_remianing
-                    new_paid = current_paid + paid_amount
-                    row[12].value = new_paid
-
-                    if new_paid >= total_amount:
-                        row[13].value = "Completed"
-                    elif new_paid > 0:
-                        row[13].value = "Partial"
-                    break
-
-            workbook.save(WORKBOOK_PATH)
+            row_num = workbook_engine.find_row("Orders", order_id)
+            if row_num is not None:
+                row = [sheet.cell(row=row_num, column=col) for col in range(1, 16)]
+                total_amount = float(row[11].value)
+                current_paid = float(row[12].value)
+                current_remaining=float(row[14].value)
+                new_remianing=current_remaining-paid_amount
+                row[14].value=new_remianing
+                new_paid = current_paid + paid_amount
+                row[12].value = new_paid
+
+                if new_paid >= total_amount:
+                    row[13].value = "Completed"
+                elif new_paid > 0:
+                    row[13].value = "Partial"
+
+            workbook_engine.save()
         except Exception as e:
             messagebox.showerror("Error", f"Failed to update payment status: {e}")
 
@@ -4090,12 +4029,10 @@ def accounts_management_gui(user_role=""):
             transaction_table.insert('', 'end', values=transaction)
     def calculate_totals():
         try:
-            workbook = openpyxl.load_workbook(WORKBOOK_PATH)
-            sheet = workbook["Financials"]
             total_payments = 0
             total_expenses = 0
 
-            for row in sheet.iter_rows(min_row=2, values_only=True):
+            for row in workbook_engine.stream("Financials"):
                 amount = float(row[2]) if row[2] else 0
                 if row[1] == "Order Payment":  # Check if it's an order payment
                     total_payments += amount
@@ -4242,6 +4179,7 @@ def accounts_management_gui(user_role=""):
         ttk.Button(filter_window, text="Apply Filter", command=apply_filter).pack(pady=20)
 
     root = ThemedTk(theme="arc")
+    workbook_engine.attach(root)
     root.title("Accounts & Financial Management")
     root.geometry("1024x700")
     root.minsize(1024, 600)
@@ -4526,20 +4464,26 @@ def reports_analytics_gui(user_role=""):
         except Exception as e:
             messagebox.showerror("Error", f"Failed to export CSV: {e}")
 
+    def tally_dispatches():
+        """Count dispatches per truck and delivered trips per driver in one pass over Dispatch."""
+        trips_by_truck = Counter()
+        delivered_by_driver = Counter()
+        for dispatch in workbook_engine.stream("Dispatch"):
+            trips_by_truck[row_key(dispatch[2])] += 1
+            if dispatch[4] == "Delivered":
+                delivered_by_driver[row_key(dispatch[1])] += 1
+        return trips_by_truck, delivered_by_driver
+
     def generate_fleet_report():
         try:
-            workbook = openpyxl.load_workbook(WORKBOOK_PATH)
-            trucks_sheet = workbook["Trucks"]
-            dispatch_sheet = workbook["Dispatch"]
-
+            trips_by_truck, _ = tally_dispatches()
             fleet_data = []
-            for truck in trucks_sheet.iter_rows(min_row=2, values_only=True):
-                usage_count = sum(1 for dispatch in dispatch_sheet.iter_rows(min_row=2, values_only=True)if str(dispatch[2]) == str(truck[0]))
+            for truck in workbook_engine.stream("Trucks"):
                 fleet_data.append({
                     "Truck ID": truck[0],
                     "Model": truck[1],
                     "Status": truck[2],
-                    "Total Trips": usage_count,
+                    "Total Trips": trips_by_truck[row_key(truck[0])],
                     "Odometer": truck[6]
                 })
 
@@ -4551,17 +4495,13 @@ def reports_analytics_gui(user_role=""):
 
     def generate_driver_performance():
         try:
-            workbook = openpyxl.load_workbook(WORKBOOK_PATH)
-            drivers_sheet = workbook["Drivers"]
-            dispatch_sheet = workbook["Dispatch"]
-
+            _, delivered_by_driver = tally_dispatches()
             driver_data = []
-            for driver in drivers_sheet.iter_rows(min_row=2, values_only=True):
-                completed_trips = sum(1 for dispatch in dispatch_sheet.iter_rows(min_row=2, values_only=True)if str(dispatch[1]) == str(driver[0]) and dispatch[4] == "Delivered")
+            for driver in workbook_engine.stream("Drivers"):
                 driver_data.append({
                     "Driver ID": driver[0],
                     "Name": driver[1],
-                    "Completed Trips": completed_trips,
+                    "Completed Trips": delivered_by_driver[row_key(driver[0])],
                     "Status": driver[11]
                 })
 
@@ -4574,13 +4514,9 @@ def reports_analytics_gui(user_role=""):
     # Modify generate_financial_summary() to return a list of dictionaries
     def generate_financial_summary():
         try:
-            workbook = openpyxl.load_workbook(WORKBOOK_PATH)
-            financials_sheet = workbook["Financials"]
-            orders_sheet = workbook["Orders"]
-
             # Calculate revenue and expenses
-            total_revenue = sum(float(row[11]) for row in orders_sheet.iter_rows(min_row=2, values_only=True) if row[11])
-            total_expenses = sum(float(row[2]) for row in financials_sheet.iter_rows(min_row=2, values_only=True)if row[1] != "Order Payment" and row[2])
+            total_revenue = sum(float(row[11]) for row in workbook_engine.stream("Orders") if row[11])
+            total_expenses = sum(float(row[2]) for row in workbook_engine.stream("Financials")if row[1] != "Order Payment" and row[2])
             net_profit = total_revenue - total_expenses
 
             # Create chart data dictionary first
@@ -4684,6 +4620,7 @@ def reports_analytics_gui(user_role=""):
             export_to_csv(data, filename)
     # Create main window
     root = ThemedTk(theme="arc")
+    workbook_engine.attach(root)
     root.title("Reports & Analytics")
     root.geometry("1000x600")
     root.minsize(1024, 600)
@@ -4836,9 +4773,7 @@ def user_management_gui():
     def load_users():
         """Load user data from the Excel sheet."""
         try:
-            workbook = openpyxl.load_workbook(WORKBOOK_PATH)
-            sheet = workbook["Users"]
-            users = [row for row in sheet.iter_rows(min_row=2, values_only=True)]
+            users = list(workbook_engine.rows("Users"))
             return users
         except Exception as e:
             messagebox.showerror("Error", f"Failed to load users: {e}")
@@ -4847,17 +4782,13 @@ def user_management_gui():
     def save_user(user_data):
         """Save new user to the Excel sheet."""
         try:
-            workbook = openpyxl.load_workbook(WORKBOOK_PATH)
-            sheet = workbook["Users"]
-
             # Check for duplicate username
-            for row in sheet.iter_rows(min_row=2, values_only=True):
-                if row[1] == user_data[1]:  # Check username
-                    messagebox.showerror("Error", "Username already exists!")
-                    return False
+            if workbook_engine.contains("Users", user_data[0]):
+                messagebox.showerror("Error", "Username already exists!")
+                return False
 
-            sheet.append(user_data)
-            workbook.save(WORKBOOK_PATH)
+            workbook_engine.append("Users", user_data)
+            workbook_engine.save()
             messagebox.showinfo("Success", "User added successfully!")
             return True
         except Exception as e:
@@ -4867,27 +4798,28 @@ def user_management_gui():
     def update_user(row_num, updated_data):
         """Update existing user data."""
         try:
-            workbook = openpyxl.load_workbook(WORKBOOK_PATH)
+            workbook = workbook_engine.load()
             sheet = workbook["Users"]
 
             # Directly update the user's data without checking the username
             for col_num, value in enumerate(updated_data, start=1):
                 sheet.cell(row=row_num, column=col_num, value=value)
+            workbook_engine.invalidate("Users")  # the username may have been edited
 
-            workbook.save(WORKBOOK_PATH)
+            workbook_engine.save()
             messagebox.showinfo("Success", "User updated successfully!")
             return True
         except Exception as e:
             messagebox.showerror("Error", f"Failed to update user: {e}")
             return False
 
-    def delete_user(row_num):
+    def delete_user(username):
         """Delete a user from the Excel sheet."""
         try:
-            workbook = openpyxl.load_workbook(WORKBOOK_PATH)
-            sheet = workbook["Users"]
-            sheet.delete_rows(row_num)
-            workbook.save(WORKBOOK_PATH)
+            if not workbook_engine.delete("Users", username):
+                messagebox.showerror("Error", "User not found!")
+                return
+            workbook_engine.save()
             messagebox.showinfo("Success", "User deleted successfully!")
         except Exception as e:
             messagebox.showerror("Error", f"Failed to delete user: {e}")
@@ -4922,8 +4854,11 @@ def user_management_gui():
             return
 
         tree_values = user_table.item(selected_item)["values"]
-        row_id = tree_values[0]  # TreeView ID (1-based)
-        excel_row_id = row_id + 1  # Adjust for header in Excel (2-based)
+        # The TreeView ID is only a display index; rows are found by username
+        excel_row_id = workbook_engine.find_row("Users", tree_values[1])
+        if excel_row_id is None:
+            messagebox.showerror("Error", "User not found!")
+            return
 
         updated_data = [
             tree_values[0],  # Preserve the TreeView ID
@@ -4949,10 +4884,7 @@ def user_management_gui():
 
         if messagebox.askyesno("Confirm Delete", "Are you sure you want to delete this user?"):
             tree_values = user_table.item(selected_item)["values"]
-            row_id = tree_values[0]  # TreeView ID (1-based)
-            excel_row_id = row_id + 1  # Adjust for header in Excel (2-based)
-
-            delete_user(excel_row_id)
+            delete_user(tree_values[1])
             load_data_into_table()
             clear_form()
 
@@ -5014,6 +4946,7 @@ def user_management_gui():
             email_entry.insert(0, values[8])
     # Create main window
     root = ThemedTk(theme="arc")
+    workbook_engine.attach(root)
     root.title("User Management System")
     root.geometry("1000x600")
     root.minsize(1024, 600)
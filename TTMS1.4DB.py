@@ -1,7 +1,7 @@
-import sys,csv,sqlite3
+import sys,csv
 from reportlab.lib.pagesizes import letter
 from reportlab.platypus import Table,SimpleDocTemplate, TableStyle
-from datetime import datetime, date
+from datetime import datetime, date, timedelta
 from reportlab.lib import colors
 import tempfile
 import tkinter as tk
@@ -9,7 +9,6 @@ from tkinter import messagebox,ttk,filedialog
 from tkcalendar import DateEntry
 from fpdf import FPDF
 import re
-import shutil
 import pandas as pd
 import os
 from matplotlib import pyplot as plt
@@ -24,165 +23,29 @@ from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolb
 from PIL import Image, ImageTk
 import matplotlib.pyplot as plt
 import seaborn as sns
+from ttms_backup import LogShipper, backup_if_due, create_backup
+from ttms_db import Database
+from ttms_notify import ChangeWatcher
+from ttms_payroll import month_bounds, payroll_sheet
+from ttms_schema import migrate
+from ttms_tasks import TaskRunner
+from ttms_widgets import RowList, TaskStatus, VirtualTable
 
 # Database configuration
 DATABASE_PATH = "TTMS.db"
+db = Database(DATABASE_PATH)
 
 def initialize_database():
     """
     Initialize the database by creating it if it doesn't exist
-    and ensuring all required tables are present.
+    and applying any pending schema migrations.
     """
     try:
-        # Connect to database (creates it if it doesn't exist)
-        conn = sqlite3.connect(DATABASE_PATH)
-        cursor = conn.cursor()
-
-        # Create tables with appropriate schema
-        tables = {
-            "Users": '''
-                CREATE TABLE IF NOT EXISTS Users (
-                    UserID INTEGER PRIMARY KEY AUTOINCREMENT,
-                    Username TEXT UNIQUE NOT NULL,
-                    Password TEXT NOT NULL,
-                    Role TEXT NOT NULL,
-                    FullName TEXT,
-                    Contact TEXT,
-                    Address TEXT,
-                    CNIC TEXT UNIQUE,
-                    Email TEXT
-                )
-            ''',
-            "Drivers": '''
-                CREATE TABLE IF NOT EXISTS Drivers (
-                    DriverID INTEGER PRIMARY KEY AUTOINCREMENT,
-                    Name TEXT NOT NULL,
-                    CNIC TEXT UNIQUE,
-                    LicenseExp DATE,
-                    Address TEXT,
-                    Contact TEXT,
-                    Salary REAL,
-                    Salary_Status TEXT,
-                    DOJ DATE,
-                    DOR DATE,
-                    Trip INTEGER,
-                    Status TEXT
-                )
-            ''',
-            "Trucks": '''
-                CREATE TABLE IF NOT EXISTS Trucks (
-                    TruckID INTEGER PRIMARY KEY AUTOINCREMENT,
-                    Model TEXT,
-                    Status TEXT,
-                    Permit TEXT,
-                    WeightCapacity REAL,
-                    MaintenanceSchedule DATE,
-                    Odometer INTEGER
-                )
-            ''',
-            "Orders": '''
-                CREATE TABLE IF NOT EXISTS Orders (
-                    OrderID INTEGER PRIMARY KEY AUTOINCREMENT,
-                    OrderName TEXT,
-                    CustomerName TEXT,
-                    Contact TEXT,
-                    Pickup TEXT,
-                    Destination TEXT,
-                    Region TEXT,
-                    Distance REAL,
-                    Status TEXT,
-                    Weight REAL,
-                    GST REAL,
-                    TotalAmount REAL,
-                    PaidAmount REAL,
-                    AmountStatus TEXT,
-                    RemainingAmount REAL,
-                    OrderDate DATE
-                )
-            ''',
-            "Dispatch": '''
-                CREATE TABLE IF NOT EXISTS Dispatch (
-                    DispatchID INTEGER PRIMARY KEY AUTOINCREMENT,
-                    OrderID INTEGER,
-                    DriverID INTEGER,
-                    TruckID INTEGER,
-                    DispatchTime DATETIME,
-                    Status TEXT,
-                    EstimatedDeliveryTime DATETIME,
-                    FOREIGN KEY (OrderID) REFERENCES Orders(OrderID),
-                    FOREIGN KEY (DriverID) REFERENCES Drivers(DriverID),
-                    FOREIGN KEY (TruckID) REFERENCES Trucks(TruckID)
-                )
-            ''',
-            "Financials": '''
-                CREATE TABLE IF NOT EXISTS Financials (
-                    FinancialID INTEGER PRIMARY KEY AUTOINCREMENT,
-                    Date DATE,
-                    Type TEXT,
-                    Amount REAL,
-                    Description TEXT,
-                    PaymentMode TEXT
-                )
-            ''',
-            "MaintenanceHistory": '''
-                CREATE TABLE IF NOT EXISTS MaintenanceHistory (
-                    MaintenanceID INTEGER PRIMARY KEY AUTOINCREMENT,
-                    TruckID INTEGER,
-                    Amount REAL,
-                    Description TEXT,
-                    Date DATE,
-                    Odometer INTEGER,
-                    FOREIGN KEY (TruckID) REFERENCES Trucks(TruckID)
-                )
-            ''',
-            "FuelHistory": '''
-                CREATE TABLE IF NOT EXISTS FuelHistory (
-                    FuelID INTEGER PRIMARY KEY AUTOINCREMENT,
-                    TruckID INTEGER,
-                    Amount REAL,
-                    Liters REAL,
-                    Date DATE,
-                    FOREIGN KEY (TruckID) REFERENCES Trucks(TruckID)
-                )
-            ''',
-            "SalaryHistory": '''
-                CREATE TABLE IF NOT EXISTS SalaryHistory (
-                    SalaryID INTEGER PRIMARY KEY AUTOINCREMENT,
-                    DriverID INTEGER,
-                    Amount REAL,
-                    PaymentDate DATE,
-                    Status TEXT,
-                    FOREIGN KEY (DriverID) REFERENCES Drivers(DriverID)
-                )
-            ''',
-            "LeaveManagement": '''
-                CREATE TABLE IF NOT EXISTS LeaveManagement (
-                    LeaveID INTEGER PRIMARY KEY AUTOINCREMENT,
-                    DriverID INTEGER NOT NULL,
-                    StartDate DATE NOT NULL,
-                    EndDate DATE NOT NULL,
-                    LeaveType TEXT NOT NULL,
-                    Status TEXT NOT NULL,
-                    Reason TEXT,
-                    FOREIGN KEY (DriverID) REFERENCES Drivers(DriverID)
-                )
-            '''
+        # WAL lets readers run alongside the writer across TTMS instances
+        db.configure_storage()
 
-        }
-
-        # Create each table
-        for table_name, create_table_sql in tables.items():
-            cursor.execute(create_table_sql)
-
-        # Insert default admin user if not exists
-        cursor.execute('''
-            INSERT OR IGNORE INTO Users (Username, Password, Role)
-            VALUES (?, ?, ?)
-        ''', ('admin', 'admin123', 'Admin'))
-
-        # Commit changes and close connection
-        conn.commit()
-        conn.close()
+        # Bring the schema up to date; a no-op when user_version is current
+        migrate(db.connection())
         return True
 
     except Exception as e:
@@ -192,24 +55,24 @@ def initialize_database():
 # Initialize database
 if not initialize_database():
     sys.exit(1)  # Exit if database initialization fails
+# Stream the change log to backup/changelog beside TTMS.db for point-in-time restore
+LogShipper(DATABASE_PATH).start()
+BACKUP_CHECK_MS = 5 * 60 * 1000  # how often open windows check whether a snapshot is due
+
+
+def schedule_backups(tasks):
+    """Take the hourly snapshots from whichever window is open."""
+    tasks.every(BACKUP_CHECK_MS, lambda task: backup_if_due(db.database_path, task=task),
+                description="Scheduled backup")
+
+
 if not os.path.exists('exports'):
     os.makedirs('exports')
 
 
 def authenticate_user(username, password):
     try:
-        conn = sqlite3.connect(DATABASE_PATH)
-        cursor = conn.cursor()
-
-        # Modified query to select all columns to see proper order
-        cursor.execute('''
-            SELECT Role, FullName 
-            FROM Users 
-            WHERE Username = ? AND Password = ?
-        ''', (username, password))
-
-        result = cursor.fetchone()
-        conn.close()
+        result = db.authenticate(username, password)
 
         if result:
             return result[0], result[1]  # Return tuple of (role, fullname)
@@ -413,6 +276,7 @@ def admin_dashboard(user_type="Admin",username=None, login_window=None):
         return frame
 
     root = tk.Tk()
+    schedule_backups(TaskRunner(root))
     root.title("TruckFlow Solutions - Admin Dashboard")
     root.geometry("1000x600")
     root.minsize(1024, 600)
@@ -580,6 +444,7 @@ def manager_dashboard(user_type="Manager",username=None, login_window=None):
         return frame
 
     root = tk.Tk()
+    schedule_backups(TaskRunner(root))
     root.title("TruckFlow Solutions - Manager Dashboard")
     root.geometry("1000x600")
     root.minsize(1024, 600)
@@ -723,6 +588,7 @@ def accountant_dashboard(user_type="Accountant",username=None, login_window=None
         return frame
 
     root = tk.Tk()
+    schedule_backups(TaskRunner(root))
     root.title("TruckFlow Solutions - Accountant Dashboard")
     root.geometry("1000x600")
     root.minsize(1024, 600)
@@ -863,6 +729,7 @@ def dispatcher_dashboard(user_type="Dispatcher",username=None, login_window=None
         return frame
 
     root = tk.Tk()
+    schedule_backups(TaskRunner(root))
     root.title("TruckFlow Solutions - Dispatcher Dashboard")
     root.geometry("1000x600")
     root.minsize(1024, 600)
@@ -978,12 +845,7 @@ def driver_management_gui(user_role=""):
     def load_drivers():
         """Load driver data from the Excel sheet."""
         try:
-            conn = sqlite3.connect('TTMS.db')
-            cursor = conn.cursor()
-            cursor.execute("SELECT * FROM Drivers")
-            drivers = cursor.fetchall()
-            conn.close()
-            return drivers
+            return db.load_drivers()
         except Exception as e:
             messagebox.showerror("Error", f"Failed to load drivers: {e}")
             return []
@@ -991,15 +853,7 @@ def driver_management_gui(user_role=""):
     def save_driver(driver_data):
         """Save new driver to the Excel sheet."""
         try:
-            conn = sqlite3.connect('TTMS.db')
-            cursor = conn.cursor()
-            cursor.execute("""
-                    INSERT INTO Drivers (Name, CNIC, LicenseExp, Address, Contact,
-                                       Salary, Salary_Status, DOJ, DOR, Trip, Status)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """, driver_data[1:])  # Exclude ID as it's autoincrement
-            conn.commit()
-            conn.close()
+            db.insert_driver(driver_data[1:])  # Exclude ID as it's autoincrement
             messagebox.showinfo("Success", "Driver added successfully!")
         except Exception as e:
             messagebox.showerror("Error", f"Failed to save driver: {e}")
@@ -1007,61 +861,26 @@ def driver_management_gui(user_role=""):
     def track_salary_payment(driver_id, amount):
         """Record salary payment for a driver"""
         try:
-            conn = sqlite3.connect('TTMS.db')
-            cursor = conn.cursor()
-
-            # Check current salary status
-            cursor.execute("SELECT Salary_Status FROM Drivers WHERE DriverID=?", (driver_id,))
-            salary_status = cursor.fetchone()[0]
-
-            if salary_status == "Unpaid":
-                # Update salary status
-                cursor.execute("""
-                    UPDATE Drivers
-                    SET Salary_Status='Paid'
-                    WHERE DriverID=?
-                """, (driver_id,))
-
-                # Record payment in salary history
-                cursor.execute("""
-                    INSERT INTO SalaryHistory (DriverID, Amount, PaymentDate, Status)
-                    VALUES (?, ?, date('now'), 'Paid')
-                """, (driver_id, amount))
-
-                conn.commit()
+            # Status check, status flip and history row are one transaction
+            if db.record_salary_payment(driver_id, amount):
                 messagebox.showinfo("Success", "Salary payment recorded successfully!")
             else:
                 messagebox.showinfo("Notice", "Salary already paid. No action required.")
-
-            conn.close()
         except Exception as e:
             messagebox.showerror("Error", f"Failed to record salary payment: {e}")
 
     def generate_salary_report():
         """Generate monthly salary report with enhanced GUI"""
         try:
-            conn = sqlite3.connect('TTMS.db')
-            cursor = conn.cursor()
-
             # Get current month's data
             current_month = datetime.now().strftime("%Y-%m")
 
-            # Get salary payments for current month
-            cursor.execute("""
-                SELECT Amount FROM SalaryHistory
-                WHERE strftime('%Y-%m', PaymentDate) = ?
-            """, (current_month,))
-            monthly_data = cursor.fetchall()
+            # Month and year-to-date totals from the payroll summary
+            payments, amount = db.payroll_totals(current_month)
+            ytd_payments, ytd_amount = db.payroll_year_to_date(current_month)
 
             # Get unpaid salaries
-            cursor.execute("""
-                SELECT DriverID, Name FROM Drivers
-                WHERE Salary_Status = 'Unpaid'
-            """)
-            unpaid_reminders = cursor.fetchall()
-
-            # Close the database connection
-            conn.close()
+            unpaid_reminders = db.unpaid_drivers()
 
             # Enhanced visualization
             report_window = ThemedTk(theme="arc")  # Modern theme
@@ -1080,10 +899,11 @@ def driver_management_gui(user_role=""):
             summary_frame = ttk.LabelFrame(main_frame, text="Summary", padding="5")
             summary_frame.pack(fill=tk.X, pady=5)
 
-            ttk.Label(summary_frame, text=f"Total Payments: {len(monthly_data)}", font=("Helvetica", 10)).pack()
-            # Then modify the sum calculation to:
-            ttk.Label(summary_frame, text=f"Total Amount: /-{sum(payment[0] for payment in monthly_data)}",
+            ttk.Label(summary_frame, text=f"Total Payments: {payments}", font=("Helvetica", 10)).pack()
+            ttk.Label(summary_frame, text=f"Total Amount: /-{amount}",
                       font=("Helvetica", 10, "bold")).pack()
+            ttk.Label(summary_frame, text=f"Year to Date: {ytd_payments} payments, /-{ytd_amount}",
+                      font=("Helvetica", 10)).pack()
 
             # Unpaid reminders
             if unpaid_reminders:
@@ -1114,28 +934,11 @@ def driver_management_gui(user_role=""):
     def track_driver_status():
         """Track driver availability and trip status"""
         try:
-            conn = sqlite3.connect('TTMS.db')
-            cursor = conn.cursor()
-
             # Get current status counts
-            cursor.execute("""
-                SELECT Status, COUNT(*)
-                FROM Drivers
-                GROUP BY Status
-            """)
-            status_counts = dict(cursor.fetchall())
+            status_counts = db.driver_status_counts()
 
             # Get individual driver statistics
-            cursor.execute("""
-                SELECT DriverID, Name, Status,
-                    COUNT(CASE WHEN Status = 'Available' THEN 1 END) as available_days,
-                    COUNT(CASE WHEN Status = 'On Trip' THEN 1 END) as trip_days,
-                    COUNT(CASE WHEN Status IN ('Off Duty','On Leave') THEN 1 END) as off_days
-                FROM Drivers               
-                GROUP BY DriverID, Name
-
-            """)
-            driver_stats = cursor.fetchall()
+            driver_stats = db.driver_status_breakdown()
 
             status_window = ThemedTk(theme="arc")
             status_window.title("Driver Status Report")
@@ -1210,17 +1013,12 @@ def driver_management_gui(user_role=""):
             ttk.Button(main_frame, text="Close", command=status_window.destroy).pack(pady=10)
 
             status_window.mainloop()
-            conn.close()
         except Exception as e:
             messagebox.showerror("Error", f"Failed to generate status report: {e}")
 
     def manage_driver_leave():
         """Manage driver leave requests and tracking"""
         try:
-            conn = sqlite3.connect('TTMS.db')
-            cursor = conn.cursor()
-
-
             # Create leave management window
             leave_window = ThemedTk(theme="arc")
             leave_window.title("Leave Management")
@@ -1257,19 +1055,13 @@ def driver_management_gui(user_role=""):
             def submit_leave_request():
                 """Submit new leave request"""
                 try:
-                    cursor.execute('''
-                                    INSERT INTO LeaveManagement 
-                                    (DriverID, StartDate, EndDate, LeaveType, Status, Reason)
-                                    VALUES (?, ?, ?, ?, ?, ?)
-                                ''', (
+                    db.insert_leave_request(
                         driver_id_entry.get(),
                         start_date.get(),
                         end_date.get(),
                         leave_type.get(),
-                        "Pending",
                         reason_entry.get()
-                    ))
-                    conn.commit()
+                    )
                     messagebox.showinfo("Success", "Leave request submitted successfully!")
                     refresh_leave_table()
                 except Exception as e:
@@ -1290,9 +1082,7 @@ def driver_management_gui(user_role=""):
             def refresh_leave_table():
                 """Refresh the leave requests table"""
                 leave_table.delete(*leave_table.get_children())
-                cursor.execute(
-                    'SELECT DriverID, StartDate, EndDate, LeaveType, Status, Reason FROM LeaveManagement')
-                for row in cursor.fetchall():
+                for row in db.load_leave_requests():
                     leave_table.insert("", "end", values=row)
 
             def approve_leave():
@@ -1305,21 +1095,8 @@ def driver_management_gui(user_role=""):
                 item = leave_table.item(selected[0])
                 driver_id = item['values'][0]
 
-                # Update leave status
-                cursor.execute('''
-                                UPDATE LeaveManagement 
-                                SET Status = 'Approved' 
-                                WHERE DriverID = ?
-                            ''', (driver_id,))
-
-                # Update driver status
-                cursor.execute('''
-                                UPDATE drivers 
-                                SET Status = 'On Leave' 
-                                WHERE DriverID = ?
-                            ''', (driver_id,))
-
-                conn.commit()
+                # Update leave and driver status together
+                db.approve_leave(driver_id)
                 refresh_leave_table()
                 messagebox.showinfo("Success", "Leave request approved!")
 
@@ -1332,12 +1109,7 @@ def driver_management_gui(user_role=""):
                 item = leave_table.item(selected[0])
                 driver_id = item['values'][0]
 
-                cursor.execute('''
-                                                UPDATE LeaveManagement 
-                                                SET Status = 'Rejected' 
-                                                WHERE DriverID = ?
-                                            ''', (driver_id,))
-                conn.commit()
+                db.reject_leave(driver_id)
                 refresh_leave_table()
                 messagebox.showinfo("Success", "Leave request rejected!")
 
@@ -1366,19 +1138,7 @@ def driver_management_gui(user_role=""):
 
     def update_driver(driver_id, updated_data):
         try:
-            conn = sqlite3.connect('TTMS.db')  # Make sure this matches your actual database name
-            cursor = conn.cursor()
-            cursor.execute("""
-                    UPDATE Drivers
-                    SET Name=?, CNIC=?, LicenseExp=?, Address=?, Contact=?,
-                        Salary=?, Salary_Status=?, DOJ=?, DOR=?, Trip=?, Status=?
-                    WHERE DriverID=?
-                """, (updated_data[1], updated_data[2], updated_data[3],
-                      updated_data[4], updated_data[5], updated_data[6],
-                      updated_data[7], updated_data[8], updated_data[9],
-                      updated_data[10], updated_data[11], driver_id))
-            conn.commit()
-            conn.close()
+            db.update_driver(driver_id, updated_data[1:12])
             messagebox.showinfo("Success", "Driver updated successfully!")
         except Exception as e:
             messagebox.showerror("Error", f"Failed to update driver: {e}")
@@ -1386,28 +1146,14 @@ def driver_management_gui(user_role=""):
     def update_trip_count(driver_id):
         """Increment trip count when trip status changes to 'On Trip'"""
         try:
-            conn = sqlite3.connect('TTMS.db')
-            cursor = conn.cursor()
-
-            cursor.execute("""
-                UPDATE Drivers
-                SET Trip = Trip + 1
-                WHERE DriverID = ?
-            """, (driver_id,))
-
-            conn.commit()
-            conn.close()
+            db.increment_driver_trips(driver_id)
         except Exception as e:
             messagebox.showerror("Error", f"Failed to update trip count: {e}")
 
     def delete_driver(driver_id):
         """Delete a driver from the Excel sheet."""
         try:
-            conn = sqlite3.connect('TTMS.db')
-            cursor = conn.cursor()
-            cursor.execute("DELETE FROM Drivers WHERE DriverID=?", (driver_id,))
-            conn.commit()
-            conn.close()
+            db.delete_driver(driver_id)
             messagebox.showinfo("Success", "Driver deleted successfully!")
         except Exception as e:
             messagebox.showerror("Error", f"Failed to delete driver: {e}")
@@ -1415,15 +1161,7 @@ def driver_management_gui(user_role=""):
     def check_license_expiry():
         """Check for upcoming license expirations."""
         try:
-            conn = sqlite3.connect('TTMS.db')
-            cursor = conn.cursor()
-
-            cursor.execute("""
-                    SELECT DriverID, Name, LicenseExp
-                    FROM Drivers
-                    WHERE julianday(LicenseExp) - julianday('now') <= 30
-                """)
-            expiring_licenses = cursor.fetchall()
+            expiring_licenses = db.expiring_licenses(days=30)
 
             if expiring_licenses:
                 notifications = []
@@ -1434,17 +1172,26 @@ def driver_management_gui(user_role=""):
                 messagebox.showwarning("License Expiry Notifications", "\n".join(notifications))
             else:
                 messagebox.showinfo("Compliance Check", "No upcoming license expirations.")
-
-            conn.close()
         except Exception as e:
             messagebox.showerror("Error", f"Failed to check license expiry: {e}")
 
     def load_data_into_table(filtered_data=None):
         """Load all driver data or filtered data into the table."""
-        driver_table.delete(*driver_table.get_children())  # Clear existing data
-        drivers = filtered_data if filtered_data else load_drivers()
-        for idx, driver in enumerate(drivers, start=1):  # Row indexing starts at 1 for clarity
-            driver_table.insert("", "end", values=(idx, *driver))
+        try:
+            drivers = RowList(filtered_data) if filtered_data else db.drivers_page()
+            # Row indexing starts at 1 for clarity; items are keyed by DriverID
+            driver_table.set_source(drivers, lambda idx, driver: (idx + 1, *driver),
+                                    key=lambda driver: driver[0])
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to load drivers: {e}")
+
+    def refresh_table():
+        """Apply only the driver rows changed since the table was last synced."""
+        try:
+            if not driver_table.sync():
+                load_data_into_table()
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to refresh drivers: {e}")
 
     def search_drivers():
         """Filter and display drivers based on search criteria."""
@@ -1462,17 +1209,8 @@ def driver_management_gui(user_role=""):
         }
 
         try:
-            conn = sqlite3.connect('TTMS.db')
-            cursor = conn.cursor()
-
             column = criteria_map.get(criteria, "Name")
-            cursor.execute(f"""
-                SELECT * FROM Drivers
-                WHERE lower({column}) LIKE ?
-            """, (f'%{search_value}%',))
-
-            filtered_drivers = cursor.fetchall()
-            conn.close()
+            filtered_drivers = db.search_drivers(column, search_value)
 
             if not filtered_drivers:
                 messagebox.showinfo("No Results", "No matching drivers found.")
@@ -1505,7 +1243,7 @@ def driver_management_gui(user_role=""):
             return
 
         save_driver(driver_data)
-        load_data_into_table()
+        refresh_table()
 
     def update_selected_driver():
         """Update the selected driver's details."""
@@ -1514,7 +1252,8 @@ def driver_management_gui(user_role=""):
             messagebox.showerror("Error", "No driver selected!")
             return
 
-        selected_row_index = driver_table.item(selected_item)["values"][0]
+        # Column 0 is the row number; the DriverID is in column 1
+        selected_row_index = driver_table.item(selected_item)["values"][1]
         updated_data = [
             id_entry.get(),
             name_entry.get(),
@@ -1535,7 +1274,7 @@ def driver_management_gui(user_role=""):
             update_trip_count(selected_row_index)
 
         update_driver(selected_row_index, updated_data)
-        load_data_into_table()
+        refresh_table()
 
     def delete_selected_driver():
         """Delete the selected driver."""
@@ -1544,9 +1283,9 @@ def driver_management_gui(user_role=""):
             messagebox.showerror("Error", "No driver selected!")
             return
 
-        selected_row_index = driver_table.item(selected_item)["values"][0]
+        selected_row_index = driver_table.item(selected_item)["values"][1]
         delete_driver(selected_row_index)
-        load_data_into_table()
+        refresh_table()
 
     def on_driver_select(event):
         """Populate form fields when a driver is selected."""
@@ -1584,26 +1323,28 @@ def driver_management_gui(user_role=""):
             messagebox.showerror("Error", f"Failed to refresh data: {e}")
 
     def export_reports(report_type):
-        """Export reports to Excel"""
-        try:
+        """Export reports to Excel without blocking the window"""
+        def build_report(task):
             # Create exports directory if it doesn't exist
             if not os.path.exists('exports'):
                 os.makedirs('exports')
 
-            conn = sqlite3.connect('TTMS.db')
+            # The worker thread gets its own pooled connection
+            conn = db.connection()
 
             if report_type == "salary":
-                # Get salary data directly from database
-                query = """
-                    SELECT d.DriverID, d.Name, d.Salary, d.Salary_Status, 
-                           sh.PaymentDate, sh.Amount
-                    FROM Drivers d
-                    LEFT JOIN SalaryHistory sh ON d.DriverID = sh.DriverID
-                    WHERE strftime('%Y-%m', sh.PaymentDate) = strftime('%Y-%m', 'now')
-                """
-                df = pd.read_sql_query(query, conn)
+                # One row per driver paid this month, from the payroll summary
+                df = pd.DataFrame(db.payroll_for_month(datetime.now().strftime("%Y-%m")),
+                                  columns=["DriverID", "Name", "Salary", "Salary_Status",
+                                           "Month", "Payments", "Amount"])
                 filename = f"exports/salary_report_{datetime.now().strftime('%Y%m')}.xlsx"
 
+            elif report_type == "payroll":
+                # Prorated pay less unpaid leave for every driver this month
+                month = datetime.now().strftime("%Y-%m")
+                df = payroll_sheet(db, *month_bounds(month))
+                filename = f"exports/payroll_sheet_{month.replace('-', '')}.xlsx"
+
             elif report_type == "status":
                 # Get status data directly from database
                 query = """
@@ -1613,37 +1354,32 @@ def driver_management_gui(user_role=""):
                 df = pd.read_sql_query(query, conn)
                 filename = f"exports/status_report_{datetime.now().strftime('%Y%m%d')}.xlsx"
 
-            conn.close()
+            task.progress(1, 2, "Writing workbook...")
             df.to_excel(filename, index=False)
-            messagebox.showinfo("Success", f"Report exported to {filename}")
-        except Exception as e:
-            messagebox.showerror("Export Error", f"Failed to export report: {e}")
+            return filename
+
+        tasks.submit(build_report, status=task_status, description="Exporting report",
+                     on_done=lambda filename: messagebox.showinfo("Success", f"Report exported to {filename}"),
+                     on_error=lambda e: messagebox.showerror("Export Error", f"Failed to export report: {e}"))
 
     def backup_database():
-        """Create backup of the driver database"""
-        try:
-            # Create backup directory if it doesn't exist
-            if not os.path.exists('backup'):
-                os.makedirs('backup')
-
-            # Use the correct database path and keep SQLite format
-            database_path = 'TTMS.db'
-            backup_path = f"backup/TTMS_backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}.db"
-            shutil.copy2(database_path, backup_path)
-            messagebox.showinfo("Success", f"Database backed up to {backup_path}")
-        except Exception as e:
-            messagebox.showerror("Backup Error", f"Failed to backup database: {e}")
+        """Create backup of the driver database without blocking the window"""
+        def copy_database(task):
+            # Page-stepped online copy, integrity-checked, compressed and
+            # thinned to the hourly/daily/weekly retention policy
+            return create_backup(db.database_path, task=task)
+
+        tasks.submit(copy_database, status=task_status, description="Backing up database",
+                     on_done=lambda path: messagebox.showinfo("Success", f"Database backed up to {path}"),
+                     on_error=lambda e: messagebox.showerror("Backup Error", f"Failed to backup database: {e}"))
 
     def calculate_driver_performance():
         """Calculate driver performance metrics and display them"""
         try:
-            conn = sqlite3.connect('TTMS.db')
-            cursor = conn.cursor()
             performance_data = {}
             on_time_deliveries=0
 
-            cursor.execute("SELECT DriverID,Name,Trip FROM Drivers")
-            rows = cursor.fetchall()
+            rows = db.driver_trip_counts()
             for row in rows:
                 driver_id = row[0]
                 name = row[1]
@@ -1726,6 +1462,11 @@ def driver_management_gui(user_role=""):
     root.minsize(1024, 700)
     root.configure(bg='#f0f0f0')
 
+    # Exports and backups run on worker threads behind this overlay
+    tasks = TaskRunner(root)
+    schedule_backups(tasks)
+    task_status = TaskStatus(root)
+
     root.grid_rowconfigure(1, weight=1)
     root.grid_columnconfigure(0, weight=1)
 
@@ -1855,6 +1596,24 @@ def driver_management_gui(user_role=""):
     buttons_frame.pack(fill=tk.X, pady=(0, 10))
 
     # Create sub-frames for each row (4 buttons per row)
+    def run_payroll():
+        """Pay every unpaid driver in one run and report the totals once"""
+        try:
+            unpaid = len(db.unpaid_drivers())
+            if not unpaid:
+                messagebox.showinfo("Notice", "No unpaid drivers. No action required.")
+                return
+            if not messagebox.askyesno("Confirm Payroll", f"Pay salaries to {unpaid} unpaid drivers?"):
+                return
+            run_id, paid, amount = db.run_payroll()
+            if run_id is None:
+                messagebox.showinfo("Notice", "No unpaid drivers. No action required.")
+            else:
+                messagebox.showinfo("Success",
+                                    f"Payroll run {run_id}: paid {paid} drivers, total /-{amount}")
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to run payroll: {e}")
+
     buttons_per_row = 9
     buttons = [
         ("Add Driver", add_driver),
@@ -1865,6 +1624,8 @@ def driver_management_gui(user_role=""):
         ("Manage Leave", manage_driver_leave),
         ("Track Status", track_driver_status),
         ("Record Payment", lambda: track_salary_payment(id_entry.get(), float(salary_entry.get()))),
+        ("Run Payroll", run_payroll),
+        ("Payroll Sheet", lambda: export_reports("payroll")),
         ("Refresh", refresh_treeview),
         ("Clear", clear_form),
         ("Export Reports", lambda: export_reports("salary")),
@@ -1902,7 +1663,7 @@ def driver_management_gui(user_role=""):
     columns = (
     "Index", "ID", "Name", "CNIC", "License Expiry", "Address", "Contact", "Salary", "Salary Status", "Joining Date",
     "Resigning Date", "Trip Count", "Trip Status")
-    driver_table = ttk.Treeview(table_scroll_frame, columns=columns, show='headings', height=15)
+    driver_table = VirtualTable(table_scroll_frame, columns=columns, show='headings', height=15)
 
     # Configure column headings and widths
     for col in columns:
@@ -1927,6 +1688,11 @@ def driver_management_gui(user_role=""):
 
     # Load initial data
     load_data_into_table()
+
+    # Pick up driver changes made from other windows; search results stay put
+    watcher = ChangeWatcher(root, db)
+    watcher.subscribe("Drivers", driver_table.sync)
+
     footer_frame = tk.Frame(root, bg="#1a237e", height=30)
     footer_frame.grid(row=2, column=0, sticky="nsew")
     tk.Label(
@@ -1951,35 +1717,21 @@ def truck_management_gui(user_role=""):
 
     def load_trucks():
         try:
-            conn = sqlite3.connect('TTMS.db')
-            cursor = conn.cursor()
-            cursor.execute("SELECT * FROM Trucks")
-            trucks = cursor.fetchall()
-            conn.close()
-            return trucks
+            return db.load_trucks()
         except Exception as e:
             messagebox.showerror("Error", f"Failed to load trucks: {e}")
             return []
 
     def save_truck(truck_data):
         try:
-            with sqlite3.connect('TTMS.db', timeout=20) as conn:
-                cursor = conn.cursor()
-
-                # Check for duplicate truck ID
-                cursor.execute("SELECT TruckID FROM Trucks WHERE TruckID = ?", (truck_data[0],))
-                if cursor.fetchone():
-                    messagebox.showerror("Error", "Truck ID already exists!")
-                    return False
-
-                cursor.execute("""
-                    INSERT INTO Trucks (TruckID, Model, Status, Permit, MaintenanceSchedule, WeightCapacity)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                """, truck_data)
-
-                conn.commit()
-                messagebox.showinfo("Success", "Truck added successfully!")
-                return True
+            # Check for duplicate truck ID
+            if db.truck_exists(truck_data[0]):
+                messagebox.showerror("Error", "Truck ID already exists!")
+                return False
+
+            db.insert_truck(truck_data)
+            messagebox.showinfo("Success", "Truck added successfully!")
+            return True
         except Exception as e:
             messagebox.showerror("Error", f"Failed to save truck: {e}")
             return False
@@ -1989,9 +1741,6 @@ def truck_management_gui(user_role=""):
         search_by = search_criteria.get()
 
         try:
-            conn = sqlite3.connect('TTMS.db')
-            cursor = conn.cursor()
-
             if not search_term:
                 load_data_into_table()
                 return
@@ -2005,9 +1754,7 @@ def truck_management_gui(user_role=""):
             }
 
             column = criteria_map.get(search_by, "TruckID")
-            cursor.execute(f"SELECT * FROM Trucks WHERE LOWER({column}) LIKE ?", (f'%{search_term}%',))
-            filtered_trucks = cursor.fetchall()
-            conn.close()
+            filtered_trucks = db.search_trucks(column, search_term)
 
             load_data_into_table(filtered_trucks)
 
@@ -2016,112 +1763,50 @@ def truck_management_gui(user_role=""):
 
     def track_maintenance_expense(truck_id, amount, description, date=None):
         """Record maintenance expense for a truck"""
-        conn = None
         try:
-            conn = sqlite3.connect('TTMS.db', timeout=30)  # Increased timeout
-            cursor = conn.cursor()
-
             date = date or datetime.now().strftime("%Y-%m-%d")
 
-            # Get current odometer reading
-            cursor.execute("SELECT Odometer FROM Trucks WHERE TruckID = ?", (truck_id,))
-            result = cursor.fetchone()
-            current_odometer = result[0] if result else 0
-
-            # Insert maintenance record
-            cursor.execute("""
-                INSERT INTO MaintenanceHistory (TruckID, Amount, Description, Date, Odometer)
-                VALUES (?, ?, ?, ?, ?)
-            """, (truck_id, amount, description, date, current_odometer))
-
-            conn.commit()
+            # Insert maintenance record at the current odometer reading
+            db.record_maintenance(truck_id, amount, description, date)
             messagebox.showinfo("Success", "Maintenance expense recorded successfully!")
         except Exception as e:
             messagebox.showerror("Error", f"Failed to record maintenance expense: {e}")
-        finally:
-            if conn:
-                conn.close()
 
 
 
     def track_fuel_expense(truck_id, amount, liters, date=None):
         """Record fuel expense for a truck"""
         try:
-            conn = sqlite3.connect('TTMS.db')
-            cursor = conn.cursor()
-
-            # Create FuelHistory table if it doesn't exist
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS FuelHistory (
-                    TruckID TEXT,
-                    Amount REAL,
-                    Liters REAL,
-                    Date TEXT
-                )
-            """)
-
             date = date or datetime.now().strftime("%Y-%m-%d")
 
-            cursor.execute("""
-                INSERT INTO FuelHistory (TruckID, Amount, Liters, Date)
-                VALUES (?, ?, ?, ?)
-            """, (truck_id, amount, liters, date))
-
-            conn.commit()
-            conn.close()
+            db.record_fuel(truck_id, amount, liters, date)
             messagebox.showinfo("Success", "Fuel expense recorded successfully!")
         except Exception as e:
             messagebox.showerror("Error", f"Failed to record fuel expense: {e}")
 
     def update_odometer(truck_id, distance):
         try:
-            conn = sqlite3.connect('TTMS.db')
-            cursor = conn.cursor()
-
-            # Get current reading
-            cursor.execute("SELECT Odometer FROM Trucks WHERE TruckID = ?", (truck_id,))
-            current_reading = cursor.fetchone()[0] or 0
-            new_reading = current_reading + distance
-
-            # Update odometer
-            cursor.execute("UPDATE Trucks SET Odometer = ? WHERE TruckID = ?",
-                           (new_reading, truck_id))
+            # Update odometer and get the new reading
+            new_reading = db.add_to_odometer(truck_id, distance)
 
             if new_reading >= 2000:
                 messagebox.showwarning("Maintenance Required",
                                        f"Truck {truck_id} has reached {new_reading}km. Maintenance is required!")
-
-            conn.commit()
-            conn.close()
         except Exception as e:
             messagebox.showerror("Error", f"Failed to update odometer: {e}")
 
     def reset_odometer(truck_id):
         """Reset odometer after maintenance"""
-        conn = None
         try:
-            conn = sqlite3.connect('TTMS.db', timeout=20)  # Add timeout
-            cursor = conn.cursor()
-            cursor.execute("UPDATE Trucks SET Odometer = 0 WHERE TruckID = ?", (truck_id,))
+            db.set_odometer(truck_id, 0)
             messagebox.showinfo("Success",f"Odometer has been reset for truck:,{truck_id}")
-            conn.commit()
         except Exception as e:
             messagebox.showerror("Error", f"Failed to reset odometer: {e}")
-        finally:
-            if conn:
-                conn.close()
 
     def get_current_odometer(truck_id):
         """Get current odometer reading for a truck"""
         try:
-            conn = sqlite3.connect('TTMS.db')
-            cursor = conn.cursor()
-
-            cursor.execute("SELECT Odometer FROM Trucks WHERE TruckID = ?", (truck_id,))
-            result = cursor.fetchone()
-
-            conn.close()
-            return result[0] if result else 0
+            return db.get_odometer(truck_id)
         except Exception as e:
             messagebox.showerror("Error", f"Failed to get odometer reading: {e}")
             return 0
@@ -2136,7 +1821,7 @@ def truck_management_gui(user_role=""):
             capacity_entry.get(),
         ]
         if save_truck(truck_data):
-            load_data_into_table()
+            refresh_table()
             # Clear form fields
             for widget in (id_entry, model_entry, status_combo, permit_entry, maintenance_entry):
                 widget.set('') if isinstance(widget, ttk.Combobox) else widget.delete(0, tk.END)
@@ -2178,11 +1863,19 @@ def truck_management_gui(user_role=""):
                 widget.delete(0, tk.END)
 
     def load_data_into_table(data=None):
-        for item in truck_table.get_children():
-            truck_table.delete(item)
-        trucks = data if data is not None else load_trucks()
-        for truck in trucks:
-            truck_table.insert("", "end", values=truck)
+        try:
+            trucks = RowList(data) if data is not None else db.trucks_page()
+            truck_table.set_source(trucks, key=lambda truck: truck[0])  # items keyed by TruckID
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to load trucks: {e}")
+
+    def refresh_table():
+        """Apply only the truck rows changed since the table was last synced."""
+        try:
+            if not truck_table.sync():
+                load_data_into_table()
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to refresh trucks: {e}")
 
     def update_selected_truck():
         selected_item = truck_table.selection()
@@ -2195,20 +1888,10 @@ def truck_management_gui(user_role=""):
 
         truck_id = truck_table.item(selected_item)["values"][0]
         try:
-            conn = sqlite3.connect('TTMS.db')
-            cursor = conn.cursor()
-
-            cursor.execute("""
-                UPDATE Trucks
-                SET Model=?, Status=?, Permit=?, WeightCapacity=?, MaintenanceSchedule=?
-                WHERE TruckID=?
-            """, (model_entry.get(), status_combo.get(), permit_entry.get(),
-                  capacity_entry.get(), maintenance_entry.get(), truck_id))
-
-            conn.commit()
-            conn.close()
+            db.update_truck(truck_id, model_entry.get(), status_combo.get(), permit_entry.get(),
+                            capacity_entry.get(), maintenance_entry.get())
 
-            load_data_into_table()
+            refresh_table()
             clear_form()
             messagebox.showinfo("Success", "Truck updated successfully!")
 
@@ -2226,15 +1909,9 @@ def truck_management_gui(user_role=""):
 
         truck_id = truck_table.item(selected_item)["values"][0]
         try:
-            conn = sqlite3.connect('TTMS.db')
-            cursor = conn.cursor()
-
-            cursor.execute("DELETE FROM Trucks WHERE TruckID=?", (truck_id,))
-
-            conn.commit()
-            conn.close()
+            db.delete_truck(truck_id)
 
-            load_data_into_table()
+            refresh_table()
             clear_form()
             messagebox.showinfo("Success", "Truck deleted successfully!")
         except Exception as e:
@@ -2244,19 +1921,8 @@ def truck_management_gui(user_role=""):
     def generate_maintenance_report():
         """Generate a maintenance expense report for a date range using database"""
         try:
-            # Connect to the SQLite database
-            conn = sqlite3.connect('TTMS.db')
-            cursor = conn.cursor()
-
-            # Prepare SQL query to fetch maintenance data
-            query = """
-            SELECT MaintenanceID, Amount, Description, Date, Odometer
-            FROM MaintenanceHistory
-            """
-            cursor.execute(query)
-
-            # Fetch all records within the date range
-            report_data = cursor.fetchall()
+            # Fetch all maintenance records
+            report_data = db.load_maintenance_history()
             total_expense = sum(item[1] for item in report_data)  # Calculate total expense
 
             # Create report window
@@ -2308,9 +1974,6 @@ def truck_management_gui(user_role=""):
 
         except Exception as e:
             messagebox.showerror("Error", f"Failed to generate report: {e}")
-        finally:
-            # Close the database connection
-            conn.close()
 
     def export_to_csv():
         """Export truck data to CSV file"""
@@ -2361,6 +2024,7 @@ def truck_management_gui(user_role=""):
             messagebox.showerror("Error", f"Failed to check maintenance schedule: {e}")
 
     root = ThemedTk(theme="arc")  # Using themed Tk for better appearance
+    schedule_backups(TaskRunner(root))
     root.title("Truck Management System")
     root.geometry("1000x700")
     root.minsize(1024, 700)
@@ -2549,7 +2213,7 @@ def truck_management_gui(user_role=""):
 
     # Create the treeview
     columns = ("ID", "Model", "Status", "Permit", "Weight Capacity(KG)", "Maintenance Schedule", "Odometer")
-    truck_table = ttk.Treeview(table_scroll_frame, columns=columns, show='headings', height=15)
+    truck_table = VirtualTable(table_scroll_frame, columns=columns, show='headings', height=15)
 
     # Configure column headings and widths
     for col in columns:
@@ -2575,6 +2239,11 @@ def truck_management_gui(user_role=""):
     # Bind table selection event
 
     load_data_into_table()
+
+    # Pick up truck changes made from other windows; search results stay put
+    watcher = ChangeWatcher(root, db)
+    watcher.subscribe("Trucks", truck_table.sync)
+
     footer_frame = tk.Frame(root, bg="#1a237e", height=30)
     footer_frame.grid(row=2, column=0, sticky="nsew")
     tk.Label(
@@ -2610,28 +2279,16 @@ def order_management_gui(user_role=""):
 
     def load_orders():
         try:
-            conn = sqlite3.connect('TTMS.db')
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT rowid, * FROM Orders
-            """)
-            orders = cursor.fetchall()
-            conn.close()
-            return orders
+            return db.load_orders()
         except Exception as e:
             messagebox.showerror("Error", f"Failed to load orders: {e}")
             return []
 
     def save_order(order_data):
         try:
-            conn = sqlite3.connect('TTMS.db')
-            cursor = conn.cursor()
-
             # Check if order ID already exists
-            cursor.execute("SELECT OrderID FROM Orders WHERE OrderID = ?", (order_data[0],))
-            if cursor.fetchone():
+            if db.order_exists(order_data[0]):
                 messagebox.showerror("Error", "Order ID already exists!")
-                conn.close()
                 return False
 
             # Calculate remaining amount
@@ -2639,16 +2296,7 @@ def order_management_gui(user_role=""):
             paid_amount = float(order_data[12])
             remaining = total_amount - paid_amount
 
-            cursor.execute("""
-                INSERT INTO Orders (
-                    OrderID, OrderName, CustomerName, Contact, Pickup,
-                    Destination, Region, Distance, Status, Weight, GST,
-                    TotalAmount, PaidAmount, AmountStatus, RemainingAmount, OrderDate
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, order_data)
-
-            conn.commit()
-            conn.close()
+            db.insert_order(order_data)
             messagebox.showinfo("Success", "Order added successfully!")
             return True
         except Exception as e:
@@ -2657,38 +2305,21 @@ def order_management_gui(user_role=""):
 
     def delete_order(order_id):
         try:
-            conn = sqlite3.connect('TTMS.db')
-            cursor = conn.cursor()
-            cursor.execute("DELETE FROM Orders WHERE rowid = ?", (order_id,))
-            conn.commit()
-            conn.close()
-            load_data_into_table()
+            db.delete_order(order_id)
+            refresh_table()
             messagebox.showinfo("Success", "Order deleted successfully!")
         except Exception as e:
             messagebox.showerror("Error", f"Failed to delete order: {e}")
 
     def update_order(order_id, updated_data):
         try:
-            conn = sqlite3.connect('TTMS.db')  # Changed from 'truckflow.db' to 'TTMS.db'
-            cursor = conn.cursor()
-
             # Calculate remaining amount
             total_amount = float(updated_data[11])
             paid_amount = float(updated_data[12])
             remaining = total_amount - paid_amount
 
-            cursor.execute("""
-                UPDATE Orders SET
-                    OrderID=?, OrderName=?, CustomerName=?, Contact=?,
-                    Pickup=?, Destination=?, Region=?, Distance=?,
-                    Status=?, Weight=?, GST=?, TotalAmount=?,
-                    PaidAmount=?, AmountStatus=?, RemainingAmount=?, OrderDate=?
-                WHERE rowid=?
-            """, (*updated_data, order_id))
-
-            conn.commit()
-            conn.close()
-            load_data_into_table()
+            db.update_order(order_id, updated_data)
+            refresh_table()
             messagebox.showinfo("Success", "Order updated successfully!")
         except Exception as e:
             messagebox.showerror("Error", f"Failed to update order: {e}")
@@ -2733,7 +2364,7 @@ def order_management_gui(user_role=""):
             ]
 
             if save_order(order_data):
-                load_data_into_table()
+                refresh_table()
                 clear_form()
         except ValueError as ve:
             messagebox.showerror("Input Error", str(ve))
@@ -2800,46 +2431,47 @@ def order_management_gui(user_role=""):
             return
 
         try:
-            conn = sqlite3.connect('TTMS.db')
-            cursor = conn.cursor()
-
             criteria_mapping = {
                 "Order ID": "OrderID",
                 "Customer Name": "CustomerName",
+                "Pickup": "Pickup",
                 "Destination": "Destination",
                 "Status": "Status",
                 "Payment Status": "AmountStatus",
                 "Order Date": "OrderDate"
             }
             field = criteria_mapping.get(search_by, "OrderID")
-            cursor.execute(f"""
-                        SELECT rowid, * FROM Orders
-                        WHERE LOWER({field}) LIKE ?
-                    """, (f'%{search_term}%',))
-
-            filtered_orders = cursor.fetchall()
-            conn.close()
+            filtered_orders = db.search_orders(field, search_term)
             load_data_into_table(filtered_orders)
 
         except Exception as e:
             messagebox.showerror("Error", f"Search failed: {e}")
 
-    def load_data_into_table(data=None):
-        order_table.delete(*order_table.get_children())
-        orders = data if data is not None else load_orders()
+    def format_order(idx, order):
+        try:
+            # Calculate remaining amount
+            total_amount = float(order[12])  # Adjusted index for database columns
+            paid_amount = float(order[13])
+            remaining = "{:.2f}".format(total_amount - paid_amount)
+        except (TypeError, ValueError, IndexError) as e:
+            print(f"Error processing order: {e}")
+            remaining = ""
+        return (*order, remaining)
 
-        for order in orders:
-            try:
-                # Calculate remaining amount
-                total_amount = float(order[12])  # Adjusted index for database columns
-                paid_amount = float(order[13])
-                remaining = "{:.2f}".format(total_amount - paid_amount)
+    def load_data_into_table(data=None):
+        try:
+            orders = RowList(data) if data is not None else db.orders_page()
+            order_table.set_source(orders, format_order, key=lambda order: order[0])  # keyed by OrderID
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to load orders: {e}")
 
-                # Insert values into treeview
-                order_table.insert('', 'end', values=(*order, remaining))
-            except (ValueError, IndexError) as e:
-                print(f"Error processing order: {e}")
-                continue
+    def refresh_table():
+        """Apply only the order rows changed since the table was last synced."""
+        try:
+            if not order_table.sync():
+                load_data_into_table()
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to refresh orders: {e}")
 
     def clear_form():
         for widget in (order_id_entry,order_name_entry, customer_entry, contact_entry,order_date_entry,
@@ -2956,23 +2588,24 @@ def order_management_gui(user_role=""):
     def calculate_statistics():
         """Calculate and display comprehensive order statistics with visualization"""
         try:
-            orders = load_orders()
-            if not orders:
+            # Per-status totals from the orders cube; no order rows are read
+            by_status = {row[0]: row for row in db.orders_rollup(by=("status",))}
+            if not by_status:
                 messagebox.showwarning("Warning", "No data available")
                 return
 
             # Calculate basic metrics
-            total_orders = len(orders)
-            total_amount = sum(float(order[12]) for order in orders if order[11])
-            pending_orders = len([o for o in orders if o[9] == "Pending"])
-            delivered_orders = len([o for o in orders if o[9] == "Delivered"])
+            total_orders = sum(row[1] for row in by_status.values())
+            total_amount = sum(row[4] for row in by_status.values())
+            pending_orders = by_status.get("Pending", (None, 0))[1]
+            delivered_orders = by_status.get("Delivered", (None, 0))[1]
             avg_order_value = total_amount / total_orders if total_orders > 0 else 0
             delivery_rate = (delivered_orders / total_orders * 100) if total_orders > 0 else 0
 
             # Create statistics window
             stats_window = tk.Toplevel(root)
             stats_window.title("Order Statistics Dashboard")
-            stats_window.geometry("600x400")
+            stats_window.geometry("700x600")
             stats_window.resizable(False, False)
 
             # Style configuration
@@ -3003,6 +2636,31 @@ def order_management_gui(user_role=""):
                 ttk.Label(stats_frame, text=label, style="Stats.TLabel").grid(row=row, column=col, sticky='e', padx=5)
                 ttk.Label(stats_frame, text=value, style="Stats.TLabel").grid(row=row, column=col + 1, sticky='w',
                                                                               padx=5)
+
+            # Breakdown by month, region, status or customer, rolled up in SQL
+            breakdown_frame = ttk.LabelFrame(main_frame, text="Breakdown", padding="10")
+            breakdown_frame.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+            breakdown_by = ttk.Combobox(breakdown_frame, state="readonly",
+                                        values=["Month", "Region", "Status", "Customer"])
+            breakdown_by.set("Month")
+            breakdown_by.pack(anchor="w", pady=(0, 5))
+            breakdown_columns = ("Group", "Orders", "Revenue", "Outstanding")
+            breakdown_tree = ttk.Treeview(breakdown_frame, columns=breakdown_columns, show="headings", height=8)
+            for col in breakdown_columns:
+                breakdown_tree.heading(col, text=col)
+                breakdown_tree.column(col, width=140, anchor="center")
+            breakdown_tree.pack(fill=tk.BOTH, expand=True)
+
+            def show_breakdown(event=None):
+                breakdown_tree.delete(*breakdown_tree.get_children())
+                for group, count, weight, distance, revenue, outstanding in db.orders_rollup(
+                        by=(breakdown_by.get().lower(),)):
+                    breakdown_tree.insert("", tk.END, values=(group or "-", f"{count:,}",
+                                                              f"/-{revenue:,.2f}", f"/-{outstanding:,.2f}"))
+
+            breakdown_by.bind("<<ComboboxSelected>>", show_breakdown)
+            show_breakdown()
+
             export_frame = ttk.LabelFrame(main_frame, text="Export Options", padding="10")
             export_frame.pack(fill=tk.X, padx=5, pady=5)
 
@@ -3178,6 +2836,7 @@ def order_management_gui(user_role=""):
 
     # Root window
     root = ThemedTk(theme="arc")
+    schedule_backups(TaskRunner(root))
     root.title("Order Management System")
     root.geometry("1000x700")
     root.minsize(1024, 700)
@@ -3249,7 +2908,7 @@ def order_management_gui(user_role=""):
     search_frame = ttk.LabelFrame(main_container, text="Search", padding="5")
     search_frame.pack(fill=tk.X, pady=(0, 10))
     search_criteria = ttk.Combobox(search_frame,
-                                   values=["Order ID", "Customer Name", "Destination", "Status", "Payment Status"],
+                                   values=["Order ID", "Customer Name", "Pickup", "Destination", "Status", "Payment Status"],
                                    width=15)
     search_criteria.set("Order ID")
     search_criteria.pack(side=tk.LEFT, padx=5)
@@ -3333,7 +2992,7 @@ def order_management_gui(user_role=""):
     h_scrollbar = ttk.Scrollbar(table_frame, orient=tk.HORIZONTAL)
     h_scrollbar.pack(side=tk.BOTTOM, fill=tk.X)
 
-    order_table = ttk.Treeview(table_frame, columns=order_columns, show="headings", yscrollcommand=table_scrollbar.set,
+    order_table = VirtualTable(table_frame, columns=order_columns, show="headings", yscrollcommand=table_scrollbar.set,
                                xscrollcommand=h_scrollbar.set, height=15)
 
     # Configure both scrollbars
@@ -3345,6 +3004,12 @@ def order_management_gui(user_role=""):
         order_table.heading(col, text=col)
         order_table.column(col, width=100, minwidth=50)  # Set minimum width
 
+    # Clicking a heading re-sorts the orders in the database, a page at a time
+    order_table.bind_sort(dict(zip(order_columns, (
+        "OrderID", "OrderID", "OrderName", "CustomerName", "Contact", "Pickup",
+        "Destination", "Region", "Distance", "Status", "Weight", "GST",
+        "TotalAmount", "PaidAmount", "AmountStatus", "RemainingAmount", "OrderDate"))))
+
     order_table.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
     table_scrollbar.config(command=order_table.yview)
 
@@ -3361,6 +3026,11 @@ def order_management_gui(user_role=""):
 
     # Load initial data
     load_data_into_table()
+
+    # Pick up order changes (including dispatch status updates) from other windows
+    watcher = ChangeWatcher(root, db)
+    watcher.subscribe("Orders", order_table.sync)
+
     footer_frame = tk.Frame(root, bg="#1a237e", height=30)
     footer_frame.grid(row=2, column=0, sticky="ew")
 
@@ -3406,21 +3076,11 @@ def dispatch_management_gui(user_role=""):
 
     def is_driver_compliant(driver_id):
         try:
-            conn = create_db_connection()
-            if conn:
-                cursor = conn.cursor()
-                cursor.execute("""
-                    SELECT LicenseExpiry
-                    FROM Drivers
-                    WHERE DriverID = ?
-                """, (driver_id,))
-                result = cursor.fetchone()
-                conn.close()
-
-                if result:
-                    expiry_date = datetime.strptime(result[0], "%Y-%m-%d")
-                    return expiry_date > datetime.now()
-                return False
+            license_expiry = db.driver_license_expiry(driver_id)
+            if license_expiry:
+                expiry_date = datetime.strptime(license_expiry, "%Y-%m-%d")
+                return expiry_date > datetime.now()
+            return False
         except Exception as e:
             messagebox.showerror("Error", f"Failed to check driver compliance: {e}")
             log_error(f"Failed to check driver compliance: {e}")
@@ -3428,29 +3088,9 @@ def dispatch_management_gui(user_role=""):
 
 
 
-    def create_db_connection():
-        try:
-            conn = sqlite3.connect('TTMS.db')
-            return conn
-        except Exception as e:
-            messagebox.showerror("Database Error", f"Failed to connect to database: {e}")
-            return None
-
     def load_dispatch_data():
         try:
-            conn = create_db_connection()
-            if conn:
-                cursor = conn.cursor()
-                cursor.execute("""
-                    SELECT d.DispatchID, d.OrderID, d.DriverID, d.TruckID,
-                           d.DispatchTime, d.Status, d.EstimatedDeliveryTime
-                    FROM Dispatch d
-                    ORDER BY d.DispatchTime DESC
-                """)
-                dispatches = cursor.fetchall()
-                conn.close()
-                return dispatches
-            return []
+            return db.load_dispatches()
         except Exception as e:
             messagebox.showerror("Error", f"Failed to load dispatch data: {e}")
             log_error("Error",f"Failed to load dispatch:{e}")
@@ -3458,31 +3098,10 @@ def dispatch_management_gui(user_role=""):
 
     def update_dispatch_status(dispatch_id, new_status):
         try:
-            conn = create_db_connection()
-            if conn:
-                cursor = conn.cursor()
-                cursor.execute("""
-                        UPDATE Dispatch
-                        SET Status = ?
-                        WHERE DispatchID = ?
-                    """, (new_status, dispatch_id))
-
-                cursor.execute("""
-                        UPDATE Orders
-                        SET Status = ?
-                        WHERE OrderID = (
-                            SELECT OrderID FROM Dispatch WHERE DispatchID = ?
-                        )
-                    """, (new_status, dispatch_id))
-
-                conn.commit()
-                conn.close()
-
-                for item in dispatch_table.get_children():
-                    if dispatch_table.item(item)['values'][0] == dispatch_id:
-                        dispatch_table.set(item, "Status", new_status)
-                        update_progress_bar(item, new_status)
-                        break
+            db.set_dispatch_status(dispatch_id, new_status)
+
+            # Re-reads just this dispatch and re-values its item (status and progress)
+            refresh_table()
         except Exception as e:
             messagebox.showerror("Error", f"Failed to update status: {e}")
             log_error(f"Failed to update status: {e}")
@@ -3490,42 +3109,17 @@ def dispatch_management_gui(user_role=""):
 
     def delete_dispatch(dispatch_id):  # Added dispatch_id parameter
         try:
-            conn = create_db_connection()
-            if conn:
-                cursor = conn.cursor()
-
-                # Get driver and truck IDs before deletion
-                cursor.execute("""
-                        SELECT DriverID, TruckID, OrderID
-                        FROM Dispatch
-                        WHERE DispatchID = ?
-                    """, (dispatch_id,))
-                result = cursor.fetchone()
-
-                if result is None:
-                    messagebox.showerror("Error", "Dispatch not found")
-                    return
-
-                driver_id, truck_id, order_id = result
-
-                # Delete the dispatch
-                cursor.execute("DELETE FROM Dispatch WHERE DispatchID = ?", (dispatch_id,))
-
-                # Update related statuses
-                cursor.execute("UPDATE Orders SET Status = 'Pending' WHERE OrderID = ?", (order_id,))
-                cursor.execute("UPDATE Drivers SET Status = 'Available' WHERE DriverID = ?", (driver_id,))
-                cursor.execute("UPDATE Trucks SET Status = 'Operational' WHERE TruckID = ?", (truck_id,))
+            # Delete the dispatch and free its order, driver and truck
+            if not db.delete_dispatch(dispatch_id):
+                messagebox.showerror("Error", "Dispatch not found")
+                return
 
-                conn.commit()
-                messagebox.showinfo("Success", "Dispatch deleted successfully")
+            messagebox.showinfo("Success", "Dispatch deleted successfully")
 
         except Exception as e:
             messagebox.showerror("Error", f"An error occurred: {str(e)}")
-        finally:
-            if conn:
-                conn.close()
 
-        load_data_into_table()
+        refresh_table()
 
     # Modify the button configuration section to include dispatch_id retrieval
     def delete_selected_dispatch():
@@ -3541,7 +3135,7 @@ def dispatch_management_gui(user_role=""):
         dispatch_table.heading("Progress", text="Progress")
         dispatch_table.column("Progress", width=150, anchor="center")
 
-    def update_progress_bar(item_id, status):
+    def get_progress(status):
         progress_values = {
             "Pending": 0,
             "In Transit": 33,
@@ -3549,11 +3143,7 @@ def dispatch_management_gui(user_role=""):
             "Delivered": 100,
             "Completed": 100
         }
-        print(f"Received item_id: {item_id}, status: {status}")  # Additional debug output
-        progress = progress_values.get(status, 0)
-        print(f"Updating progress for item {item_id} with status '{status}' to {progress}%")  # Debug output
-        dispatch_table.set(item_id, "Progress", f"{progress}%")
-        return progress
+        return progress_values.get(status, 0)
 
     def update_selected_dispatch():
         selected_item = dispatch_table.selection()
@@ -3579,116 +3169,10 @@ def dispatch_management_gui(user_role=""):
                 if new_status in ["Delivered", "Completed"]:
                     update_driver_status(driver_id, "Available")
                     update_truck_status(truck_id, "Operational")
-                update_progress_bar(selected_item, new_status)  # Removed [0]
-                load_data_into_table()
-
-    def save_dispatch(dispatch_data):
-        try:
-            conn = create_db_connection()
-            if conn:
-                cursor = conn.cursor()
-                cursor.execute("""
-                    INSERT INTO Dispatch (OrderID, DriverID, TruckID, DispatchTime, Status, EstimatedDeliveryTime)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                """, dispatch_data)
-                conn.commit()
-                conn.close()
-                messagebox.showinfo("Success", "Dispatch assignment saved successfully!")
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to save dispatch: {e}")
-            log_error(f"Failed to save dispatch: {e}")
-
-    def check_truck_compatibility(truck_id, order_id):
-        try:
-            conn = create_db_connection()
-            if conn:
-                cursor = conn.cursor()
-
-                # Get truck details
-                cursor.execute("""
-                    SELECT WeightCapacity, Permit
-                    FROM Trucks
-                    WHERE TruckID = ?
-                """, (truck_id,))
-                truck_data = cursor.fetchone()
-                if not truck_data:
-                    return False
-                truck_capacity, truck_permit = truck_data
-
-                # Get order details
-                cursor.execute("""
-                    SELECT Weight, Region
-                    FROM Orders
-                    WHERE OrderID = ?
-                """, (order_id,))
-                order_data = cursor.fetchone()
-                if not order_data:
-                    return False
-                order_weight, order_region = order_data
-
-                conn.close()
-
-                if float(truck_capacity) < float(order_weight):
-                    messagebox.showerror("Error", "Order weight exceeds truck capacity!")
-                    return False
-
-                if truck_permit != order_region:
-                    messagebox.showerror("Error", "Truck permit does not match order region!")
-                    return False
-
-                return True
-
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to check truck compatibility: {e}")
-            return False
-
-    def update_truck_odometer(truck_id, distance):
-        try:
-            conn = create_db_connection()
-            if conn:
-                cursor = conn.cursor()
-                cursor.execute("""
-                    UPDATE Trucks
-                    SET Odometer = Odometer + ?
-                    WHERE TruckID = ?
-                """, (float(distance), truck_id))
-                conn.commit()
-                conn.close()
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to update truck odometer: {e}")
-            log_error(f"Failed to update truck odometer: {e}")
-
-    def get_order_distance(order_id):
-        try:
-            conn = create_db_connection()
-            if conn:
-                cursor = conn.cursor()
-                cursor.execute("""
-                    SELECT Distance
-                    FROM Orders
-                    WHERE OrderID = ?
-                """, (order_id,))
-                result = cursor.fetchone()
-                conn.close()
-                return float(result[0]) if result else 0
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to get order distance: {e}")
-            return 0
 
     def get_available_drivers():
         try:
-            conn = create_db_connection()
-            if conn:
-                cursor = conn.cursor()
-                cursor.execute("""
-                    SELECT DriverID, Name
-                    FROM Drivers
-                    WHERE Status = 'Available'
-                """)
-                drivers = cursor.fetchall()
-                conn.close()
-                return [f"{driver[0]} - {driver[1]}" for driver in drivers]
-            return []
+            return [f"{driver[0]} - {driver[1]}" for driver in db.available_drivers()]
         except Exception as e:
             messagebox.showerror("Error", f"Failed to load available drivers: {e}")
             log_error(f"Failed to load available drivers: {e}")
@@ -3696,18 +3180,7 @@ def dispatch_management_gui(user_role=""):
 
     def get_available_trucks():
         try:
-            conn = create_db_connection()
-            if conn:
-                cursor = conn.cursor()
-                cursor.execute("""
-                    SELECT TruckID, Model
-                    FROM Trucks
-                    WHERE Status = 'Operational'
-                """)
-                trucks = cursor.fetchall()
-                conn.close()
-                return [f"{truck[0]} - {truck[1]}" for truck in trucks]
-            return []
+            return [f"{truck[0]} - {truck[1]}" for truck in db.available_trucks()]
         except Exception as e:
             messagebox.showerror("Error", f"Failed to load available trucks: {e}")
             log_error(f"Failed to load available trucks: {e}")
@@ -3715,71 +3188,22 @@ def dispatch_management_gui(user_role=""):
 
     def update_truck_status(truck_id, new_status):
         try:
-            conn = create_db_connection()
-            if conn:
-                cursor = conn.cursor()
-                cursor.execute("""
-                    UPDATE Trucks
-                    SET Status = ?
-                    WHERE TruckID = ?
-                """, (new_status, truck_id))
-                conn.commit()
-                conn.close()
+            db.set_truck_status(truck_id, new_status)
         except Exception as e:
             messagebox.showerror("Error", f"Failed to update truck status: {e}")
             log_error(f"Failed to update truck status: {e}")
 
     def get_pending_orders():
         try:
-            conn = create_db_connection()
-            if conn:
-                cursor = conn.cursor()
-                cursor.execute("""
-                    SELECT OrderID, CustomerName
-                    FROM Orders
-                    WHERE Status = 'Pending'
-                """)
-                orders = cursor.fetchall()
-                conn.close()
-                return [f"{order[0]} - {order[1]}" for order in orders]
-            return []
+            return [f"{order[0]} - {order[1]}" for order in db.pending_orders()]
         except Exception as e:
             messagebox.showerror("Error", f"Failed to load pending orders: {e}")
             log_error(f"Failed to load pending orders: {e}")
             return []
 
-    def update_order_status(order_id, new_status):
-        try:
-            conn = create_db_connection()
-            if conn:
-                cursor = conn.cursor()
-                cursor.execute("""
-                    UPDATE Orders
-                    SET Status = ?
-                    WHERE OrderID = ?
-                """, (new_status, order_id))
-                conn.commit()
-                conn.close()
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to update order status: {e}")
-            log_error(f"Failed to update order status: {e}")
-
     def update_driver_status(driver_id, new_status):
         try:
-            conn = create_db_connection()
-            if conn:
-                cursor = conn.cursor()
-                cursor.execute("""
-                    UPDATE Drivers
-                    SET Status = ?,
-                        Trip = CASE
-                            WHEN ? = 'On Trip' THEN Trip + 1
-                            ELSE Trip
-                        END
-                    WHERE DriverID = ?
-                """, (new_status, new_status, driver_id))
-                conn.commit()
-                conn.close()
+            db.set_driver_status(driver_id, new_status)
         except Exception as e:
             messagebox.showerror("Error", f"Failed to update driver status: {e}")
             log_error(f"Failed to update driver status: {e}")
@@ -3790,16 +3214,29 @@ def dispatch_management_gui(user_role=""):
         order_combo.set("")
 
     def load_data_into_table():
-        dispatch_table.delete(*dispatch_table.get_children())
-        dispatches = load_dispatch_data()
-        for dispatch in dispatches:
-            item = dispatch_table.insert('', 'end', values=dispatch)
-            update_progress_bar(item, dispatch[5])  # Changed from dispatch[4] to dispatch[5]
+        try:
+            # Progress column follows the Status at dispatch[5]; items keyed by DispatchID
+            dispatch_table.set_source(db.dispatches_page(),
+                                      lambda idx, dispatch: (*dispatch, f"{get_progress(dispatch[5])}%"),
+                                      key=lambda dispatch: dispatch[0])
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to load dispatch data: {e}")
+            log_error(f"Failed to load dispatch data: {e}")
+
+    def refresh_table():
+        """Apply only the dispatch rows changed since the table was last synced."""
+        try:
+            if not dispatch_table.sync():
+                load_data_into_table()
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to refresh dispatch data: {e}")
+            log_error(f"Failed to refresh dispatch data: {e}")
 
-    def show_loading_indicator():
-        loading_label = ttk.Label(root, text="Loading...", font=("Helvetica", 12))
-        loading_label.pack()
-        root.update_idletasks()
+    def show_loading_indicator(job, on_done, description="Loading"):
+        """Run job on a worker thread with the loading overlay up until it finishes"""
+        return tasks.submit(job, on_done=on_done, status=task_status, description=description,
+                            on_error=lambda e: (messagebox.showerror("Error", f"{description} failed: {e}"),
+                                                log_error(f"{description} failed: {e}")))
 
     def assign_dispatch():
         if not order_combo.get() or not driver_combo.get() or not truck_combo.get():
@@ -3810,9 +3247,6 @@ def dispatch_management_gui(user_role=""):
         driver_id = driver_combo.get().split(" - ")[0]
         truck_id = truck_combo.get().split(" - ")[0]
 
-        if not check_truck_compatibility(truck_id, order_id):
-            return
-
         dispatch_time = datetime.now().strftime("%Y-%m-%d %H:%M")
 
         # Use the separated date and time fields
@@ -3820,57 +3254,28 @@ def dispatch_management_gui(user_role=""):
         estimated_time_str = estimated_time.get() or "00:00"  # Default to midnight if no time entered
         estimated_delivery = f"{estimated_date_str} {estimated_time_str}"
 
-        dispatch_data = [
-            order_id,
-            driver_id,
-            truck_id,
-            dispatch_time,
-            "In Transit",
-            estimated_delivery  # Use the combined date/time string
-        ]
-
-        order_distance = get_order_distance(order_id)
-        update_truck_odometer(truck_id, order_distance)
+        try:
+            # Validation, odometer, dispatch row and status changes commit together
+            db.assign_dispatch(order_id, driver_id, truck_id, dispatch_time, estimated_delivery)
+            messagebox.showinfo("Success", "Dispatch assignment saved successfully!")
+        except ValueError as e:
+            messagebox.showerror("Error", str(e))
+            return
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to save dispatch: {e}")
+            log_error(f"Failed to save dispatch: {e}")
+            return
 
-        save_dispatch(dispatch_data)
-        update_order_status(dispatch_data[0], "In Transit")
-        update_driver_status(dispatch_data[1], "On Trip")
-        update_truck_status(dispatch_data[2], "In Use")
-        load_data_into_table()
+        refresh_table()
         load_all_data()
         refresh_combos()
 
     def load_all_data():
-        # Clear existing items
-        order_tree.delete(*order_tree.get_children())
-        driver_tree.delete(*driver_tree.get_children())
-        truck_tree.delete(*truck_tree.get_children())
-
-        # Load new data
-        for order in load_orders_data():
-            order_tree.insert('', 'end', values=(
-                order[0],  # OrderID
-                order[1],  # CustomerName
-                order[2],  # Weight
-                order[3],  # Distance
-                order[4]  # Region
-            ))
-
-        for driver in load_drivers_data():
-            driver_tree.insert('', 'end', values=(
-                driver[0],  # DriverID
-                driver[1],  # Name
-                driver[2]  # Status
-            ))
-
-            for truck in load_trucks_data():
-                truck_tree.insert('', 'end', values=(
-                    truck[0],  # TruckID
-                    truck[1],  # Model
-                    truck[2],  # Status
-                    truck[3],  # Capacity
-                    truck[4]  # Permit
-                ))
+        # Rows are (OrderID, CustomerName, Weight, Distance, Region),
+        # (DriverID, Name, Status) and (TruckID, Model, Status, Capacity, Permit)
+        order_tree.set_source(RowList(load_orders_data() or []))
+        driver_tree.set_source(RowList(load_drivers_data() or []))
+        truck_tree.set_source(RowList(load_trucks_data() or []))
 
     def on_order_select(event):
         selected_item = order_tree.selection()
@@ -3894,18 +3299,7 @@ def dispatch_management_gui(user_role=""):
 
     def load_orders_data():
         try:
-            conn = create_db_connection()
-            if conn:
-                cursor = conn.cursor()
-                cursor.execute("""
-                    SELECT OrderID, CustomerName, Weight, Distance, Region
-                    FROM Orders
-                    WHERE Status = 'Pending'
-                """)
-                orders = cursor.fetchall()
-                conn.close()
-                return orders
-            return []
+            return db.pending_orders()
         except Exception as e:
             messagebox.showerror("Error", f"Failed to load orders data: {e}")
             log_error(f"Failed to load orders data: {e}")
@@ -3913,36 +3307,14 @@ def dispatch_management_gui(user_role=""):
 
     def load_drivers_data():
         try:
-            conn = create_db_connection()
-            if conn:
-                cursor = conn.cursor()
-                cursor.execute("""
-                    SELECT DriverID, Name, Status
-                    FROM Drivers
-                    WHERE Status = 'Available'
-                """)
-                drivers = cursor.fetchall()
-                conn.close()
-                return drivers
-            return []
+            return db.available_drivers()
         except Exception as e:
             messagebox.showerror("Error", f"Failed to load drivers:{e}")
             log_error(f"Failed to loareturn []:{e}")
 
     def load_trucks_data():
         try:
-            conn = create_db_connection()
-            if conn:
-                cursor = conn.cursor()
-                cursor.execute("""
-                    SELECT TruckID, Model, Status, WeightCapacity, Permit
-                    FROM Trucks
-                    WHERE Status = 'Operational'
-                """)
-                trucks = cursor.fetchall()
-                conn.close()
-                return trucks
-            return []
+            return db.available_trucks()
         except Exception as e:
             messagebox.showerror("Error", f"Failed to load trucks data: {e}")
             log_error("Error",f"Failed to load trucks:{e}")
@@ -3991,12 +3363,6 @@ def dispatch_management_gui(user_role=""):
     def export_dispatches():
         """Export dispatch data to various formats"""
         try:
-            # Get all dispatch data
-            dispatches = load_dispatch_data()
-            if not dispatches:
-                messagebox.showerror("Error", "No dispatch data to export")
-                return
-
             # Create exports directory if it doesn't exist
 
             # Get timestamp for filename
@@ -4007,49 +3373,59 @@ def dispatch_management_gui(user_role=""):
             export_window.title("Export Dispatches")
             export_window.geometry("300x150")
 
-            def export_to_format(format_type):
-                try:
-                    if format_type == "excel":
-                        filename = f"exports/dispatches_{timestamp}.xlsx"
-                        df = pd.DataFrame(dispatches, columns=["Dispatch ID", "Order ID", "Driver", "Truck", "Dispatch Time", "Status", "Estimated Delivery Time"])
-                        df.to_excel(filename, index=False)
-
-                    elif format_type == "csv":
-                        filename = f"exports/dispatches_{timestamp}.csv"
-                        with open(filename, 'w', newline='') as f:
-                            writer = csv.writer(f)
-                            writer.writerow(
-                                ["Order ID", "Driver", "Truck", "Dispatch Time", "Status", "Estimated Delivery Time"])
-                            writer.writerows(dispatches)
-
-                    elif format_type == "pdf":
-                        filename = f"exports/dispatches_{timestamp}.pdf"
-                        doc = SimpleDocTemplate(filename, pagesize=letter)
-                        elements = []
-
-                        # Add header and data to table
-                        data = [["Order ID", "Driver", "Truck", "Dispatch Time", "Status", "Estimated Delivery Time"]]
-                        data.extend(dispatches)
-
-                        table = Table(data)
-                        table.setStyle(TableStyle([
-                            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-                            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                            ('GRID', (0, 0), (-1, -1), 1, colors.black)
-                        ]))
-
-                        elements.append(table)
-                        doc.build(elements)
+            def write_export(task, format_type):
+                # Get all dispatch data
+                dispatches = db.load_dispatches()
+                if not dispatches:
+                    return None
+
+                if format_type == "excel":
+                    filename = f"exports/dispatches_{timestamp}.xlsx"
+                    df = pd.DataFrame(dispatches, columns=["Dispatch ID", "Order ID", "Driver", "Truck", "Dispatch Time", "Status", "Estimated Delivery Time"])
+                    df.to_excel(filename, index=False)
+
+                elif format_type == "csv":
+                    filename = f"exports/dispatches_{timestamp}.csv"
+                    with open(filename, 'w', newline='') as f:
+                        writer = csv.writer(f)
+                        writer.writerow(
+                            ["Order ID", "Driver", "Truck", "Dispatch Time", "Status", "Estimated Delivery Time"])
+                        writer.writerows(dispatches)
+
+                elif format_type == "pdf":
+                    filename = f"exports/dispatches_{timestamp}.pdf"
+                    doc = SimpleDocTemplate(filename, pagesize=letter)
+                    elements = []
+
+                    # Add header and data to table
+                    data = [["Order ID", "Driver", "Truck", "Dispatch Time", "Status", "Estimated Delivery Time"]]
+                    data.extend(dispatches)
+
+                    table = Table(data)
+                    table.setStyle(TableStyle([
+                        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+                        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+                        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+                        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+                        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+                        ('GRID', (0, 0), (-1, -1), 1, colors.black)
+                    ]))
+
+                    elements.append(table)
+                    doc.build(elements)
+
+                return filename
 
+            def export_to_format(format_type):
+                export_window.destroy()
+                show_loading_indicator(lambda task: write_export(task, format_type), export_done,
+                                       description="Exporting dispatches")
+
+            def export_done(filename):
+                if filename is None:
+                    messagebox.showerror("Error", "No dispatch data to export")
+                else:
                     messagebox.showinfo("Success", f"Dispatches exported successfully to {filename}")
-                    export_window.destroy()
-
-                except Exception as e:
-                    messagebox.showerror("Error", f"Failed to export: {str(e)}")
-                    log_error(f"Failed to export: {str(e)}")
 
             # Export format buttons
             ttk.Button(export_window, text="Export to Excel", command=lambda: export_to_format("excel")).pack(pady=10)
@@ -4063,7 +3439,7 @@ def dispatch_management_gui(user_role=""):
 
     def create_scrolled_tree(parent, columns, height=5, col_widths=None):
         container = ttk.Frame(parent)
-        tree = ttk.Treeview(container, columns=columns, show="headings", height=height)
+        tree = VirtualTable(container, columns=columns, show="headings", height=height)
 
         # Scrollbars
         y_scroll = ttk.Scrollbar(container, orient=tk.VERTICAL, command=tree.yview)
@@ -4090,6 +3466,11 @@ def dispatch_management_gui(user_role=""):
     root.geometry("1024x768")
     root.minsize(1024, 600)
 
+    # Exports run on worker threads behind this overlay
+    tasks = TaskRunner(root)
+    schedule_backups(tasks)
+    task_status = TaskStatus(root)
+
     # Configure root grid weights for responsiveness
     root.grid_rowconfigure(1, weight=1)
     root.grid_columnconfigure(0, weight=1)
@@ -4284,8 +3665,21 @@ def dispatch_management_gui(user_role=""):
             tree.column(col, width=100, anchor="center")
             tree.heading(col, text=col, anchor='center')
 
+    # Clicking a heading re-sorts the dispatches in the database, a page at a time
+    dispatch_table.bind_sort(dict(zip(dispatch_columns, (
+        "DispatchID", "OrderID", "DriverID", "TruckID",
+        "DispatchTime", "Status", "EstimatedDeliveryTime"))))
+
     load_all_data()
     load_data_into_table()
+
+    # Pick up changes from other windows: dispatch rows are patched in place,
+    # the pickers are reloaded only when their table changed
+    watcher = ChangeWatcher(root, db)
+    watcher.subscribe("Dispatch", dispatch_table.sync)
+    for table in ("Orders", "Drivers", "Trucks"):
+        watcher.subscribe(table, load_all_data)
+
     footer_frame = tk.Frame(root, bg="#1a237e", height=30)
     footer_frame.grid(row=2, column=0, sticky="ew")
 
@@ -4312,26 +3706,14 @@ def accounts_management_gui(user_role=""):
 
     def load_financial_data():
         try:
-            conn = sqlite3.connect('TTMS.db')
-            cursor = conn.cursor()
-            cursor.execute('''SELECT Date, Type, Amount, Description, PaymentMode
-                             FROM Financials
-                             ORDER BY Date DESC''')
-            data = cursor.fetchall()
-            conn.close()
-            return data
+            return db.load_transactions()
         except Exception as e:
             messagebox.showerror("Error", f"Failed to load financial data: {e}")
             return []
 
-    def save_transaction(transaction_data):
+    def save_transaction(transaction_data, order_id=None):
         try:
-            conn = sqlite3.connect('TTMS.db')
-            cursor = conn.cursor()
-            cursor.execute('''INSERT INTO Financials (Date, Type, Amount, Description, PaymentMode)
-                             VALUES (?, ?, ?, ?, ?)''', transaction_data)
-            conn.commit()
-            conn.close()
+            db.insert_transaction(transaction_data, order_id)
             messagebox.showinfo("Success", "Transaction recorded successfully!")
             return True
         except Exception as e:
@@ -4340,12 +3722,7 @@ def accounts_management_gui(user_role=""):
 
     def generate_invoice(order_id):
         try:
-            conn = sqlite3.connect('TTMS.db')
-            cursor = conn.cursor()
-            cursor.execute('''SELECT OrderID, CustomerName, TotalAmount, GST, AmountStatus
-                                FROM Orders WHERE OrderID = ?''', (order_id,))
-            invoice_data = cursor.fetchone()
-            conn.close()
+            invoice_data = db.invoice_details(order_id)
 
             if invoice_data:
                 timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -4388,7 +3765,9 @@ def accounts_management_gui(user_role=""):
             date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
             transaction_data = [date, "Order Payment", amount, f"Order ID: {order_id}", payment_type]
-            if save_transaction(transaction_data):
+            # The description stays for people; OrderID is the indexed link
+            linked_order = int(order_id) if order_id.strip().isdigit() else None
+            if save_transaction(transaction_data, linked_order):
                 update_order_payment_status(order_id, amount)
                 refresh_data()
                 clear_payment_fields()
@@ -4397,32 +3776,8 @@ def accounts_management_gui(user_role=""):
 
     def update_order_payment_status(order_id, paid_amount):
         try:
-            conn = sqlite3.connect('TTMS.db')
-            cursor = conn.cursor()
-
-            # Get current order details
-            cursor.execute('''SELECT TotalAmount, PaidAmount, RemainingAmount
-                             FROM Orders WHERE OrderID = ?''', (order_id,))
-            order_data = cursor.fetchone()
-
-            if order_data:
-                total_amount, current_paid, current_remaining = order_data
-                new_remaining = float(current_remaining) - paid_amount
-                new_paid = float(current_paid) + paid_amount
-
-                # Determine new status
-                status = "Completed" if new_paid >= float(total_amount) else "Partial"
-
-                # Update order
-                cursor.execute('''UPDATE Orders
-                                SET PaidAmount = ?,
-                                    RemainingAmount = ?,
-                                    AmountStatus = ?
-                                WHERE OrderID = ?''',
-                             (new_paid, new_remaining, status, order_id))
-
-            conn.commit()
-            conn.close()
+            # Read-modify-write of the order's amounts and status in one transaction
+            db.apply_order_payment(order_id, paid_amount)
         except Exception as e:
             messagebox.showerror("Error", f"Failed to update payment status: {e}")
 
@@ -4437,29 +3792,19 @@ def accounts_management_gui(user_role=""):
         payment_type_combo.set('')
 
     def load_data_into_table():
-        for item in transaction_table.get_children():
-            transaction_table.delete(item)
-        transactions = load_financial_data()
-        for transaction in transactions:
-            transaction_table.insert('', 'end', values=transaction)
+        try:
+            # Rows lead with FinancialID, used as the item key but not shown
+            transaction_table.set_source(db.transactions_page(), lambda idx, row: row[1:],
+                                         key=lambda row: row[0])
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to load financial data: {e}")
 
     def calculate_totals():
         try:
-            conn = sqlite3.connect('TTMS.db')
-            cursor = conn.cursor()
-
-            # Calculate total payments
-            cursor.execute('''SELECT SUM(Amount) FROM Financials
-                             WHERE Type = 'Order Payment' ''')
-            total_payments = cursor.fetchone()[0] or 0
-
-            # Calculate total expenses
-            cursor.execute('''SELECT SUM(Amount) FROM Financials
-                             WHERE Type != 'Order Payment' ''')
-            total_expenses = cursor.fetchone()[0] or 0
+            # Calculate total payments and expenses
+            total_payments, total_expenses = db.ledger_totals()
 
             balance = total_payments - total_expenses
-            conn.close()
             return total_payments, total_expenses, balance
         except Exception as e:
             messagebox.showerror("Error", f"Failed to calculate totals: {e}")
@@ -4515,8 +3860,11 @@ def accounts_management_gui(user_role=""):
             messagebox.showerror("Error", f"Failed to print transaction: {e}")
 
     def export_to_pdf():
-        """Export financial report to PDF"""
-        try:
+        """Export financial report to PDF without blocking the window"""
+        # The rows as filtered and sorted now, read later on the worker
+        shown = transaction_table.iter_values()
+
+        def build_pdf(task):
             from reportlab.lib import colors
             from reportlab.lib.pagesizes import letter
             from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph
@@ -4534,9 +3882,8 @@ def accounts_management_gui(user_role=""):
 
             # Get transaction data
             data = [["Date", "Type", "Amount", "Description", "Payment Method"]]
-            for item in transaction_table.get_children():
-                row = transaction_table.item(item)['values']
-                data.append(row)
+            data.extend(list(row) for row in shown)
+            task.progress(1, 2, f"Laying out {len(data) - 1} transactions...")
 
             # Create table
             table = Table(data)
@@ -4555,9 +3902,91 @@ def accounts_management_gui(user_role=""):
 
             elements.append(table)
             doc.build(elements)
-            messagebox.showinfo("Success", f"Report exported as {filename}")
+            return filename
+
+        tasks.submit(build_pdf, status=task_status, description="Exporting financial report",
+                     on_done=lambda filename: messagebox.showinfo("Success", f"Report exported as {filename}"),
+                     on_error=lambda e: messagebox.showerror("Error", f"Failed to export report: {e}"))
+
+    def export_reconciliation():
+        """Export orders whose paid amounts disagree with the ledger"""
+        def build_report(task):
+            if not os.path.exists('exports'):
+                os.makedirs('exports')
+            rows = db.order_reconciliation(mismatched_only=True)
+            task.progress(1, 2, f"Writing {len(rows)} orders...")
+            df = pd.DataFrame(rows, columns=["OrderID", "Customer", "Total", "Paid", "Remaining",
+                                             "Ledger Paid", "Payments", "Difference"])
+            filename = f"exports/order_reconciliation_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
+            df.to_excel(filename, index=False)
+            return filename, len(rows)
+
+        def report_done(result):
+            filename, mismatched = result
+            messagebox.showinfo("Reconciliation",
+                                f"{mismatched} orders disagree with the ledger.\nReport exported to {filename}")
+
+        tasks.submit(build_report, status=task_status, description="Reconciling order payments",
+                     on_done=report_done,
+                     on_error=lambda e: messagebox.showerror("Error", f"Failed to reconcile payments: {e}"))
+
+    def show_ledger_breakdown():
+        """Ledger totals by type, by payment mode and by day, from the running summary"""
+        try:
+            today = datetime.now().date()
+            breakdowns = [
+                ("By Type", "Type", db.ledger_summary("type")),
+                ("By Payment Mode", "Payment Mode", db.ledger_summary("mode")),
+                ("Last 30 Days", "Date", db.ledger_summary(
+                    "day", (today - timedelta(days=29)).isoformat(), today.isoformat())),
+            ]
         except Exception as e:
-            messagebox.showerror("Error", f"Failed to export report: {e}")
+            messagebox.showerror("Error", f"Failed to load ledger totals: {e}")
+            return
+
+        breakdown_window = tk.Toplevel(root)
+        breakdown_window.title("Ledger Breakdown")
+        breakdown_window.geometry("500x400")
+        notebook = ttk.Notebook(breakdown_window)
+        notebook.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+
+        for title, heading, rows in breakdowns:
+            tab = ttk.Frame(notebook)
+            notebook.add(tab, text=title)
+            tree = ttk.Treeview(tab, columns=(heading, "Total", "Entries"), show="headings")
+            for column in (heading, "Total", "Entries"):
+                tree.heading(column, text=column)
+                tree.column(column, width=140, anchor="center")
+            for value, total, entries in rows:
+                tree.insert("", "end", values=(value or "(none)", f"{total:.2f}", entries))
+            tree.pack(fill=tk.BOTH, expand=True)
+
+    def show_order_payments():
+        """Ledger payments recorded against the order in the payment form"""
+        order_id = payment_order_entry.get().strip()
+        if not order_id.isdigit():
+            messagebox.showwarning("Warning", "Please enter an Order ID in the payment form")
+            return
+        try:
+            payments = db.order_payments(int(order_id))
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to load order payments: {e}")
+            return
+
+        payments_window = tk.Toplevel(root)
+        payments_window.title(f"Payments for Order {order_id}")
+        payments_window.geometry("700x300")
+        columns = ("Date", "Type", "Amount", "Description", "Payment Method")
+        tree = ttk.Treeview(payments_window, columns=columns, show="headings")
+        for column in columns:
+            tree.heading(column, text=column)
+            tree.column(column, width=130, anchor="center")
+        # Rows lead with FinancialID, not shown
+        for row in payments:
+            tree.insert("", "end", values=row[1:])
+        tree.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        total = sum(row[3] or 0 for row in payments)
+        ttk.Label(payments_window, text=f"{len(payments)} payments, total /-{total:.2f}").pack(pady=5)
 
     def filter_transactions():
         """Filter transactions by date range and type"""
@@ -4582,15 +4011,13 @@ def accounts_management_gui(user_role=""):
             end = end_date.get_date()
             trans_type = type_var.get()
 
-            for item in transaction_table.get_children():
-                transaction_table.delete(item)
-
-            data = load_financial_data()
-            for transaction in data:
-                trans_date = datetime.strptime(transaction[0], "%Y-%m-%d %H:%M:%S").date()
-                if start <= trans_date <= end:
-                    if trans_type == "All" or trans_type == transaction[1]:
-                        transaction_table.insert('', 'end', values=transaction)
+            try:
+                # Dates are ISO text, so the range is an index range in SQL
+                filtered = db.transactions_between(start, end, None if trans_type == "All" else trans_type)
+                transaction_table.set_source(filtered, lambda idx, row: row[1:], key=lambda row: row[0])
+            except Exception as e:
+                messagebox.showerror("Error", f"Failed to filter transactions: {e}")
+                return
 
             filter_window.destroy()
 
@@ -4601,6 +4028,11 @@ def accounts_management_gui(user_role=""):
     root.geometry("1024x700")
     root.minsize(1024, 600)
 
+    # Exports run on worker threads behind this overlay
+    tasks = TaskRunner(root)
+    schedule_backups(tasks)
+    task_status = TaskStatus(root)
+
     # Configure grid layout for root
     root.grid_rowconfigure(1, weight=1)
     root.grid_columnconfigure(0, weight=1)
@@ -4768,6 +4200,9 @@ def accounts_management_gui(user_role=""):
     ttk.Button(button_frame, text="Print Selected", command=print_transaction).pack(side=tk.LEFT, padx=5)
     ttk.Button(button_frame, text="Export to PDF", command=export_to_pdf).pack(side=tk.LEFT, padx=5)
     ttk.Button(button_frame, text="Filter", command=filter_transactions).pack(side=tk.LEFT, padx=5)
+    ttk.Button(button_frame, text="Reconcile Orders", command=export_reconciliation).pack(side=tk.LEFT, padx=5)
+    ttk.Button(button_frame, text="Ledger Breakdown", command=show_ledger_breakdown).pack(side=tk.LEFT, padx=5)
+    ttk.Button(button_frame, text="Order Payments", command=show_order_payments).pack(side=tk.LEFT, padx=5)
 
     table_container = ttk.Frame(table_frame)
     table_container.grid(row=0, column=0, sticky="nsew")
@@ -4778,13 +4213,16 @@ def accounts_management_gui(user_role=""):
     scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
 
     columns = ("Date", "Type", "Amount", "Description", "Category")
-    transaction_table = ttk.Treeview(table_container, columns=columns, show="headings", yscrollcommand=scrollbar.set)
+    transaction_table = VirtualTable(table_container, columns=columns, show="headings", yscrollcommand=scrollbar.set)
     for col in columns:
         transaction_table.heading(col, text=col, anchor="center")
         transaction_table.column(col, anchor="center", width=100)  # Set minimum column width
     transaction_table.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
     scrollbar.config(command=transaction_table.yview)
 
+    # Clicking a heading re-sorts the transactions in the database, a page at a time
+    transaction_table.bind_sort(dict(zip(columns, ("Date", "Type", "Amount", "Description", "PaymentMode"))))
+
     # Footer frame
     footer_frame = tk.Frame(root, bg="#1a237e", height=30)
     footer_frame.grid(row=2, column=0, sticky="nsew")
@@ -4799,6 +4237,14 @@ def accounts_management_gui(user_role=""):
     # Refresh data on load
     refresh_data()
 
+    # New transactions from other windows: re-read the visible rows and totals
+    def on_financials_changed():
+        transaction_table.refresh()
+        update_totals_display()
+
+    watcher = ChangeWatcher(root, db)
+    watcher.subscribe("Financials", on_financials_changed)
+
     # Start the application
     root.mainloop()
 
@@ -4810,214 +4256,131 @@ def reports_analytics_gui(user_role=""):
         elif user_role == "Manager":
             manager_dashboard()
 
-    def export_to_excel(data, filename):
-        try:
-            # Create a new workbook and select active sheet
-            workbook = openpyxl.Workbook()
-            sheet = workbook.active
-
-            # Only proceed if there is data to export
-            if not data:
-                messagebox.showinfo("Warning", "No data to export!")
-                return
-
-            # Write headers
-            headers = list(data[0].keys())
-            for col, header in enumerate(headers, 1):
-                sheet.cell(row=1, column=col, value=header)
-
-            # Write data
-            for row, record in enumerate(data, 2):
-                for col, key in enumerate(headers, 1):
-                    sheet.cell(row=row, column=col, value=record[key])
-
-            # Save with timestamp
-            export_filename = f"{filename}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-            workbook.save(export_filename)
-            workbook.close()
-
-            messagebox.showinfo("Success", f"Data exported successfully to {export_filename}!")
-
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to export data: {e}")
-    def export_to_pdf(data, filename):
-        try:
-            pdf = FPDF(format='A4')  # Explicitly specify format
-            pdf.set_auto_page_break(auto=True, margin=15)
-            pdf.add_page()
-
-            # Set font before writing
-            pdf.set_font("helvetica", size=11)
-
-            # Add headers
-            headers = list(data[0].keys())
-            for header in headers:
-                pdf.cell(40, 10, str(header), 1)
+    def export_to_excel(task, data, filename):
+        # Create a new workbook and select active sheet
+        workbook = openpyxl.Workbook()
+        sheet = workbook.active
+
+        # Write headers
+        headers = list(data[0].keys())
+        for col, header in enumerate(headers, 1):
+            sheet.cell(row=1, column=col, value=header)
+
+        # Write data
+        for row, record in enumerate(data, 2):
+            for col, key in enumerate(headers, 1):
+                sheet.cell(row=row, column=col, value=record[key])
+            if row % 500 == 0:
+                task.progress(row, len(data) + 1)
+
+        # Save with timestamp
+        export_filename = f"{filename}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
+        workbook.save(export_filename)
+        workbook.close()
+        return export_filename
+
+    def export_to_pdf(task, data, filename):
+        pdf = FPDF(format='A4')  # Explicitly specify format
+        pdf.set_auto_page_break(auto=True, margin=15)
+        pdf.add_page()
+
+        # Set font before writing
+        pdf.set_font("helvetica", size=11)
+
+        # Add headers
+        headers = list(data[0].keys())
+        for header in headers:
+            pdf.cell(40, 10, str(header), 1)
+        pdf.ln()
+
+        # Add data
+        for count, row in enumerate(data, 1):
+            for key in headers:
+                pdf.cell(40, 10, str(row[key]), 1)
             pdf.ln()
+            if count % 500 == 0:
+                task.progress(count, len(data))
 
-            # Add data
-            for row in data:
-                for key in headers:
-                    pdf.cell(40, 10, str(row[key]), 1)
-                pdf.ln()
-
-            # Save with timestamp
-            export_filename = f"{filename}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
-            pdf.output(export_filename)
-            messagebox.showinfo("Success", f"PDF exported successfully as {export_filename}!")
-
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to export PDF: {e}")
-
-    def export_to_csv(data, filename):
-        try:
-            import csv
-            export_filename = f"{filename}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-
-            with open(export_filename, 'w', newline='') as csvfile:
-                if not data:
-                    messagebox.showinfo("Warning", "No data to export!")
-                    return
+        # Save with timestamp
+        export_filename = f"{filename}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
+        pdf.output(export_filename)
+        return export_filename
 
-                # Write headers
-                fieldnames = list(data[0].keys())
-                writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-                writer.writeheader()
+    def export_to_csv(task, data, filename):
+        import csv
+        export_filename = f"{filename}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
 
-                # Write data
-                for row in data:
-                    writer.writerow(row)
-
-            messagebox.showinfo("Success", f"Data exported successfully to {export_filename}!")
+        with open(export_filename, 'w', newline='') as csvfile:
+            # Write headers
+            fieldnames = list(data[0].keys())
+            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+            writer.writeheader()
 
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to export CSV: {e}")
+            # Write data
+            writer.writerows(data)
+
+        return export_filename
+
+    # Report data is queried on a worker thread; charts are drawn back on the Tk thread
+    def fetch_fleet_data(task):
+        # Get truck usage data
+        results = db.fleet_usage()
+
+        fleet_data = []
+        for row in results:
+            fleet_data.append({
+                "Truck ID": row[0],
+                "Model": row[1],
+                "Status": row[2],
+                "Total Trips": row[3],
+                "Odometer": row[4]
+            })
+        return fleet_data
+
+    def fetch_driver_data(task):
+        # Get driver performance data
+        results = db.driver_delivery_counts()
+
+        driver_data = []
+        for row in results:
+            driver_data.append({
+                "Driver ID": row[0],
+                "Name": row[1],
+                "Completed Trips": row[2],
+                "Status": row[3]
+            })
+        return driver_data
+
+    def fetch_financial_data(task):
+        # Total revenue from orders and total expenses from the ledger
+        total_revenue, total_expenses = db.financial_summary()
+
+        net_profit = total_revenue - total_expenses
+
+        # Create list format for export
+        return [
+            {"Category": "Total Revenue", "Amount": total_revenue},
+            {"Category": "Total Expenses", "Amount": total_expenses},
+            {"Category": "Net Profit", "Amount": net_profit},
+        ]
 
     def generate_fleet_report():
-        try:
-            conn = sqlite3.connect('TTMS.db')
-            cursor = conn.cursor()
-
-            # Query to get truck usage data
-            query = """
-            SELECT 
-                t.TruckID,
-                t.Model,
-                t.Status,
-                COUNT(d.DispatchID) as TotalTrips,
-                t.Odometer
-            FROM Trucks t
-            LEFT JOIN Dispatch d ON t.TruckID = d.TruckID
-            GROUP BY t.TruckID
-            """
-
-            cursor.execute(query)
-            results = cursor.fetchall()
-
-            fleet_data = []
-            for row in results:
-                fleet_data.append({
-                    "Truck ID": row[0],
-                    "Model": row[1],
-                    "Status": row[2],
-                    "Total Trips": row[3],
-                    "Odometer": row[4]
-                })
-
-            update_fleet_chart(fleet_data)
-            conn.close()
-            return fleet_data
-
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to generate fleet report: {e}")
-            return []
+        tasks.submit(fetch_fleet_data, on_done=update_fleet_chart, status=task_status,
+                     description="Generating fleet report",
+                     on_error=lambda e: messagebox.showerror("Error", f"Failed to generate fleet report: {e}"))
 
     def generate_driver_performance():
-        try:
-            conn = sqlite3.connect('TTMS.db')
-            cursor = conn.cursor()
-
-            # Query to get driver performance data
-            query = """
-            SELECT 
-                d.DriverID,
-                d.Name,
-                COUNT(CASE WHEN di.Status = 'Delivered' THEN 1 END) as CompletedTrips,
-                d.Status
-            FROM Drivers d
-            LEFT JOIN Dispatch di ON d.DriverID = di.DriverID
-            GROUP BY d.DriverID
-            """
-
-            cursor.execute(query)
-            results = cursor.fetchall()
-
-            driver_data = []
-            for row in results:
-                driver_data.append({
-                    "Driver ID": row[0],
-                    "Name": row[1],
-                    "Completed Trips": row[2],
-                    "Status": row[3]
-                })
-
-            update_driver_chart(driver_data)
-            conn.close()
-            return driver_data
-
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to generate driver performance: {e}")
-            return []
+        tasks.submit(fetch_driver_data, on_done=update_driver_chart, status=task_status,
+                     description="Generating driver performance",
+                     on_error=lambda e: messagebox.showerror(
+                         "Error", f"Failed to generate driver performance: {e}"))
 
     def generate_financial_summary():
-        try:
-            conn = sqlite3.connect('TTMS.db')
-            cursor = conn.cursor()
-
-            # Query to calculate total revenue from orders
-            revenue_query = """
-            SELECT COALESCE(SUM(TotalAmount), 0) 
-            FROM Orders
-            """
-
-            # Query to calculate total expenses
-            expenses_query = """
-            SELECT COALESCE(SUM(Amount), 0)
-            FROM Financials 
-            WHERE Type != 'Order Payment'
-            """
-
-            cursor.execute(revenue_query)
-            total_revenue = cursor.fetchone()[0]
-
-            cursor.execute(expenses_query)
-            total_expenses = cursor.fetchone()[0]
-
-            net_profit = total_revenue - total_expenses
-
-            # Create chart data dictionary
-            chart_data = {
-                "Total Revenue": total_revenue,
-                "Total Expenses": total_expenses,
-                "Net Profit": net_profit
-            }
-
-            # Update chart
-            update_financial_chart(chart_data)
-
-            # Create list format for export
-            financial_data = [{
-                "Category": key,
-                "Amount": value
-            } for key, value in chart_data.items()]
-
-            conn.close()
-            return financial_data
-
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to generate financial summary: {e}")
-            print(f"Debug - Financial Summary Error: {str(e)}")
-            return []
+        tasks.submit(fetch_financial_data, status=task_status,
+                     description="Generating financial summary",
+                     on_done=lambda data: update_financial_chart({d["Category"]: d["Amount"] for d in data}),
+                     on_error=lambda e: messagebox.showerror(
+                         "Error", f"Failed to generate financial summary: {e}"))
 
     def update_financial_chart(data):
         try:
@@ -5093,6 +4456,11 @@ def reports_analytics_gui(user_role=""):
     root.geometry("1000x600")
     root.minsize(1024, 600)
 
+    # Report queries and exports run on worker threads behind this overlay
+    tasks = TaskRunner(root)
+    schedule_backups(tasks)
+    task_status = TaskStatus(root)
+
     # Configure root grid weights
     root.grid_rowconfigure(1, weight=1)
     root.grid_columnconfigure(0, weight=1)
@@ -5173,9 +4541,9 @@ def reports_analytics_gui(user_role=""):
         ("Generate Fleet Performance", generate_fleet_report),
         ("Generate Driver Performance", generate_driver_performance),
         ("Generate Financial Summary", generate_financial_summary),
-        ("Export Fleet Data", lambda: export_data(generate_fleet_report(), "fleet_report")),
-        ("Export Driver Data", lambda: export_data(generate_driver_performance(), "driver_report")),
-        ("Export Financial Data", lambda: export_data(generate_financial_summary(), "financial_report"))
+        ("Export Fleet Data", lambda: export_data(fetch_fleet_data, "fleet_report")),
+        ("Export Driver Data", lambda: export_data(fetch_driver_data, "driver_report")),
+        ("Export Financial Data", lambda: export_data(fetch_financial_data, "financial_report"))
     ]
 
     for idx, (text, command) in enumerate(buttons):
@@ -5191,15 +4559,25 @@ def reports_analytics_gui(user_role=""):
     ttk.Radiobutton(export_frame, text="CSV", variable=export_format, value="csv").pack()
 
     # Modify export button command
-    def export_data(data, filename):
-        format_type = export_format.get()
-        if format_type == "excel":
-            export_to_excel(data, filename)
-        elif format_type == "pdf":
-            export_to_pdf(data, filename)
-        elif format_type == "csv":
+    def export_data(fetch_data, filename):
+        """Query and write the export on a worker thread"""
+        writers = {"excel": export_to_excel, "pdf": export_to_pdf, "csv": export_to_csv}
+        write = writers[export_format.get()]
 
-            export_to_csv(data, filename)
+        def build_export(task):
+            data = fetch_data(task)
+            if not data:
+                return None
+            return write(task, data, filename)
+
+        def export_done(export_filename):
+            if export_filename is None:
+                messagebox.showinfo("Warning", "No data to export!")
+            else:
+                messagebox.showinfo("Success", f"Data exported successfully to {export_filename}!")
+
+        tasks.submit(build_export, on_done=export_done, status=task_status, description="Exporting data",
+                     on_error=lambda e: messagebox.showerror("Error", f"Failed to export data: {e}"))
 
     # Right panel for charts and data display
     display_panel = ttk.Frame(main_container)
@@ -5248,89 +4626,44 @@ def user_management_gui():
         root.destroy()
         admin_dashboard()
 
-    import sqlite3
     from sqlite3 import Error
 
-    def create_connection():
-        """Create a database connection"""
-        conn = None
-        try:
-            conn = sqlite3.connect('TTMS.db', timeout=10)  # Add timeout
-            return conn
-        except Error as e:
-            messagebox.showerror("Database Error", f"Error connecting to database: {e}")
-        return conn
-
     def load_users():
         """Load user data from database"""
-        conn = create_connection()
-        if conn is not None:
-            try:
-                cursor = conn.cursor()
-                cursor.execute("SELECT * FROM Users")
-                users = cursor.fetchall()
-                conn.close()
-                return users
-            except Error as e:
-                messagebox.showerror("Error", f"Failed to load users: {e}")
-                return []
-        return []
+        try:
+            return db.load_users()
+        except Error as e:
+            messagebox.showerror("Error", f"Failed to load users: {e}")
+            return []
 
     def save_user(user_data):
-        conn = create_connection()
-        if conn is not None:
-            try:
-                cursor = conn.cursor()
-                cursor.execute("""
-                    INSERT INTO Users (Username, Password, Role, FullName, Contact, Address, CNIC, Email)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                """, user_data)
-
-                conn.commit()
-                conn.close()
-                messagebox.showinfo("Success", "User added successfully!")
-                return True
-            except Error as e:
-                messagebox.showerror("Error", f"Failed to save user: {e}")
-                return False
-        return False
+        try:
+            db.insert_user(user_data)
+            messagebox.showinfo("Success", "User added successfully!")
+            return True
+        except Error as e:
+            messagebox.showerror("Error", f"Failed to save user: {e}")
+            return False
 
     def update_user(user_id, updated_data):
         """Update existing user data"""
-        conn = create_connection()
-        if conn is not None:
-            try:
-                cursor = conn.cursor()
-                cursor.execute("""
-                        UPDATE Users
-                        SET Username=?, Password=?, Role=?, FullName=?, Contact=?, Address=?, CNIC=?, Email=?
-                        WHERE UserID=?
-                    """, (*updated_data, user_id))
-                conn.commit()
-                messagebox.showinfo("Success", "User updated successfully!")
-                return True
-            except Error as e:
-                messagebox.showerror("Error", f"Failed to update user: {e}")
-                return False
-            finally:
-                conn.close()  # Ensure connection is always closed
-        return False
+        try:
+            db.update_user(user_id, updated_data)
+            messagebox.showinfo("Success", "User updated successfully!")
+            return True
+        except Error as e:
+            messagebox.showerror("Error", f"Failed to update user: {e}")
+            return False
 
     def delete_user(user_id):
         """Delete a user from database"""
-        conn = create_connection()
-        if conn is not None:
-            try:
-                cursor = conn.cursor()
-                cursor.execute("DELETE FROM Users WHERE UserID=?", (user_id,))
-                conn.commit()
-                conn.close()
-                messagebox.showinfo("Success", "User deleted successfully!")
-                return True
-            except Error as e:
-                messagebox.showerror("Error", f"Failed to delete user: {e}")
-                return False
-        return False
+        try:
+            db.delete_user(user_id)
+            messagebox.showinfo("Success", "User deleted successfully!")
+            return True
+        except Error as e:
+            messagebox.showerror("Error", f"Failed to delete user: {e}")
+            return False
     def add_user():
         if not all([fullname_entry.get(), username_entry.get(), password_entry.get(),
                     userrole_combo.get(), contact_entry.get(), address_entry.get(),
@@ -5399,37 +4732,31 @@ def user_management_gui():
 
     def search_users(search_text, search_by):
         """Search users in database"""
-        conn = create_connection()
-        if conn is not None:
-            try:
-                cursor = conn.cursor()
-                field_map = {
-                    "Username": "Username",
-                    "User Role": "Role",
-                    "Contact": "Contact",
-                    "CNIC": "CNIC",
-                    "Full Name": "FullName"
-                }
+        try:
+            field_map = {
+                "Username": "Username",
+                "User Role": "Role",
+                "Contact": "Contact",
+                "CNIC": "CNIC",
+                "Full Name": "FullName"
+            }
 
-                field = field_map.get(search_by, "Username")
-                cursor.execute(f"SELECT * FROM Users WHERE {field} LIKE ?", (f"%{search_text}%",))
-                users = cursor.fetchall()
-                conn.close()
-                return users
-            except Error as e:
-                messagebox.showerror("Error", f"Failed to search users: {e}")
-                return []
-        return []
+            field = field_map.get(search_by, "Username")
+            return db.search_users(field, search_text)
+        except Error as e:
+            messagebox.showerror("Error", f"Failed to search users: {e}")
+            return []
 
     def load_data_into_table(data=None):
-        user_table.delete(*user_table.get_children())
-        users = data if data is not None else load_users()
-        for user in users:
+        try:
             # user[0] is UserID, no need to add extra index
-            user_table.insert("", "end", values=user)
+            user_table.set_source(RowList(data) if data is not None else db.users_page())
+        except Error as e:
+            messagebox.showerror("Error", f"Failed to load users: {e}")
 
     # Create main window
     root = ThemedTk(theme="arc")
+    schedule_backups(TaskRunner(root))
     root.title("User Management System")
     root.geometry("1000x600")
     root.minsize(1024, 600)
@@ -5506,14 +4833,16 @@ def user_management_gui():
     search_frame.pack(fill=tk.X, pady=(0, 10))
 
     search_criteria = ttk.Combobox(search_frame,
-                                   values=["Username", "User Rolee", "Contact", "CNIC", "Full Name"])
+                                   values=["Username", "User Role", "Contact", "CNIC", "Full Name"])
     search_criteria.set("Username")
     search_criteria.pack(side=tk.LEFT, padx=5)
 
     search_entry = ttk.Entry(search_frame)
     search_entry.pack(side=tk.LEFT, padx=5)
 
-    ttk.Button(search_frame, text="Search", command=search_users).pack(side=tk.LEFT, padx=5)
+    ttk.Button(search_frame, text="Search",
+               command=lambda: load_data_into_table(search_users(search_entry.get(), search_criteria.get())
+                                                    if search_entry.get() else None)).pack(side=tk.LEFT, padx=5)
 
     # Form frame
     form_frame = ttk.LabelFrame(main_container, text="User Information", padding="10")
@@ -5562,7 +4891,7 @@ def user_management_gui():
     columns = ("UserID", "Username", "Password", "Role", "FullName", "Contact",
                "Address", "CNIC", "Email")
 
-    user_table = ttk.Treeview(table_frame, columns=columns, show="headings",
+    user_table = VirtualTable(table_frame, columns=columns, show="headings",
                               yscrollcommand=y_scrollbar.set,
                               xscrollcommand=x_scrollbar.set)
 
@@ -5604,6 +4933,10 @@ def user_management_gui():
     # Load initial data
     load_data_into_table()
 
+    # Account changes from other windows re-read only the visible rows
+    watcher = ChangeWatcher(root, db)
+    watcher.subscribe("Users", user_table.refresh)
+
     # Footer frame
     footer_frame = tk.Frame(root, bg="#1a237e", height=30)
     footer_frame.grid(row=2, column=0, sticky="nsew")
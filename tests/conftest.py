@@ -0,0 +1,20 @@
+import os
+import sys
+
+import pytest
+
+# The ttms_* modules live at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ttms_db import Database  # noqa: E402
+from ttms_schema import migrate  # noqa: E402
+
+
+@pytest.fixture
+def db(tmp_path):
+    """A migrated, empty TTMS database in a temporary directory."""
+    database = Database(str(tmp_path / "TTMS.db"))
+    database.configure_storage()
+    migrate(database.connection())
+    yield database
+    database.close()
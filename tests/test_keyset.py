@@ -0,0 +1,84 @@
+import random
+
+import pytest
+
+from ttms_db import KeysetQuery
+
+
+def _fill_financials(db, count, seed=7):
+    rng = random.Random(seed)
+    dates = [None] + [f"2024-{month:02d}-{day:02d}" for month in (1, 2, 3) for day in (1, 15, 28)]
+    rows = []
+    for _ in range(count):
+        rows.append((rng.choice(dates), rng.choice(("Fuel", "Order Payment", None)), rng.randint(1, 500)))
+    with db.transaction() as cursor:
+        cursor.executemany("INSERT INTO Financials (Date, Type, Amount) VALUES (?, ?, ?)", rows)
+
+
+def _expected(db, sort, descending, where="", params=()):
+    # SQLite sorts NULLs first ascending and last descending, like KeysetQuery
+    direction = "DESC" if descending else "ASC"
+    return db.fetch_all(f"SELECT FinancialID, Date, Type, Amount FROM Financials {where} "
+                        f"ORDER BY {sort} {direction}, FinancialID {direction}", params)
+
+
+@pytest.mark.parametrize("sort", ["FinancialID", "Date", "Type", "Amount"])
+@pytest.mark.parametrize("descending", [False, True])
+def test_pages_in_order_match_a_plain_sort(db, sort, descending):
+    _fill_financials(db, 1000)
+    query = KeysetQuery(db, "Financials", "FinancialID", "FinancialID, Date, Type, Amount",
+                        sort, descending)
+    expected = _expected(db, sort, descending)
+    assert query.count() == len(expected)
+    pages = []
+    for offset in range(0, len(expected), 97):
+        pages.extend(query.rows(offset, 97))
+    assert pages == expected
+
+
+@pytest.mark.parametrize("descending", [False, True])
+def test_random_jumps_match_offsets(db, descending):
+    _fill_financials(db, 1000)
+    query = KeysetQuery(db, "Financials", "FinancialID", "FinancialID, Date, Type, Amount",
+                        "Date", descending)
+    expected = _expected(db, "Date", descending)
+    query.count()
+    rng = random.Random(3)
+    for _ in range(50):
+        offset = rng.randrange(len(expected) + 20)
+        assert query.rows(offset, 25) == expected[offset:offset + 25]
+
+
+def test_filtered_query_pages_only_matching_rows(db):
+    _fill_financials(db, 600)
+    where, params = "Type = ? AND Date >= ?", ("Fuel", "2024-02-01")
+    query = KeysetQuery(db, "Financials", "FinancialID", "FinancialID, Date, Type, Amount",
+                        "Date", True, where=where, params=params)
+    expected = _expected(db, "Date", True, f"WHERE {where}", params)
+    assert query.count() == len(expected)
+    assert query.rows(0, 50) + query.rows(50, 1000) == expected
+
+
+def test_count_follows_inserts_and_deletes_with_sparse_keys(db):
+    with db.transaction() as cursor:
+        cursor.executemany("INSERT INTO Orders (OrderID, CustomerName) VALUES (?, 'c')",
+                           [(key * 100000,) for key in range(1, 301)])
+    query = db.orders_page()
+    assert query.count() == 300
+    with db.transaction() as cursor:
+        cursor.execute("DELETE FROM Orders WHERE OrderID <= 5000000")
+        cursor.execute("INSERT INTO Orders (CustomerName) VALUES ('new')")
+    assert query.count() == db.fetch_value("SELECT COUNT(*) FROM Orders") == 251
+    assert len(query.rows(0, 1000)) == 251
+
+
+def test_copy_keeps_filter_and_sort_with_its_own_bookmarks(db):
+    _fill_financials(db, 400)
+    where, params = "Type = ?", ("Fuel",)
+    query = KeysetQuery(db, "Financials", "FinancialID", "FinancialID, Date, Type, Amount",
+                        "Amount", True, where=where, params=params)
+    expected = _expected(db, "Amount", True, f"WHERE {where}", params)
+    query.rows(0, 30)
+    copy = query.copy()
+    assert copy.rows(0, 1000) == expected
+    assert query._bookmarks.keys() == {0, 30}
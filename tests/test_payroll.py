@@ -0,0 +1,142 @@
+import random
+from datetime import date, timedelta
+
+import pytest
+
+from ttms_payroll import SHEET_COLUMNS, UNPAID_LEAVE_TYPES, month_bounds, payroll_sheet
+
+LEAVE_TYPES = UNPAID_LEAVE_TYPES + ("Sick Leave", "Annual Leave")
+
+
+def _parse(text):
+    try:
+        return date.fromisoformat(text[:10])
+    except (TypeError, ValueError):
+        return None
+
+
+def _reference(db, start, end):
+    """The sheet worked out one driver and one day at a time."""
+    period = [start + timedelta(days=n) for n in range((end - start).days + 1)]
+    leave = db.fetch_all("SELECT DriverID, StartDate, EndDate, LeaveType, Status FROM LeaveManagement")
+    sheet = []
+    for driver_id, name, salary, doj, dor in db.fetch_all(
+            "SELECT DriverID, Name, Salary, DOJ, DOR FROM Drivers ORDER BY DriverID"):
+        joined, resigned = _parse(doj), _parse(dor)
+        employed = {day for day in period
+                    if (joined is None or day >= joined) and (resigned is None or day <= resigned)}
+        off = set()
+        for leave_driver, first, last, leave_type, status in leave:
+            first, last = _parse(first), _parse(last)
+            if (leave_driver != driver_id or status != "Approved" or leave_type not in UNPAID_LEAVE_TYPES
+                    or first is None or last is None):
+                continue
+            off |= {day for day in employed if first <= day <= last}
+        daily = (salary or 0) / len(period)
+        prorated, deduction = round(daily * len(employed), 2), round(daily * len(off), 2)
+        sheet.append([driver_id, name, salary or 0, len(employed), len(off), len(employed) - len(off),
+                      prorated, deduction, round(prorated - deduction, 2)])
+    return sheet
+
+
+def _sheet(db, start, end):
+    return payroll_sheet(db, start, end)[SHEET_COLUMNS].values.tolist()
+
+
+def _add_driver(db, name, salary, doj=None, dor=None):
+    with db.transaction() as cursor:
+        cursor.execute("INSERT INTO Drivers (Name, Salary, Salary_Status, DOJ, DOR) VALUES (?, ?, 'Unpaid', ?, ?)",
+                       (name, salary, doj, dor))
+        return cursor.lastrowid
+
+
+def _add_leave(db, driver_id, first, last, leave_type="Off Duty", status="Approved"):
+    with db.transaction() as cursor:
+        cursor.execute("INSERT INTO LeaveManagement (DriverID, StartDate, EndDate, LeaveType, Status) "
+                       "VALUES (?, ?, ?, ?, ?)", (driver_id, first, last, leave_type, status))
+
+
+def _row(db, driver_id, start, end):
+    sheet = payroll_sheet(db, start, end).set_index("DriverID")
+    return sheet.loc[driver_id]
+
+
+def test_overlapping_leave_is_deducted_once(db):
+    driver = _add_driver(db, "Overlap", 3000, "2023-01-01")
+    _add_leave(db, driver, "2024-04-05", "2024-04-10")
+    _add_leave(db, driver, "2024-04-08", "2024-04-12")
+    _add_leave(db, driver, "2024-04-09", "2024-04-09", "Emergency Leave")
+    _add_leave(db, driver, "2024-04-20", "2024-04-21")
+    row = _row(db, driver, *month_bounds("2024-04"))
+    assert row["UnpaidLeaveDays"] == 10
+    assert row["NetPay"] == pytest.approx(2000)
+
+
+def test_paid_and_unapproved_leave_is_not_deducted(db):
+    driver = _add_driver(db, "Paid", 3000)
+    _add_leave(db, driver, "2024-04-01", "2024-04-05", "Sick Leave")
+    _add_leave(db, driver, "2024-04-06", "2024-04-10", "Off Duty", "Pending")
+    row = _row(db, driver, *month_bounds("2024-04"))
+    assert row["UnpaidLeaveDays"] == 0
+    assert row["NetPay"] == pytest.approx(3000)
+
+
+def test_employment_window_is_clipped_to_the_period(db):
+    start, end = month_bounds("2024-04")
+    before = _add_driver(db, "Before", 3000, "2020-01-01", "2024-03-31")
+    after = _add_driver(db, "After", 3000, "2024-05-01")
+    partial = _add_driver(db, "Partial", 3000, "2024-03-15", "2024-04-10 17:30:00")
+    _add_leave(db, partial, "2024-04-09", "2024-04-20")
+    _add_leave(db, before, "2024-04-01", "2024-04-30")
+    assert _row(db, before, start, end)["EmployedDays"] == 0
+    assert _row(db, before, start, end)["UnpaidLeaveDays"] == 0
+    assert _row(db, after, start, end)["EmployedDays"] == 0
+    row = _row(db, partial, start, end)
+    assert (row["EmployedDays"], row["UnpaidLeaveDays"], row["PayableDays"]) == (10, 2, 8)
+
+
+def test_missing_and_unparseable_dates(db):
+    start, end = month_bounds("2024-04")
+    no_dates = _add_driver(db, "No dates", 3000)
+    bad_dates = _add_driver(db, "Bad dates", 3000, "unknown", "")
+    _add_leave(db, no_dates, "2024-04-01", "not a date")
+    _add_leave(db, bad_dates, "", "2024-04-03")
+    for driver in (no_dates, bad_dates):
+        row = _row(db, driver, start, end)
+        assert (row["EmployedDays"], row["UnpaidLeaveDays"]) == (30, 0)
+
+
+def test_orphan_leave_rows_are_ignored(db):
+    driver = _add_driver(db, "Only", 3000)
+    _add_leave(db, driver + 100, "2024-04-01", "2024-04-30")
+    sheet = payroll_sheet(db, *month_bounds("2024-04"))
+    assert sheet["DriverID"].tolist() == [driver]
+    assert sheet["UnpaidLeaveDays"].tolist() == [0]
+
+
+def test_no_drivers(db):
+    assert payroll_sheet(db, *month_bounds("2024-04")).empty
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_matches_a_per_driver_loop(db, seed):
+    rng = random.Random(seed)
+    start, end = month_bounds("2024-02")
+
+    def some_date():
+        choice = rng.random()
+        if choice < 0.1:
+            return None
+        if choice < 0.15:
+            return "n/a"
+        return (date(2024, 1, 1) + timedelta(days=rng.randrange(90))).isoformat()
+
+    drivers = [_add_driver(db, f"Driver {n}", rng.choice((None, 0, 1800, 2900.5, 45000)),
+                           some_date(), some_date()) for n in range(60)]
+    for _ in range(250):
+        driver = rng.choice(drivers + [max(drivers) + 1, max(drivers) + 2])
+        first = date(2024, 1, 1) + timedelta(days=rng.randrange(90))
+        last = first + timedelta(days=rng.randrange(15))
+        _add_leave(db, driver, first.isoformat(), last.isoformat(),
+                   rng.choice(LEAVE_TYPES), rng.choice(("Approved", "Approved", "Rejected")))
+    assert _sheet(db, start, end) == _reference(db, start, end)
@@ -0,0 +1,192 @@
+import openpyxl
+import pytest
+
+from ttms_workbook import FLUSH_RETRIES, TOMBSTONE_COLUMN, WorkbookEngine, WorkbookLocked
+
+HEADER = ["DriverID", "Name", "Contact"]
+
+
+@pytest.fixture
+def path(tmp_path):
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.title = "Drivers"
+    sheet.append(HEADER)
+    for number in range(1, 11):
+        sheet.append([f"D{number}", f"Driver {number}", f"0300-{number:07d}"])
+    workbook.create_sheet("Trucks").append(["TruckID", "Model"])
+    path = str(tmp_path / "TTMS.xlsx")
+    workbook.save(path)
+    return path
+
+
+@pytest.fixture
+def engine(path):
+    engine = WorkbookEngine(path)
+    yield engine
+    engine._dirty = False  # nothing left for the atexit commit
+
+
+class FakeWindow:
+    """Stands in for the attached Tk window; runs nothing until told to."""
+
+    def __init__(self):
+        self.scheduled = []
+
+    def after(self, delay, callback):
+        self.scheduled.append(callback)
+
+    def bind(self, sequence, callback, add=None):
+        pass
+
+    def run_next(self):
+        self.scheduled.pop(0)()
+
+
+def _ids(rows):
+    return [row[0] for row in rows]
+
+
+def _saved(path, name="Drivers"):
+    return openpyxl.load_workbook(path)[name]
+
+
+def test_delete_tombstones_without_moving_rows(engine):
+    row_of_d7 = engine.find_row("Drivers", "D7")
+    assert engine.delete("Drivers", "D3")
+    assert not engine.delete("Drivers", "D3")
+    assert not engine.contains("Drivers", "D3")
+    assert engine.find_row("Drivers", "D7") == row_of_d7
+    assert _ids(engine.rows("Drivers")) == ["D1", "D2"] + [f"D{n}" for n in range(4, 11)]
+    assert engine.sheet("Drivers").column_dimensions["AX"].hidden
+
+
+def test_append_after_delete_is_indexed(engine):
+    engine.delete("Drivers", "D10")
+    row_num = engine.append("Drivers", ["D11", "Driver 11", "0300-0000011"])
+    assert engine.find_row("Drivers", "D11") == row_num
+    assert engine.row_values("Drivers", "D11") == ("D11", "Driver 11", "0300-0000011")
+    assert _ids(engine.rows("Drivers"))[-1] == "D11"
+
+
+def test_commit_compacts_tombstoned_rows(engine, path):
+    for key in ("D2", "D3", "D9"):
+        engine.delete("Drivers", key)
+    engine.save()  # no window attached, so this writes at once
+    sheet = _saved(path)
+    assert [row[0] for row in sheet.iter_rows(values_only=True)] == \
+        ["DriverID", "D1", "D4", "D5", "D6", "D7", "D8", "D10"]
+    assert sheet.max_column == len(HEADER)
+    assert sheet.cell(row=1, column=TOMBSTONE_COLUMN).value is None
+    # The engine keeps working on the compacted sheet
+    assert engine.find_row("Drivers", "D10") == 8
+    assert _ids(engine.rows("Drivers")) == ["D1", "D4", "D5", "D6", "D7", "D8", "D10"]
+
+
+def test_sheets_without_tombstones_are_untouched(engine, path):
+    engine.append("Trucks", [1, "Hino"])
+    engine.save()
+    assert [row for row in _saved(path).iter_rows(values_only=True)][1] == ("D1", "Driver 1", "0300-0000001")
+    assert list(_saved(path, "Trucks").iter_rows(min_row=2, values_only=True)) == [(1, "Hino")]
+
+
+def test_compaction_moves_merges_heights_and_links(engine, path):
+    sheet = engine.sheet("Drivers")
+    sheet.merge_cells("B2:C2")  # on a row that is deleted
+    sheet.merge_cells("B5:C6")  # spans a deleted row
+    sheet.merge_cells("B9:C10")  # below the deleted rows
+    sheet.row_dimensions[3].height = 30
+    sheet.row_dimensions[8].height = 40
+    sheet.row_dimensions[11].hidden = True
+    sheet["C11"].hyperlink = "https://example.com/d10"
+    for key in ("D1", "D5"):
+        engine.delete("Drivers", key)
+    engine.save()
+
+    sheet = _saved(path)
+    assert [str(cell_range) for cell_range in sheet.merged_cells.ranges] == ["B7:C8"]
+    assert sheet["B7"].value == "Driver 8"
+    assert sheet.row_dimensions[2].height == 30
+    assert sheet.row_dimensions[6].height == 40
+    assert sheet.row_dimensions[9].hidden
+    assert not sheet.row_dimensions[11].hidden
+    assert sheet["C9"].hyperlink.target == "https://example.com/d10"
+    assert sheet["C9"].hyperlink.ref == "C9"
+    assert sheet["B4"].value == "Driver 4"  # the undone merge kept its top-left value
+
+
+def test_stream_reads_the_file_when_not_loaded(engine, path):
+    assert _ids(engine.stream("Drivers")) == [f"D{n}" for n in range(1, 11)]
+    assert engine._workbook is None
+
+
+def test_stream_reads_the_file_while_clean(engine, path):
+    engine.load()
+    workbook = openpyxl.load_workbook(path)
+    workbook["Drivers"].append(["D11", "Driver 11", "0300-0000011"])
+    workbook.save(path)  # another instance saves
+    assert _ids(engine.stream("Drivers"))[-1] == "D11"
+
+
+def test_stream_sees_unflushed_deletes(engine):
+    engine.delete("Drivers", "D1")
+    engine.save()
+    engine.delete("Drivers", "D2")
+    engine._dirty = True
+    assert _ids(engine.stream("Drivers"))[:2] == ["D3", "D4"]
+
+
+def test_lookup_and_sheet_names_do_not_load(engine):
+    assert engine.lookup("Drivers", "D3") == ("D3", "Driver 3", "0300-0000003")
+    assert engine.lookup("Drivers", "D99") is None
+    assert engine.sheet_names() == ["Drivers", "Trucks"]
+    assert engine._workbook is None
+    engine.delete("Drivers", "D3")
+    assert engine.lookup("Drivers", "D3") is None
+
+
+def test_failed_flush_is_retried_then_reported(engine, path, monkeypatch):
+    errors = []
+    engine.on_error = errors.append
+    window = FakeWindow()
+    engine.attach(window)
+    engine.delete("Drivers", "D1")
+    engine.save()
+
+    def locked(path):
+        raise WorkbookLocked(f"{path} is held by another TTMS instance")
+    monkeypatch.setattr(engine, "_write", locked)
+    for _ in range(FLUSH_RETRIES):
+        window.run_next()
+        assert len(window.scheduled) == 1 and not errors
+    window.run_next()
+    assert not window.scheduled and len(errors) == 1
+
+    # The next save starts over and succeeds once the lock is free
+    monkeypatch.undo()
+    engine.save()
+    window.run_next()
+    assert _ids(_saved(path).iter_rows(min_row=2, values_only=True))[0] == "D2"
+
+
+def test_conflict_is_written_aside_and_reported(engine, path):
+    conflicts = []
+    engine.on_conflict = conflicts.append
+    engine.delete("Drivers", "D1")
+    workbook = openpyxl.load_workbook(path)
+    workbook["Drivers"].append(["D11", "Driver 11", "0300-0000011"])
+    workbook.save(path)  # another instance saves first
+    engine.save()
+    assert len(conflicts) == 1
+    assert _ids(_saved(conflicts[0]).iter_rows(min_row=2, values_only=True))[0] == "D2"
+    assert _ids(_saved(path).iter_rows(min_row=2, values_only=True))[-1] == "D11"
+    assert engine.find_row("Drivers", "D11") == 12
+
+
+def test_commit_returns_the_conflict_without_reporting(engine, path):
+    engine.on_conflict = lambda conflict_path: pytest.fail("commit() reported a conflict")
+    engine.attach(FakeWindow())
+    engine.delete("Drivers", "D1")
+    engine.save()  # waits on the window; commit() below is the exit-time flush
+    openpyxl.load_workbook(path).save(path)
+    assert engine.commit().startswith(path[:-len(".xlsx")] + ".conflict-")
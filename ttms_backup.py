@@ -0,0 +1,506 @@
+"""
+Online backups of the TTMS database.
+
+Snapshots are taken with the SQLite backup API a few pages at a time from
+a connection holding one read transaction, so the copy is consistent while
+the screens keep writing (WAL lets readers and the writer run together).
+Each snapshot is integrity-checked, compressed (zstd when the zstandard
+package is installed, gzip otherwise) and the backup directory is thinned
+to an hourly / daily / weekly retention policy. The screens call
+backup_if_due() periodically, which snapshots at most once per
+BACKUP_INTERVAL and only when the database changed since the newest
+snapshot; the changes in between are covered incrementally by the log.
+
+Between snapshots, triggers record every row change in the ChangeLog
+table. ship_changes() drains it in batches to append-only, gzip segment
+files under backup/changelog beside the database, and restore_to_time()
+rebuilds the database as of any moment from the last snapshot before it
+plus the log. Keeping both next to the database means every client of a
+shared TTMS.db ships to, and restores from, the same place.
+"""
+import gzip
+import json
+import logging
+import os
+import re
+import shutil
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime
+
+from ttms_schema import LOGGED_TABLES, create_change_log_triggers
+
+try:
+    import zstandard
+except ImportError:  # gzip from the standard library is always available
+    zstandard = None
+
+BACKUP_DIR = "backup"  # beside the database file
+BACKUP_PREFIX = "TTMS_backup_"
+TIMESTAMP_FORMAT = "%Y%m%d_%H%M%S"
+# Snapshot names carry microseconds, so two backups in one second never share
+# a name: TTMS_backup_<TIMESTAMP_FORMAT>-<microseconds>_<last LogID>
+SNAPSHOT_NAME = re.compile(re.escape(BACKUP_PREFIX) + r"(\d{8}_\d{6})(?:-(\d{6}))?(?:_(\d+))?\.")
+
+# Pages copied per backup step, and the pause between steps that lets the
+# writer in; 1024 pages is 4 MB at the default page size
+PAGES_PER_STEP = 1024
+STEP_PAUSE = 0.005
+
+# Newest snapshot kept for each of the last N hours, days and ISO weeks
+RETENTION = {"hourly": 24, "daily": 7, "weekly": 8}
+BACKUP_INTERVAL = 3600  # seconds between scheduled snapshots
+
+CHANGELOG_DIR = "changelog"  # inside the backup directory
+SEGMENT_PREFIX = "changes_"
+SEGMENT_BYTES = 16 * 1024 * 1024  # start a new segment past this size
+SHIP_BATCH = 5000  # ChangeLog rows moved per write transaction
+LOGGED_AT_FORMAT = "%Y-%m-%d %H:%M:%S.%f"
+
+
+def backup_dir_for(database_path):
+    """The backup directory of a database: BACKUP_DIR beside the database file."""
+    return os.path.join(os.path.dirname(os.path.abspath(database_path)), BACKUP_DIR)
+
+
+def changelog_dir_for(database_path):
+    return os.path.join(backup_dir_for(database_path), CHANGELOG_DIR)
+
+
+def _compressor():
+    """(file extension, open function for writing) for the best codec available."""
+    if zstandard is not None:
+        return ".db.zst", lambda path: zstandard.ZstdCompressor(level=3).stream_writer(open(path, "wb"))
+    return ".db.gz", lambda path: gzip.open(path, "wb", compresslevel=6)
+
+
+def _open_snapshot(path):
+    if path.endswith(".zst"):
+        if zstandard is None:
+            raise RuntimeError(f"{path} is zstd-compressed; install zstandard to read it")
+        return zstandard.ZstdDecompressor().stream_reader(open(path, "rb"))
+    if path.endswith(".gz"):
+        return gzip.open(path, "rb")
+    return open(path, "rb")
+
+
+def copy_pages(database_path, target_path, task=None, pages=PAGES_PER_STEP, pause=STEP_PAUSE):
+    """Copy the live database to target_path with the backup API.
+
+    task is an optional ttms_tasks.Task that receives page progress and can
+    cancel the copy between steps. Returns the last ChangeLog ID the copy
+    contains, 0 when there is none.
+    """
+    source = sqlite3.connect(database_path, isolation_level=None)
+    target = sqlite3.connect(target_path, isolation_level=None)
+    try:
+        # Pin one snapshot for every step; without it a commit from another
+        # connection would restart the copy from the first page
+        source.execute("BEGIN")
+        source.execute("SELECT count(*) FROM sqlite_master").fetchone()
+        log_id = _last_log_id(source)
+
+        def on_step(status, remaining, total):
+            if task is not None:
+                task.progress(total - remaining, total, f"Copied {total - remaining} of {total} pages")
+            if pause:
+                time.sleep(pause)
+
+        source.backup(target, pages=pages, progress=on_step)
+        source.execute("COMMIT")
+    finally:
+        source.close()
+        target.close()
+    return log_id
+
+
+def _last_log_id(conn):
+    try:
+        row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'ChangeLog'").fetchone()
+    except sqlite3.OperationalError:  # no AUTOINCREMENT table yet
+        return 0
+    return row[0] if row else 0
+
+
+def check_integrity(path):
+    """Raise sqlite3.DatabaseError unless the database at path passes integrity_check."""
+    conn = sqlite3.connect(path)
+    try:
+        problems = [row[0] for row in conn.execute("PRAGMA integrity_check")]
+    finally:
+        conn.close()
+    if problems != ["ok"]:
+        raise sqlite3.DatabaseError(f"Backup failed integrity check: {'; '.join(problems[:5])}")
+
+
+def create_backup(database_path, backup_dir=None, task=None, retention=RETENTION):
+    """Take a verified, compressed snapshot and apply retention; returns its path."""
+    backup_dir = backup_dir or backup_dir_for(database_path)
+    os.makedirs(backup_dir, exist_ok=True)
+    stamp = datetime.now().strftime(f"{TIMESTAMP_FORMAT}-%f")
+    extension, open_compressed = _compressor()
+    raw_path = os.path.join(backup_dir, f".{BACKUP_PREFIX}{stamp}.db")
+    partial_path = None
+    try:
+        log_id = copy_pages(database_path, raw_path, task)
+        check_integrity(raw_path)
+        # The change log position in the name tells which segments it still needs
+        backup_path = os.path.join(backup_dir, f"{BACKUP_PREFIX}{stamp}_{log_id}{extension}")
+        if os.path.exists(backup_path):
+            raise FileExistsError(f"A backup named {backup_path} already exists")
+        partial_path = backup_path + ".part"
+        if task is not None:
+            task.progress(0, None, "Compressing backup")
+        with open(raw_path, "rb") as raw, open_compressed(partial_path) as out:
+            shutil.copyfileobj(raw, out, 1024 * 1024)
+        # Only complete snapshots ever carry the final name
+        os.replace(partial_path, backup_path)
+    finally:
+        for path in (raw_path, partial_path):
+            if path and os.path.exists(path):
+                os.remove(path)
+
+    if retention:
+        prune_backups(backup_dir, **retention)
+        oldest = list_backups(backup_dir)[-1][1]
+        if snapshot_log_id(oldest) is not None:
+            prune_segments(os.path.join(backup_dir, CHANGELOG_DIR), snapshot_log_id(oldest))
+    return backup_path
+
+
+def backup_if_due(database_path, backup_dir=None, task=None, interval=BACKUP_INTERVAL):
+    """Take a snapshot if the newest is older than interval seconds and out of date.
+
+    A database with no change logged since the newest snapshot is not copied
+    again. Returns the new snapshot's path, or None when none was needed.
+    """
+    backup_dir = backup_dir or backup_dir_for(database_path)
+    backups = list_backups(backup_dir)
+    if backups:
+        taken, newest = backups[0]
+        if (datetime.now() - taken).total_seconds() < interval:
+            return None
+        conn = sqlite3.connect(database_path)
+        try:
+            log_id = _last_log_id(conn)
+        finally:
+            conn.close()
+        if snapshot_log_id(newest) == log_id:
+            return None
+    return create_backup(database_path, backup_dir, task)
+
+
+def list_backups(backup_dir):
+    """[(taken at, path)] of the snapshots in backup_dir, newest first."""
+    backups = []
+    if not os.path.isdir(backup_dir):
+        return backups
+    for name in os.listdir(backup_dir):
+        match = SNAPSHOT_NAME.match(name)
+        if match is None or name.endswith(".part"):
+            continue
+        try:
+            taken = datetime.strptime(match[1], TIMESTAMP_FORMAT)
+        except ValueError:
+            continue
+        # Snapshots named before microseconds were added have none
+        taken = taken.replace(microsecond=int(match[2] or 0))
+        backups.append((taken, os.path.join(backup_dir, name)))
+    backups.sort(reverse=True)
+    return backups
+
+
+def snapshot_log_id(path):
+    """Last ChangeLog ID in a snapshot according to its name; None for old snapshots."""
+    match = SNAPSHOT_NAME.match(os.path.basename(path))
+    return int(match[3]) if match and match[3] else None
+
+
+def prune_backups(backup_dir, hourly=24, daily=7, weekly=8):
+    """Delete snapshots not needed by the retention policy; returns the deleted paths.
+
+    The newest snapshot of each of the latest `hourly` hours, `daily` days
+    and `weekly` ISO weeks that have one is kept, and always the newest.
+    """
+    backups = list_backups(backup_dir)
+    keep = set(path for _, path in backups[:1])
+    for count, bucket in ((hourly, lambda t: (t.date(), t.hour)),
+                          (daily, lambda t: t.date()),
+                          (weekly, lambda t: t.isocalendar()[:2])):
+        seen = []
+        for taken, path in backups:  # newest first, so the first per bucket wins
+            key = bucket(taken)
+            if key in seen:
+                continue
+            if len(seen) == count:
+                break
+            seen.append(key)
+            keep.add(path)
+
+    deleted = []
+    for _, path in backups:
+        if path not in keep:
+            try:
+                os.remove(path)
+                deleted.append(path)
+            except OSError as e:
+                logging.warning("Could not delete old backup %s: %s", path, e)
+    return deleted
+
+
+# ----------------------------------------------------------------------
+# Change log segments
+# ----------------------------------------------------------------------
+def _segments(log_dir):
+    """[(first LogID, path)] of the segment files, oldest first."""
+    segments = []
+    if os.path.isdir(log_dir):
+        for name in os.listdir(log_dir):
+            first = name[len(SEGMENT_PREFIX):].split(".", 1)[0]
+            if name.startswith(SEGMENT_PREFIX) and first.isdigit():
+                segments.append((int(first), os.path.join(log_dir, name)))
+    segments.sort()
+    return segments
+
+
+def _append_segment(log_dir, rows):
+    """Append ChangeLog rows to the current segment, rotating it when full."""
+    os.makedirs(log_dir, exist_ok=True)
+    segments = _segments(log_dir)
+    if not segments or os.path.getsize(segments[-1][1]) >= SEGMENT_BYTES:
+        path = os.path.join(log_dir, f"{SEGMENT_PREFIX}{rows[0][0]:012d}.jsonl.gz")
+    else:
+        path = segments[-1][1]
+    lines = []
+    for log_id, logged_at, table, operation, key, data in rows:
+        # RowData is already JSON text from the trigger; embed it unparsed
+        lines.append(f'{{"id": {log_id}, "at": {json.dumps(logged_at)}, "table": {json.dumps(table)}, '
+                     f'"op": {json.dumps(operation)}, "key": {key}, "row": {data or "null"}}}\n')
+    # Each batch is a complete gzip member; concatenated members read as one stream
+    with open(path, "ab") as segment:
+        segment.write(gzip.compress("".join(lines).encode("utf-8")))
+        segment.flush()
+        os.fsync(segment.fileno())
+
+
+def ship_changes(database_path, log_dir=None, batch=SHIP_BATCH):
+    """Move ChangeLog rows to the segment files; returns how many were shipped.
+
+    Each batch is appended and fsynced before its rows are deleted, inside
+    one write transaction, so instances shipping at once never interleave
+    and a crash at worst ships a batch twice (replay skips repeated IDs).
+    The write lock is only taken when ChangeLog has rows to ship.
+    """
+    log_dir = log_dir or changelog_dir_for(database_path)
+    conn = sqlite3.connect(database_path, timeout=30, isolation_level=None)
+    shipped = 0
+    try:
+        while True:
+            # A plain read first: an idle database never gives up its write lock to us
+            if conn.execute("SELECT 1 FROM ChangeLog LIMIT 1").fetchone() is None:
+                return shipped
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = conn.execute("""
+                    SELECT LogID, LoggedAt, TableName, Operation, RowKey, RowData
+                    FROM ChangeLog ORDER BY LogID LIMIT ?
+                """, (batch,)).fetchall()
+                if rows:
+                    _append_segment(log_dir, rows)
+                    conn.execute("DELETE FROM ChangeLog WHERE LogID <= ?", (rows[-1][0],))
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+            shipped += len(rows)
+            if len(rows) < batch:
+                return shipped
+    except sqlite3.OperationalError as e:
+        if "no such table" in str(e):
+            return shipped  # database not migrated yet
+        raise
+    finally:
+        conn.close()
+
+
+def read_changes(log_dir, after_id=0):
+    """Yield logged changes with LogID > after_id in order, skipping duplicates."""
+    segments = _segments(log_dir)
+    last = after_id
+    for number, (first, path) in enumerate(segments):
+        if number + 1 < len(segments) and segments[number + 1][0] <= after_id + 1:
+            continue  # every entry in it is older than after_id
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as segment:
+                for line in segment:
+                    entry = json.loads(line)
+                    if entry["id"] > last:
+                        last = entry["id"]
+                        yield entry
+        except (EOFError, gzip.BadGzipFile, json.JSONDecodeError) as e:
+            # A crash mid-append leaves a torn last batch; it was never deleted
+            # from ChangeLog, so the next shipment carries it again
+            logging.warning("Change log segment %s ends early: %s", path, e)
+
+
+def prune_segments(log_dir, upto_id):
+    """Delete segments holding only changes up to upto_id (already in every snapshot)."""
+    segments = _segments(log_dir)
+    for (first, path), (next_first, _) in zip(segments, segments[1:]):
+        if next_first - 1 <= upto_id:
+            os.remove(path)
+
+
+class LogShipper(threading.Thread):
+    """Ship the ChangeLog to segment files every few seconds in the background."""
+
+    def __init__(self, database_path, log_dir=None, interval=5.0):
+        super().__init__(name="ttms-log-shipper", daemon=True)
+        self.database_path = database_path
+        self.log_dir = log_dir or changelog_dir_for(database_path)
+        self.interval = interval
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                ship_changes(self.database_path, self.log_dir)
+            except Exception:
+                # Unshipped rows stay in ChangeLog and go out with the next batch
+                logging.exception("Shipping the change log failed")
+
+    def stop(self):
+        self._stopped.set()
+
+
+# ----------------------------------------------------------------------
+# Restore
+# ----------------------------------------------------------------------
+def _replay(conn, entries, until):
+    """Apply logged changes up to the LoggedAt `until`; returns (count, last ID)."""
+    columns = {table: {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+               for table in LOGGED_TABLES}
+    statements = {}  # (table, columns) -> (update, insert)
+    applied, last = 0, None
+    for entry in entries:
+        if entry["at"] > until:
+            break
+        table, key = entry["table"], entry["key"]
+        if table not in columns:
+            raise ValueError(f"Change log names unknown table {table!r}")
+        if entry["op"] == "D":
+            conn.execute(f"DELETE FROM {table} WHERE rowid = ?", (key,))
+        else:
+            row = entry["row"]
+            names = tuple(name for name in row if name in columns[table])
+            if (table, names) not in statements:
+                statements[table, names] = (
+                    f"UPDATE {table} SET {', '.join(f'{n} = ?' for n in names)} WHERE rowid = ?",
+                    f"INSERT INTO {table} ({', '.join(names)}) VALUES ({', '.join('?' * len(names))})",
+                )
+            update, insert = statements[table, names]
+            values = [row[name] for name in names]
+            # UPDATE first so the search and tracking triggers see a normal change
+            if conn.execute(update, values + [key]).rowcount == 0:
+                conn.execute(insert, values)
+        applied += 1
+        last = entry["id"]
+    return applied, last
+
+
+def restore_to_time(target, database_path="TTMS.db", backup_dir=None):
+    """Rebuild database_path as it was at target (a datetime).
+
+    Uses the newest snapshot taken at or before target and replays the
+    change log up to it. Close every TTMS window first. The log after
+    target describes the abandoned history, so it is moved aside and a new
+    one starts; returns (snapshot path, changes replayed).
+    """
+    backup_dir = backup_dir or backup_dir_for(database_path)
+    log_dir = os.path.join(backup_dir, CHANGELOG_DIR)
+    newest = 0  # highest LogID ever handed out
+    try:
+        ship_changes(database_path, log_dir)  # don't lose the tail still in the database
+        conn = sqlite3.connect(database_path)
+        try:
+            newest = _last_log_id(conn)
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        logging.warning("Could not ship pending changes before restore: %s", e)
+        segments = _segments(log_dir)
+        if segments:
+            newest = max([0] + [entry["id"] for entry in read_changes(log_dir, segments[-1][0] - 1)])
+
+    snapshots = [path for taken, path in list_backups(backup_dir) if taken <= target]
+    if not snapshots:
+        raise ValueError(f"No backup was taken before {target:%Y-%m-%d %H:%M:%S}")
+    snapshot = snapshots[0]
+
+    partial_path = database_path + ".restore"
+    with _open_snapshot(snapshot) as source, open(partial_path, "wb") as out:
+        shutil.copyfileobj(source, out, 1024 * 1024)
+
+    conn = sqlite3.connect(partial_path, isolation_level=None)
+    try:
+        after = _last_log_id(conn)
+        # A snapshot from before a migration lacks the tables it added
+        tables = [table for table in LOGGED_TABLES if conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone()]
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Replayed rows are history already, not new changes to log
+            for table in tables:
+                for suffix in ("ai", "au", "ad"):
+                    conn.execute(f"DROP TRIGGER IF EXISTS {table}_log_{suffix}")
+            applied, last = _replay(conn, read_changes(log_dir, after), target.strftime(LOGGED_AT_FORMAT))
+            conn.execute("DELETE FROM ChangeLog")
+            # New changes are numbered past everything ever logged, abandoned or not
+            conn.execute("UPDATE sqlite_sequence SET seq = ? WHERE name = 'ChangeLog'", (max(newest, after),))
+            create_change_log_triggers(conn, tables)
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+    finally:
+        conn.close()
+    check_integrity(partial_path)
+
+    if os.path.isdir(log_dir):
+        os.replace(log_dir, f"{log_dir}_before_{datetime.now().strftime(TIMESTAMP_FORMAT)}")
+    for suffix in ("-wal", "-shm"):
+        if os.path.exists(database_path + suffix):
+            os.remove(database_path + suffix)
+    os.replace(partial_path, database_path)
+    # The new log starts here, so later restores need a snapshot of this state
+    create_backup(database_path, backup_dir, retention=None)
+    return snapshot, applied
+
+
+def restore_backup(backup_path, database_path):
+    """Decompress a snapshot to database_path; the screens must be closed first."""
+    partial_path = database_path + ".restore"
+    with _open_snapshot(backup_path) as snapshot, open(partial_path, "wb") as out:
+        shutil.copyfileobj(snapshot, out, 1024 * 1024)
+    check_integrity(partial_path)
+    for suffix in ("-wal", "-shm"):
+        if os.path.exists(database_path + suffix):
+            os.remove(database_path + suffix)
+    os.replace(partial_path, database_path)
+
+
+if __name__ == "__main__":
+    # Snapshot now, e.g. from cron / Task Scheduler while no TTMS window is open:
+    #   python ttms_backup.py [TTMS.db]
+    # or restore to a point in time with every window closed:
+    #   python ttms_backup.py restore "2024-05-01 14:30" [TTMS.db]
+    if len(sys.argv) > 2 and sys.argv[1] == "restore":
+        target = datetime.fromisoformat(sys.argv[2])
+        path = sys.argv[3] if len(sys.argv) > 3 else "TTMS.db"
+        snapshot, applied = restore_to_time(target, path)
+        print(f"Restored {path} from {snapshot} plus {applied} logged changes")
+    else:
+        path = sys.argv[1] if len(sys.argv) > 1 else "TTMS.db"
+        print(f"Backed up to {create_backup(path)}")
@@ -0,0 +1,1088 @@
+"""
+Shared SQLite data-access layer for the TTMS database backend.
+
+All management screens go through a single Database instance. It owns a
+small pool of long-lived connections (one per thread) so connection setup
+happens once per thread instead of once per query.
+"""
+import bisect
+import logging
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import timedelta
+
+from ttms_schema import SEARCH_INDEXES, iso_date
+
+DATABASE_PATH = "TTMS.db"
+
+# How long a connection waits on another writer before "database is locked"
+BUSY_TIMEOUT_MS = 30000
+
+# Ways to group the OrdersCube: name -> expression over its columns
+CUBE_DIMENSIONS = {
+    "day": "Day",
+    "month": "substr(Day, 1, 7)",
+    "year": "substr(Day, 1, 4)",
+    "region": "Region",
+    "status": "Status",
+    "customer": "Customer",
+}
+
+
+def _physical_memory():
+    """Installed RAM in bytes, or None when the platform won't say."""
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except (AttributeError, ValueError, OSError):
+        pass
+    try:
+        import ctypes
+
+        class MEMORYSTATUSEX(ctypes.Structure):
+            _fields_ = [("dwLength", ctypes.c_ulong), ("dwMemoryLoad", ctypes.c_ulong),
+                        ("ullTotalPhys", ctypes.c_ulonglong), ("ullAvailPhys", ctypes.c_ulonglong),
+                        ("ullTotalPageFile", ctypes.c_ulonglong), ("ullAvailPageFile", ctypes.c_ulonglong),
+                        ("ullTotalVirtual", ctypes.c_ulonglong), ("ullAvailVirtual", ctypes.c_ulonglong),
+                        ("ullAvailExtendedVirtual", ctypes.c_ulonglong)]
+
+        status = MEMORYSTATUSEX()
+        status.dwLength = ctypes.sizeof(MEMORYSTATUSEX)
+        if ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(status)):
+            return status.ullTotalPhys
+    except Exception:
+        pass
+    return None
+
+
+def storage_profile(memory=None):
+    """Per-connection pragmas, with cache and mmap sized to the machine's RAM."""
+    memory = memory or _physical_memory() or 4 * 1024 ** 3
+    mb = 1024 ** 2
+    cache_bytes = min(max(memory // 256, 8 * mb), 64 * mb)
+    mmap_bytes = min(max(memory // 16, 64 * mb), 256 * mb)
+    return {
+        "busy_timeout": BUSY_TIMEOUT_MS,
+        "synchronous": "NORMAL",
+        "cache_size": -(cache_bytes // 1024),  # negative = KiB
+        "mmap_size": mmap_bytes,
+        "temp_store": "MEMORY",
+    }
+
+
+def apply_storage_profile(conn, profile=None):
+    for pragma, value in (profile or storage_profile()).items():
+        conn.execute(f"PRAGMA {pragma}={value}")
+
+
+def enable_wal(conn):
+    """Switch the database file to WAL journaling and return the mode in effect.
+
+    WAL is persistent in the file, so this only needs to run once at startup.
+    WAL needs shared memory between processes and is refused on some network
+    file systems; the database then stays in its rollback journal and only the
+    busy timeout protects concurrent writers.
+    """
+    mode = conn.execute("PRAGMA journal_mode=WAL").fetchone()[0]
+    if mode.lower() != "wal":
+        logging.warning("WAL journaling unavailable for this database, using %s", mode)
+    return mode
+
+
+def match_expression(column, term):
+    """FTS5 query matching every word of term, as a prefix, within column."""
+    # Quoting makes each word a literal phrase, so punctuation such as the
+    # dashes in a CNIC or phone number is tokenized instead of parsed
+    words = ['"{}"*'.format(word.replace('"', '""')) for word in term.split()]
+    return f"{column} : ({' '.join(words)})"
+
+
+class PagedQuery:
+    """Row source that reads one LIMIT/OFFSET window of a SELECT at a time.
+
+    With table and key set (a table tracked in RowChanges whose key is the
+    first selected column, and a select without a WHERE clause) it can also
+    report the rows changed since a sync point.
+    """
+
+    def __init__(self, db, select, order_by, params=(), table=None, key=None):
+        self.db = db
+        self.select = select
+        self.order_by = order_by
+        self.params = tuple(params)
+        self.table = table
+        self.key = key
+
+    def count(self):
+        return self.db.fetch_value(f"SELECT COUNT(*) FROM ({self.select})", self.params, default=0)
+
+    def rows(self, offset, limit):
+        return self.db.fetch_all(f"{self.select} ORDER BY {self.order_by} LIMIT ? OFFSET ?",
+                                 (*self.params, limit, offset))
+
+    def row_key(self, row):
+        return row[0]
+
+    def sync_point(self):
+        return self.db.last_change()
+
+    def changes(self, since):
+        """(new sync point, changed rows, removed keys) for changes after since."""
+        if self.table is None:
+            raise ValueError("PagedQuery has no tracked table")
+        latest = self.db.last_change()
+        keys = [row[0] for row in self.db.fetch_all("""
+            SELECT RowKey FROM RowChanges
+            WHERE ChangeID > ? AND ChangeID <= ? AND +TableName = ?
+        """, (since, latest, self.table))]  # unary + keeps the scan on the ChangeID range
+        rows = []
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            rows.extend(self.db.fetch_all(
+                f"{self.select} WHERE {self.table}.{self.key} IN ({', '.join('?' * len(chunk))})",
+                (*self.params, *chunk)))
+        found = {self.row_key(row) for row in rows}
+        return latest, rows, [key for key in keys if key not in found]
+
+
+class KeysetQuery(PagedQuery):
+    """Row source over one table paged by (sort column, key) instead of OFFSET.
+
+    Each page read leaves a bookmark, the sort value and key of its last
+    row, and the next page starts WHERE (sort, key) > bookmark, so page n
+    costs the same as page 1 when the sort column is indexed. A jump past
+    the bookmarks skips rows only from the nearest one. key must be the
+    table's INTEGER PRIMARY KEY; an unfiltered count() reads the table's
+    trigger-maintained row count. where (with params) restricts the rows,
+    e.g. to a date range.
+    """
+
+    def __init__(self, db, table, key, columns="*", sort=None, descending=False, tracked=False,
+                 where=None, params=()):
+        sort = sort or key
+        if sort not in db.table_columns(table):
+            raise ValueError(f"{table} has no column {sort!r}")
+        direction = "DESC" if descending else "ASC"
+        order_by = f"{key} {direction}" if sort == key else f"{sort} {direction}, {key} {direction}"
+        select = f"SELECT {columns} FROM {table}"
+        # changes() appends its own WHERE, so filtered queries are never tracked
+        super().__init__(db, f"{select} WHERE {where}" if where else select, order_by, params,
+                         table=table if tracked and not where else None, key=key)
+        self.source_table = table
+        self.columns = columns
+        self.sort = sort
+        self.descending = descending
+        self.tracked = tracked
+        self.where = where
+        self._base = select
+        self._offsets = [0]  # sorted offsets that have a bookmark
+        self._bookmarks = {0: None}  # offset -> (sort value, key) of the row before it
+        self._positions = None  # where the sort column and key sit in a row
+
+    def sorted_by(self, column, descending=False):
+        """The same rows ordered by another column, read from the start."""
+        return KeysetQuery(self.db, self.source_table, self.key, self.columns,
+                           column, descending, self.tracked, self.where, self.params)
+
+    def copy(self):
+        """The same rows in the same order, with bookmarks of its own (for another thread)."""
+        return self.sorted_by(self.sort, self.descending)
+
+    def sort_value(self, row):
+        """The row's value in the sort column."""
+        if self._positions is None:
+            names = [column[0] for column in
+                     self.db.execute(f"{self._base} LIMIT 0").description]
+            self._positions = (names.index(self.sort), names.index(self.key))
+        return row[self._positions[0]]
+
+    def count(self):
+        # Rows may have moved; bookmarks are only valid for one reading
+        self._offsets = [0]
+        self._bookmarks = {0: None}
+        if self.where:
+            return super().count()
+        rows = self.db.row_count(self.source_table)
+        return super().count() if rows is None else rows
+
+    def rows(self, offset, limit):
+        start = self._offsets[bisect.bisect_right(self._offsets, offset) - 1]
+        skip = offset - start
+        rows = []
+        for condition, params in self._after(self._bookmarks[start]):
+            where, params = self._where(condition, params)
+            cursor = self.db.execute(f"{self._base}{where} ORDER BY {self.order_by} LIMIT ? OFFSET ?",
+                                     (*params, limit - len(rows), skip))
+            part = cursor.fetchall()
+            if self._positions is None:
+                names = [column[0] for column in cursor.description]
+                self._positions = (names.index(self.sort), names.index(self.key))
+            if part:
+                skip = 0
+            elif skip:
+                # The whole range was skipped; carry the rest into the next one
+                skip = max(0, skip - self.db.fetch_value(
+                    f"SELECT COUNT(*) FROM {self.source_table}{where}", params, default=0))
+            rows.extend(part)
+            if len(rows) == limit:
+                break
+        if rows:
+            end = offset + len(rows)
+            if end not in self._bookmarks:
+                bisect.insort(self._offsets, end)
+            sort_at, key_at = self._positions
+            self._bookmarks[end] = (rows[-1][sort_at], rows[-1][key_at])
+        return rows
+
+    def _where(self, condition, params):
+        """WHERE clause joining the filter and a bookmark condition, with params."""
+        terms = [f"({term})" for term in (self.where, condition) if term]
+        return (f" WHERE {' AND '.join(terms)}" if terms else ""), (*self.params, *params)
+
+    def _after(self, bookmark):
+        """[(condition, params)] covering the rows after a bookmark, in order.
+
+        Each range is a single index seek. NULLs sort first ascending and
+        last descending and never compare true in a row value, so they are
+        a range of their own rather than an OR that would defeat the index.
+        """
+        if bookmark is None:
+            return [(None, ())]
+        value, key = bookmark
+        sort, key_column = self.sort, self.key
+        if sort == key_column:
+            return [(f"{key_column} {'<' if self.descending else '>'} ?", (key,))]
+        if self.descending:
+            if value is None:
+                return [(f"{sort} IS NULL AND {key_column} < ?", (key,))]
+            return [(f"({sort}, {key_column}) < (?, ?)", (value, key)),
+                    (f"{sort} IS NULL", ())]
+        if value is None:
+            return [(f"{sort} IS NULL AND {key_column} > ?", (key,)),
+                    (f"{sort} IS NOT NULL", ())]
+        return [(f"({sort}, {key_column}) > (?, ?)", (value, key))]
+
+
+class ConnectionPool:
+    """Hand out one configured connection per thread and recycle idle ones."""
+
+    def __init__(self, database_path=DATABASE_PATH, max_idle=4, profile=None):
+        self.database_path = database_path
+        self.max_idle = max_idle
+        self.profile = profile or storage_profile()
+        self._lock = threading.Lock()
+        self._idle = []
+        self._in_use = {}  # thread ident -> connection
+
+    def _open(self):
+        # isolation_level=None keeps the connection in autocommit mode, so a
+        # long-lived connection never sits on an implicit open transaction.
+        # Multi-statement writes use Database.transaction() instead.
+        conn = sqlite3.connect(
+            self.database_path,
+            timeout=self.profile["busy_timeout"] / 1000,
+            isolation_level=None,
+            check_same_thread=False,
+        )
+        apply_storage_profile(conn, self.profile)
+        return conn
+
+    def _reclaim_dead_threads(self):
+        """Move connections owned by finished threads back to the idle list."""
+        alive = {thread.ident for thread in threading.enumerate()}
+        for ident in [ident for ident in self._in_use if ident not in alive]:
+            self._recycle(self._in_use.pop(ident))
+
+    def _recycle(self, conn):
+        if conn.in_transaction:
+            conn.rollback()
+        if len(self._idle) < self.max_idle:
+            self._idle.append(conn)
+        else:
+            conn.close()
+
+    def connection(self):
+        """Return the calling thread's connection, opening one if needed."""
+        ident = threading.get_ident()
+        with self._lock:
+            conn = self._in_use.get(ident)
+            if conn is not None:
+                return conn
+            self._reclaim_dead_threads()
+            conn = self._idle.pop() if self._idle else None
+        if conn is None:
+            conn = self._open()
+        with self._lock:
+            self._in_use[ident] = conn
+        return conn
+
+    def release(self):
+        """Give the calling thread's connection back to the pool."""
+        with self._lock:
+            conn = self._in_use.pop(threading.get_ident(), None)
+            if conn is not None:
+                self._recycle(conn)
+
+    def close_all(self):
+        with self._lock:
+            for conn in list(self._in_use.values()) + self._idle:
+                conn.close()
+            self._in_use.clear()
+            self._idle.clear()
+
+
+class Database:
+    """Repository of the queries used by the management screens."""
+
+    def __init__(self, database_path=DATABASE_PATH, max_idle=4):
+        self.database_path = database_path
+        self.pool = ConnectionPool(database_path, max_idle=max_idle)
+        self._search_indexes = None  # FTS5 tables present, read on first search
+
+    # ------------------------------------------------------------------
+    # Generic helpers
+    # ------------------------------------------------------------------
+    def connection(self):
+        """Pooled connection for callers that need one directly (e.g. pandas)."""
+        return self.pool.connection()
+
+    def execute(self, sql, params=()):
+        return self.connection().execute(sql, params)
+
+    def executemany(self, sql, seq_of_params):
+        with self.transaction() as cursor:
+            cursor.executemany(sql, seq_of_params)
+            return cursor
+
+    def fetch_all(self, sql, params=()):
+        return self.connection().execute(sql, params).fetchall()
+
+    def fetch_one(self, sql, params=()):
+        return self.connection().execute(sql, params).fetchone()
+
+    def table_columns(self, table):
+        return [row[1] for row in self.fetch_all(f"PRAGMA table_info({table})")]
+
+    def fetch_value(self, sql, params=(), default=None):
+        row = self.fetch_one(sql, params)
+        if row is None or row[0] is None:
+            return default
+        return row[0]
+
+    @contextmanager
+    def transaction(self, mode="DEFERRED"):
+        """Run a block of statements atomically on the thread's connection.
+
+        Nested use joins the outer transaction.
+        """
+        conn = self.connection()
+        if conn.in_transaction:
+            yield conn.cursor()
+            return
+        conn.execute(f"BEGIN {mode}")
+        try:
+            yield conn.cursor()
+        except BaseException:
+            conn.rollback()
+            raise
+        else:
+            conn.commit()
+
+    def last_change(self):
+        """Highest ChangeID in RowChanges, the sync point for incremental refresh."""
+        return self.fetch_value("SELECT MAX(ChangeID) FROM RowChanges", default=0)
+
+    def row_count(self, table):
+        """Rows in a base table from TableVersions, or None where it isn't kept."""
+        return self.fetch_value("SELECT RowCount FROM TableVersions WHERE TableName = ?", (table,))
+
+    def data_version(self):
+        """Changes when another connection or process commits to the database."""
+        return self.fetch_value("PRAGMA data_version", default=0)
+
+    def table_versions(self):
+        """{table: change counter} maintained by the version triggers."""
+        return dict(self.fetch_all("SELECT TableName, Version FROM TableVersions"))
+
+    def configure_storage(self):
+        """Put the database in WAL mode; pooled connections get the pragma profile."""
+        return enable_wal(self.connection())
+
+    def close(self):
+        self.pool.close_all()
+
+    def _ranked_search(self, select, fts, column, term):
+        """Rows of select matching term in the FTS5 index, best match first.
+
+        Returns None when the column is not full-text indexed (or FTS5 is
+        unavailable) so the caller can fall back to a LIKE scan.
+        """
+        table, key, columns = SEARCH_INDEXES[fts]
+        if column not in columns or not term.split():
+            return None
+        if self._search_indexes is None:
+            self._search_indexes = {row[0] for row in self.fetch_all(
+                "SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE '%_fts'")}
+        if fts not in self._search_indexes:
+            return None
+        return self.fetch_all(f"""
+            {select}
+            JOIN {fts} ON {fts}.rowid = {table}.{key}
+            WHERE {fts} MATCH ?
+            ORDER BY {fts}.rank
+        """, (match_expression(column, term),))
+
+    # ------------------------------------------------------------------
+    # Users
+    # ------------------------------------------------------------------
+    def authenticate(self, username, password):
+        """Return (Role, FullName) for valid credentials, otherwise None."""
+        return self.fetch_one(
+            "SELECT Role, FullName FROM Users WHERE Username = ? AND Password = ?",
+            (username, password))
+
+    def load_users(self):
+        return self.fetch_all("SELECT * FROM Users")
+
+    def users_page(self):
+        return PagedQuery(self, "SELECT * FROM Users", "UserID")
+
+    def insert_user(self, user_data):
+        self.execute("""
+            INSERT INTO Users (Username, Password, Role, FullName, Contact, Address, CNIC, Email)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, user_data)
+
+    def update_user(self, user_id, user_data):
+        self.execute("""
+            UPDATE Users
+            SET Username=?, Password=?, Role=?, FullName=?, Contact=?, Address=?, CNIC=?, Email=?
+            WHERE UserID=?
+        """, (*user_data, user_id))
+
+    def delete_user(self, user_id):
+        self.execute("DELETE FROM Users WHERE UserID=?", (user_id,))
+
+    def search_users(self, column, term):
+        rows = self._ranked_search("SELECT Users.* FROM Users", "users_fts", column, term)
+        if rows is not None:
+            return rows
+        return self.fetch_all(f"SELECT * FROM Users WHERE {column} LIKE ?", (f"%{term}%",))
+
+    # ------------------------------------------------------------------
+    # Drivers
+    # ------------------------------------------------------------------
+    def load_drivers(self):
+        return self.fetch_all("SELECT * FROM Drivers")
+
+    def drivers_page(self):
+        return PagedQuery(self, "SELECT * FROM Drivers", "DriverID", table="Drivers", key="DriverID")
+
+    def insert_driver(self, driver_data):
+        self.execute("""
+            INSERT INTO Drivers (Name, CNIC, LicenseExp, Address, Contact,
+                                 Salary, Salary_Status, DOJ, DOR, Trip, Status)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, driver_data)
+
+    def update_driver(self, driver_id, driver_data):
+        self.execute("""
+            UPDATE Drivers
+            SET Name=?, CNIC=?, LicenseExp=?, Address=?, Contact=?,
+                Salary=?, Salary_Status=?, DOJ=?, DOR=?, Trip=?, Status=?
+            WHERE DriverID=?
+        """, (*driver_data, driver_id))
+
+    def delete_driver(self, driver_id):
+        self.execute("DELETE FROM Drivers WHERE DriverID=?", (driver_id,))
+
+    def increment_driver_trips(self, driver_id):
+        self.execute("UPDATE Drivers SET Trip = Trip + 1 WHERE DriverID = ?", (driver_id,))
+
+    def set_driver_status(self, driver_id, status):
+        """Set a driver's status, counting a new trip when it becomes 'On Trip'."""
+        self.execute("""
+            UPDATE Drivers
+            SET Status = ?,
+                Trip = CASE
+                    WHEN ? = 'On Trip' THEN Trip + 1
+                    ELSE Trip
+                END
+            WHERE DriverID = ?
+        """, (status, status, driver_id))
+
+    def search_drivers(self, column, term):
+        rows = self._ranked_search("SELECT Drivers.* FROM Drivers", "drivers_fts", column, term)
+        if rows is not None:
+            return rows
+        return self.fetch_all(f"SELECT * FROM Drivers WHERE lower({column}) LIKE ?", (f"%{term}%",))
+
+    def available_drivers(self):
+        """(DriverID, Name, Status) for drivers free to take a dispatch."""
+        return self.fetch_all("""
+            SELECT DriverID, Name, Status
+            FROM Drivers
+            WHERE Status = 'Available'
+        """)
+
+    def unpaid_drivers(self):
+        return self.fetch_all("SELECT DriverID, Name FROM Drivers WHERE Salary_Status = 'Unpaid'")
+
+    def driver_license_expiry(self, driver_id):
+        return self.fetch_value("SELECT LicenseExp FROM Drivers WHERE DriverID = ?", (driver_id,))
+
+    def expiring_licenses(self, days=30):
+        return self.fetch_all("""
+            SELECT DriverID, Name, LicenseExp
+            FROM Drivers
+            WHERE julianday(LicenseExp) - julianday('now') <= ?
+        """, (days,))
+
+    def driver_status_counts(self):
+        return dict(self.fetch_all("SELECT Status, COUNT(*) FROM Drivers GROUP BY Status"))
+
+    def driver_status_breakdown(self):
+        return self.fetch_all("""
+            SELECT DriverID, Name, Status,
+                COUNT(CASE WHEN Status = 'Available' THEN 1 END) as available_days,
+                COUNT(CASE WHEN Status = 'On Trip' THEN 1 END) as trip_days,
+                COUNT(CASE WHEN Status IN ('Off Duty','On Leave') THEN 1 END) as off_days
+            FROM Drivers
+            GROUP BY DriverID, Name
+        """)
+
+    def driver_trip_counts(self):
+        return self.fetch_all("SELECT DriverID, Name, Trip FROM Drivers")
+
+    def driver_delivery_counts(self):
+        """(DriverID, Name, CompletedTrips, Status) for the performance report."""
+        return self.fetch_all("""
+            SELECT
+                d.DriverID,
+                d.Name,
+                COUNT(CASE WHEN di.Status = 'Delivered' THEN 1 END) as CompletedTrips,
+                d.Status
+            FROM Drivers d
+            LEFT JOIN Dispatch di ON d.DriverID = di.DriverID
+            GROUP BY d.DriverID
+        """)
+
+    # ------------------------------------------------------------------
+    # Salary and leave
+    # ------------------------------------------------------------------
+    def record_salary_payment(self, driver_id, amount):
+        """Mark an unpaid driver as paid and log it; False if already paid."""
+        with self.transaction("IMMEDIATE") as cursor:
+            cursor.execute("SELECT Salary_Status FROM Drivers WHERE DriverID=?", (driver_id,))
+            if cursor.fetchone()[0] != "Unpaid":
+                return False
+            cursor.execute("UPDATE Drivers SET Salary_Status='Paid' WHERE DriverID=?", (driver_id,))
+            cursor.execute("""
+                INSERT INTO SalaryHistory (DriverID, Amount, PaymentDate, Status)
+                VALUES (?, ?, date('now'), 'Paid')
+            """, (driver_id, amount))
+            return True
+
+    def run_payroll(self):
+        """Pay every unpaid driver their salary as one payroll run.
+
+        The history rows, status flips and run record commit together.
+        Returns (run_id, drivers, amount); run_id is None if nobody was unpaid.
+        """
+        with self.transaction("IMMEDIATE") as cursor:
+            unpaid = cursor.execute("""
+                SELECT DriverID, CAST(ROUND(COALESCE(Salary, 0) * 100) AS INTEGER)
+                FROM Drivers WHERE Salary_Status = 'Unpaid'
+            """).fetchall()
+            if not unpaid:
+                return None, 0, 0.0
+            total_cents = sum(cents for _, cents in unpaid)
+            cursor.execute("""
+                INSERT INTO PayrollRuns (PaymentDate, Drivers, AmountCents)
+                VALUES (date('now'), ?, ?)
+            """, (len(unpaid), total_cents))
+            run_id = cursor.lastrowid
+            cursor.executemany("""
+                INSERT INTO SalaryHistory (DriverID, Amount, PaymentDate, Status, RunID)
+                VALUES (?, ?, date('now'), 'Paid', ?)
+            """, [(driver_id, cents / 100, run_id) for driver_id, cents in unpaid])
+            cursor.executemany("UPDATE Drivers SET Salary_Status='Paid' WHERE DriverID=?",
+                               [(driver_id,) for driver_id, _ in unpaid])
+            return run_id, len(unpaid), total_cents / 100
+
+    def payroll_for_month(self, month):
+        """[(DriverID, Name, Salary, Salary_Status, Month, Payments, Amount)] paid in a 'YYYY-MM' month.
+
+        Read from the trigger-maintained PayrollMonthly, one row per driver.
+        """
+        return self.fetch_all("""
+            SELECT p.DriverID, d.Name, d.Salary, d.Salary_Status,
+                   p.Month, p.Payments, p.AmountCents / 100.0
+            FROM PayrollMonthly p
+            LEFT JOIN Drivers d ON d.DriverID = p.DriverID
+            WHERE p.Month = ?
+            ORDER BY p.DriverID
+        """, (month,))
+
+    def payroll_totals(self, first_month, last_month=None, driver_id=None):
+        """(payments, amount) over the 'YYYY-MM' months first..last inclusive."""
+        sql = """
+            SELECT COALESCE(SUM(Payments), 0), COALESCE(SUM(AmountCents), 0) / 100.0
+            FROM PayrollMonthly WHERE Month BETWEEN ? AND ?
+        """
+        params = [first_month, last_month or first_month]
+        if driver_id is not None:
+            sql += " AND DriverID = ?"
+            params.append(driver_id)
+        return self.fetch_one(sql, params)
+
+    def payroll_year_to_date(self, month, driver_id=None):
+        """(payments, amount) from January up to and including a 'YYYY-MM' month."""
+        return self.payroll_totals(f"{month[:4]}-01", month, driver_id)
+
+    def load_leave_requests(self):
+        return self.fetch_all(
+            "SELECT DriverID, StartDate, EndDate, LeaveType, Status, Reason FROM LeaveManagement")
+
+    def insert_leave_request(self, driver_id, start_date, end_date, leave_type, reason):
+        self.execute("""
+            INSERT INTO LeaveManagement
+            (DriverID, StartDate, EndDate, LeaveType, Status, Reason)
+            VALUES (?, ?, ?, ?, 'Pending', ?)
+        """, (driver_id, start_date, end_date, leave_type, reason))
+
+    def approve_leave(self, driver_id):
+        with self.transaction() as cursor:
+            cursor.execute("UPDATE LeaveManagement SET Status = 'Approved' WHERE DriverID = ?", (driver_id,))
+            cursor.execute("UPDATE Drivers SET Status = 'On Leave' WHERE DriverID = ?", (driver_id,))
+
+    def reject_leave(self, driver_id):
+        self.execute("UPDATE LeaveManagement SET Status = 'Rejected' WHERE DriverID = ?", (driver_id,))
+
+    # ------------------------------------------------------------------
+    # Trucks
+    # ------------------------------------------------------------------
+    def load_trucks(self):
+        return self.fetch_all("SELECT * FROM Trucks")
+
+    def trucks_page(self):
+        return PagedQuery(self, "SELECT * FROM Trucks", "TruckID", table="Trucks", key="TruckID")
+
+    def truck_exists(self, truck_id):
+        return self.fetch_one("SELECT 1 FROM Trucks WHERE TruckID = ?", (truck_id,)) is not None
+
+    def insert_truck(self, truck_data):
+        self.execute("""
+            INSERT INTO Trucks (TruckID, Model, Status, Permit, MaintenanceSchedule, WeightCapacity)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, truck_data)
+
+    def update_truck(self, truck_id, model, status, permit, capacity, maintenance_schedule):
+        self.execute("""
+            UPDATE Trucks
+            SET Model=?, Status=?, Permit=?, WeightCapacity=?, MaintenanceSchedule=?
+            WHERE TruckID=?
+        """, (model, status, permit, capacity, maintenance_schedule, truck_id))
+
+    def delete_truck(self, truck_id):
+        self.execute("DELETE FROM Trucks WHERE TruckID=?", (truck_id,))
+
+    def search_trucks(self, column, term):
+        rows = self._ranked_search("SELECT Trucks.* FROM Trucks", "trucks_fts", column, term)
+        if rows is not None:
+            return rows
+        return self.fetch_all(f"SELECT * FROM Trucks WHERE LOWER({column}) LIKE ?", (f"%{term}%",))
+
+    def set_truck_status(self, truck_id, status):
+        self.execute("UPDATE Trucks SET Status = ? WHERE TruckID = ?", (status, truck_id))
+
+    def available_trucks(self):
+        """(TruckID, Model, Status, WeightCapacity, Permit) for operational trucks."""
+        return self.fetch_all("""
+            SELECT TruckID, Model, Status, WeightCapacity, Permit
+            FROM Trucks
+            WHERE Status = 'Operational'
+        """)
+
+    def get_odometer(self, truck_id):
+        return self.fetch_value("SELECT Odometer FROM Trucks WHERE TruckID = ?", (truck_id,), default=0)
+
+    def set_odometer(self, truck_id, reading):
+        self.execute("UPDATE Trucks SET Odometer = ? WHERE TruckID = ?", (reading, truck_id))
+
+    def add_to_odometer(self, truck_id, distance):
+        """Add distance to a truck's odometer and return the new reading."""
+        with self.transaction("IMMEDIATE") as cursor:
+            cursor.execute("""
+                UPDATE Trucks
+                SET Odometer = COALESCE(Odometer, 0) + ?
+                WHERE TruckID = ?
+            """, (distance, truck_id))
+            cursor.execute("SELECT Odometer FROM Trucks WHERE TruckID = ?", (truck_id,))
+            row = cursor.fetchone()
+            return row[0] if row else 0
+
+    def record_maintenance(self, truck_id, amount, description, date):
+        """Log a maintenance expense against the truck's current odometer."""
+        self.execute("""
+            INSERT INTO MaintenanceHistory (TruckID, Amount, Description, Date, Odometer)
+            VALUES (?, ?, ?, ?, (SELECT COALESCE(Odometer, 0) FROM Trucks WHERE TruckID = ?))
+        """, (truck_id, amount, description, date, truck_id))
+
+    def load_maintenance_history(self):
+        return self.fetch_all("""
+            SELECT MaintenanceID, Amount, Description, Date, Odometer
+            FROM MaintenanceHistory
+        """)
+
+    def record_fuel(self, truck_id, amount, liters, date):
+        self.execute("""
+            INSERT INTO FuelHistory (TruckID, Amount, Liters, Date)
+            VALUES (?, ?, ?, ?)
+        """, (truck_id, amount, liters, date))
+
+    def fleet_usage(self):
+        """(TruckID, Model, Status, TotalTrips, Odometer) for the fleet report."""
+        return self.fetch_all("""
+            SELECT
+                t.TruckID,
+                t.Model,
+                t.Status,
+                COUNT(d.DispatchID) as TotalTrips,
+                t.Odometer
+            FROM Trucks t
+            LEFT JOIN Dispatch d ON t.TruckID = d.TruckID
+            GROUP BY t.TruckID
+        """)
+
+    # ------------------------------------------------------------------
+    # Orders
+    # ------------------------------------------------------------------
+    def load_orders(self):
+        return self.fetch_all("SELECT rowid, * FROM Orders")
+
+    def orders_page(self, sort=None, descending=False):
+        return KeysetQuery(self, "Orders", "OrderID", "rowid, *", sort, descending, tracked=True)
+
+    def order_exists(self, order_id):
+        return self.fetch_one("SELECT 1 FROM Orders WHERE OrderID = ?", (order_id,)) is not None
+
+    def insert_order(self, order_data):
+        self.execute("""
+            INSERT INTO Orders (
+                OrderID, OrderName, CustomerName, Contact, Pickup,
+                Destination, Region, Distance, Status, Weight, GST,
+                TotalAmount, PaidAmount, AmountStatus, RemainingAmount, OrderDate
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, order_data)
+
+    def update_order(self, row_id, order_data):
+        self.execute("""
+            UPDATE Orders SET
+                OrderID=?, OrderName=?, CustomerName=?, Contact=?,
+                Pickup=?, Destination=?, Region=?, Distance=?,
+                Status=?, Weight=?, GST=?, TotalAmount=?,
+                PaidAmount=?, AmountStatus=?, RemainingAmount=?, OrderDate=?
+            WHERE rowid=?
+        """, (*order_data, row_id))
+
+    def delete_order(self, row_id):
+        self.execute("DELETE FROM Orders WHERE rowid = ?", (row_id,))
+
+    def search_orders(self, column, term):
+        rows = self._ranked_search("SELECT Orders.rowid, Orders.* FROM Orders", "orders_fts", column, term)
+        if rows is not None:
+            return rows
+        return self.fetch_all(f"SELECT rowid, * FROM Orders WHERE LOWER({column}) LIKE ?", (f"%{term}%",))
+
+    def pending_orders(self):
+        """(OrderID, CustomerName, Weight, Distance, Region) for undispatched orders."""
+        return self.fetch_all("""
+            SELECT OrderID, CustomerName, Weight, Distance, Region
+            FROM Orders
+            WHERE Status = 'Pending'
+        """)
+
+    def invoice_details(self, order_id):
+        return self.fetch_one("""
+            SELECT OrderID, CustomerName, TotalAmount, GST, AmountStatus
+            FROM Orders WHERE OrderID = ?
+        """, (order_id,))
+
+    def apply_order_payment(self, order_id, amount):
+        """Add a payment to an order's paid/remaining amounts and status."""
+        with self.transaction("IMMEDIATE") as cursor:
+            cursor.execute("""
+                SELECT TotalAmount, PaidAmount, RemainingAmount
+                FROM Orders WHERE OrderID = ?
+            """, (order_id,))
+            order_data = cursor.fetchone()
+            if not order_data:
+                return False
+            total_amount, current_paid, current_remaining = order_data
+            new_remaining = float(current_remaining) - amount
+            new_paid = float(current_paid) + amount
+            status = "Completed" if new_paid >= float(total_amount) else "Partial"
+            cursor.execute("""
+                UPDATE Orders
+                SET PaidAmount = ?, RemainingAmount = ?, AmountStatus = ?
+                WHERE OrderID = ?
+            """, (new_paid, new_remaining, status, order_id))
+            return True
+
+    def orders_rollup(self, by=(), start=None, end=None, **slice_by):
+        """Order totals from the OrdersCube, grouped by the CUBE_DIMENSIONS in `by`.
+
+        start/end bound the ISO order day (inclusive); slice_by pins region,
+        status or customer to one value. Returns rows of (*group values,
+        orders, weight, distance, revenue, outstanding), largest revenue
+        first; with no `by` that is a single grand-total row.
+        """
+        conditions, params = [], []
+        if start is not None:
+            conditions.append("Day >= ?")
+            params.append(start)
+        if end is not None:
+            conditions.append("Day <= ?")
+            params.append(end)
+        for name, value in slice_by.items():
+            if name not in ("region", "status", "customer"):
+                raise ValueError(f"Cannot slice the orders cube by {name!r}")
+            conditions.append(f"{CUBE_DIMENSIONS[name]} = ?")
+            params.append(value)
+        groups = [CUBE_DIMENSIONS[name] for name in by]
+        sql = f"""
+            SELECT {"".join(f"{group}, " for group in groups)}
+                   COALESCE(SUM(Orders), 0), COALESCE(SUM(Weight), 0), COALESCE(SUM(Distance), 0),
+                   COALESCE(SUM(RevenueCents), 0) / 100.0, COALESCE(SUM(OutstandingCents), 0) / 100.0
+            FROM OrdersCube
+        """
+        if conditions:
+            sql += f" WHERE {' AND '.join(conditions)}"
+        if groups:
+            sql += f" GROUP BY {', '.join(groups)} ORDER BY SUM(RevenueCents) DESC"
+        return self.fetch_all(sql, params)
+
+    # ------------------------------------------------------------------
+    # Dispatch
+    # ------------------------------------------------------------------
+    def load_dispatches(self):
+        return self.fetch_all("""
+            SELECT d.DispatchID, d.OrderID, d.DriverID, d.TruckID,
+                   d.DispatchTime, d.Status, d.EstimatedDeliveryTime
+            FROM Dispatch d
+            ORDER BY d.DispatchTime DESC
+        """)
+
+    def dispatches_page(self, sort="DispatchTime", descending=True):
+        """Same rows as load_dispatches, read a page at a time."""
+        return KeysetQuery(self, "Dispatch", "DispatchID", """
+            DispatchID, OrderID, DriverID, TruckID,
+            DispatchTime, Status, EstimatedDeliveryTime
+        """, sort, descending, tracked=True)
+
+    def assign_dispatch(self, order_id, driver_id, truck_id, dispatch_time, estimated_delivery):
+        """Validate and record a whole dispatch assignment atomically.
+
+        Checks the order, driver and truck under the write lock, then adds the
+        order distance to the odometer, inserts the dispatch and moves order,
+        driver and truck to their in-transit states in one transaction.
+        Returns the new DispatchID; raises ValueError naming the failed check.
+        """
+        with self.transaction("IMMEDIATE") as cursor:
+            cursor.execute("""
+                SELECT Weight, Region, Distance, Status
+                FROM Orders WHERE OrderID = ?
+            """, (order_id,))
+            order = cursor.fetchone()
+            if order is None:
+                raise ValueError("Order not found!")
+            order_weight, order_region, distance, order_status = order
+            if order_status != "Pending":
+                raise ValueError(f"Order is already {order_status}!")
+
+            cursor.execute("SELECT Status FROM Drivers WHERE DriverID = ?", (driver_id,))
+            driver = cursor.fetchone()
+            if driver is None:
+                raise ValueError("Driver not found!")
+            if driver[0] != "Available":
+                raise ValueError(f"Driver is {driver[0]}!")
+
+            cursor.execute("""
+                SELECT WeightCapacity, Permit, Status
+                FROM Trucks WHERE TruckID = ?
+            """, (truck_id,))
+            truck = cursor.fetchone()
+            if truck is None:
+                raise ValueError("Truck not found!")
+            truck_capacity, truck_permit, truck_status = truck
+            if truck_status != "Operational":
+                raise ValueError(f"Truck is {truck_status}!")
+            if float(truck_capacity) < float(order_weight):
+                raise ValueError("Order weight exceeds truck capacity!")
+            if truck_permit != order_region:
+                raise ValueError("Truck permit does not match order region!")
+
+            cursor.execute("""
+                INSERT INTO Dispatch (OrderID, DriverID, TruckID, DispatchTime, Status, EstimatedDeliveryTime)
+                VALUES (?, ?, ?, ?, 'In Transit', ?)
+            """, (order_id, driver_id, truck_id, iso_date(dispatch_time), iso_date(estimated_delivery)))
+            dispatch_id = cursor.lastrowid
+            cursor.execute("UPDATE Orders SET Status = 'In Transit' WHERE OrderID = ?", (order_id,))
+            cursor.execute("""
+                UPDATE Drivers
+                SET Status = 'On Trip', Trip = COALESCE(Trip, 0) + 1
+                WHERE DriverID = ?
+            """, (driver_id,))
+            cursor.execute("""
+                UPDATE Trucks
+                SET Status = 'In Use', Odometer = COALESCE(Odometer, 0) + ?
+                WHERE TruckID = ?
+            """, (float(distance or 0), truck_id))
+            return dispatch_id
+
+    def set_dispatch_status(self, dispatch_id, status):
+        """Update a dispatch and its order to the same status."""
+        with self.transaction() as cursor:
+            cursor.execute("UPDATE Dispatch SET Status = ? WHERE DispatchID = ?", (status, dispatch_id))
+            cursor.execute("""
+                UPDATE Orders
+                SET Status = ?
+                WHERE OrderID = (SELECT OrderID FROM Dispatch WHERE DispatchID = ?)
+            """, (status, dispatch_id))
+
+    def delete_dispatch(self, dispatch_id):
+        """Delete a dispatch and free its order, driver and truck; False if missing."""
+        with self.transaction("IMMEDIATE") as cursor:
+            cursor.execute("""
+                SELECT DriverID, TruckID, OrderID
+                FROM Dispatch
+                WHERE DispatchID = ?
+            """, (dispatch_id,))
+            result = cursor.fetchone()
+            if result is None:
+                return False
+            driver_id, truck_id, order_id = result
+            cursor.execute("DELETE FROM Dispatch WHERE DispatchID = ?", (dispatch_id,))
+            cursor.execute("UPDATE Orders SET Status = 'Pending' WHERE OrderID = ?", (order_id,))
+            cursor.execute("UPDATE Drivers SET Status = 'Available' WHERE DriverID = ?", (driver_id,))
+            cursor.execute("UPDATE Trucks SET Status = 'Operational' WHERE TruckID = ?", (truck_id,))
+            return True
+
+    # ------------------------------------------------------------------
+    # Financials
+    # ------------------------------------------------------------------
+    def load_transactions(self):
+        return self.fetch_all("""
+            SELECT Date, Type, Amount, Description, PaymentMode
+            FROM Financials
+            ORDER BY Date DESC
+        """)
+
+    def transactions_page(self, sort="Date", descending=True):
+        """load_transactions rows, each led by its FinancialID, read a page at a time."""
+        return KeysetQuery(self, "Financials", "FinancialID",
+                           "FinancialID, Date, Type, Amount, Description, PaymentMode", sort, descending)
+
+    def transactions_between(self, start, end, trans_type=None, sort="Date", descending=True):
+        """transactions_page rows dated start..end (dates, inclusive), optionally of one type.
+
+        Both bounds are plain text comparisons on the ISO dates, so only the
+        rows of the range are read from idx_financials_date / _type_date.
+        """
+        where = "Date >= ? AND Date < ?"
+        params = [start.isoformat(), (end + timedelta(days=1)).isoformat()]
+        if trans_type:
+            where += " AND Type = ?"
+            params.append(trans_type)
+        return KeysetQuery(self, "Financials", "FinancialID",
+                           "FinancialID, Date, Type, Amount, Description, PaymentMode",
+                           sort, descending, where=where, params=params)
+
+    def insert_transaction(self, transaction_data, order_id=None):
+        """Add a ledger row; order payments also pass the order they pay."""
+        self.execute("""
+            INSERT INTO Financials (Date, Type, Amount, Description, PaymentMode, OrderID)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, (iso_date(transaction_data[0]), *transaction_data[1:], order_id))
+
+    def order_payments(self, order_id):
+        """transactions_page rows recorded against one order, oldest first."""
+        return self.fetch_all("""
+            SELECT FinancialID, Date, Type, Amount, Description, PaymentMode
+            FROM Financials WHERE OrderID = ? ORDER BY Date
+        """, (order_id,))
+
+    def order_reconciliation(self, mismatched_only=False):
+        """[(OrderID, CustomerName, TotalAmount, PaidAmount, RemainingAmount,
+        LedgerPaid, Payments, Difference)] comparing each order with its ledger payments.
+
+        Difference is PaidAmount less the ledger sum. Compared in cents, an
+        order is mismatched when that is non-zero or Paid + Remaining is not
+        the total. Ledger payments for orders that no longer exist come last,
+        with a NULL customer.
+        """
+        sql = """
+            WITH ledger AS (
+                SELECT OrderID, SUM(CAST(ROUND(Amount * 100) AS INTEGER)) AS PaidCents, COUNT(*) AS Payments
+                FROM Financials
+                -- unary + keeps the planner on idx_financials_order: one ordered pass, no sort
+                WHERE OrderID IS NOT NULL AND +Type = 'Order Payment'
+                GROUP BY OrderID
+            ), report AS (
+                SELECT o.OrderID, o.CustomerName, o.TotalAmount, o.PaidAmount, o.RemainingAmount,
+                       COALESCE(l.PaidCents, 0) AS PaidCents, COALESCE(l.Payments, 0) AS Payments,
+                       CAST(ROUND(COALESCE(o.PaidAmount, 0) * 100) AS INTEGER) AS OrderPaidCents,
+                       CAST(ROUND((COALESCE(o.PaidAmount, 0) + COALESCE(o.RemainingAmount, 0)
+                                   - COALESCE(o.TotalAmount, 0)) * 100) AS INTEGER) AS BalanceCents
+                FROM Orders o LEFT JOIN ledger l ON l.OrderID = o.OrderID
+                UNION ALL
+                SELECT l.OrderID, NULL, NULL, NULL, NULL, l.PaidCents, l.Payments, 0, 0
+                FROM ledger l WHERE NOT EXISTS (SELECT 1 FROM Orders o WHERE o.OrderID = l.OrderID)
+            )
+            SELECT OrderID, CustomerName, TotalAmount, PaidAmount, RemainingAmount,
+                   PaidCents / 100.0, Payments, (OrderPaidCents - PaidCents) / 100.0
+            FROM report
+        """
+        if mismatched_only:
+            sql += " WHERE OrderPaidCents <> PaidCents OR BalanceCents <> 0"
+        return self.fetch_all(sql + " ORDER BY CustomerName IS NULL, OrderID")
+
+    def ledger_summary(self, dimension, start=None, end=None):
+        """[(value, total, entries)] from the trigger-maintained LedgerSummary.
+
+        dimension is 'type', 'mode' or 'day' (Financials) or 'order_total'
+        (Orders); start/end bound the values, e.g. a range of ISO days.
+        """
+        sql = "SELECT Value, TotalCents / 100.0, Entries FROM LedgerSummary WHERE Dimension = ? AND Entries > 0"
+        params = [dimension]
+        if start is not None:
+            sql += " AND Value >= ?"
+            params.append(start)
+        if end is not None:
+            sql += " AND Value <= ?"
+            params.append(end)
+        return self.fetch_all(sql + " ORDER BY Value", params)
+
+    def _expense_total(self):
+        # Everything but order payments is an expense, untyped rows ('') included,
+        # as in the Excel version's calculate_totals
+        return self.fetch_value("""
+            SELECT SUM(TotalCents) / 100.0 FROM LedgerSummary
+            WHERE Dimension = 'type' AND Value <> 'Order Payment'
+        """, default=0)
+
+    def ledger_totals(self):
+        """(total payments, total expenses) over the whole ledger."""
+        payments = self.fetch_value("""
+            SELECT TotalCents / 100.0 FROM LedgerSummary
+            WHERE Dimension = 'type' AND Value = 'Order Payment'
+        """, default=0)
+        return payments, self._expense_total()
+
+    def financial_summary(self):
+        """(total order revenue, total expenses) for the reports screen."""
+        revenue = self.fetch_value(
+            "SELECT TotalCents / 100.0 FROM LedgerSummary WHERE Dimension = 'order_total'", default=0)
+        return revenue, self._expense_total()
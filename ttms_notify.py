@@ -0,0 +1,66 @@
+"""
+Cross-window change notification for the TTMS screens.
+
+Every table has a change counter in TableVersions, bumped by triggers. A
+ChangeWatcher polls PRAGMA data_version on a Tk timer; only when another
+connection or TTMS instance has committed does it read the counters, and
+then it calls the subscribers of just the tables whose counter moved.
+"""
+import logging
+import tkinter as tk
+
+
+class ChangeWatcher:
+    """Call back on the Tk thread when tables are changed elsewhere."""
+
+    def __init__(self, widget, db, interval_ms=1000):
+        self.widget = widget
+        self.db = db
+        self.interval_ms = interval_ms
+        self._subscribers = {}  # table -> [callback]
+        self._data_version = db.data_version()
+        self._versions = db.table_versions()
+        self._job = widget.after(interval_ms, self._poll)
+        widget.bind("<Destroy>", self._on_destroy, add="+")
+
+    def subscribe(self, table, callback):
+        """Run callback() whenever table changes in another connection."""
+        self._subscribers.setdefault(table, []).append(callback)
+
+    def changed_tables(self):
+        """Tables whose counter moved since the last check."""
+        data_version = self.db.data_version()
+        if data_version == self._data_version:
+            return []  # nobody else has committed; skip reading the counters
+        self._data_version = data_version
+        versions = self.db.table_versions()
+        changed = [table for table, version in versions.items() if self._versions.get(table) != version]
+        self._versions = versions
+        return changed
+
+    def _poll(self):
+        try:
+            # A screen watching several changed tables refreshes once
+            callbacks = []
+            for table in self.changed_tables():
+                callbacks.extend(c for c in self._subscribers.get(table, []) if c not in callbacks)
+            for callback in callbacks:
+                try:
+                    callback()
+                except Exception:
+                    logging.exception("Refresh after a table change failed")
+        except Exception:
+            # A busy or briefly locked database just delays the next check
+            logging.exception("Change check failed")
+        try:
+            self._job = self.widget.after(self.interval_ms, self._poll)
+        except tk.TclError:  # window closed
+            self._job = None
+
+    def _on_destroy(self, event):
+        if event.widget is self.widget and self._job is not None:
+            try:
+                self.widget.after_cancel(self._job)
+            except tk.TclError:
+                pass
+            self._job = None
@@ -0,0 +1,107 @@
+"""
+Payroll computation for the TTMS database backend.
+
+payroll_sheet() works out every driver's pay for a period in one pass over
+NumPy/pandas columns. Drivers.Salary is the pay for a full period. It is
+prorated to the days between DOJ and DOR that fall inside the period. Days
+of approved unpaid leave inside that window are then deducted. There are no
+per-driver Python loops, so thousands of drivers cost a few array operations.
+"""
+import calendar
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+# Leave types taken without pay; sick and annual leave are paid
+UNPAID_LEAVE_TYPES = ("Off Duty", "Emergency Leave")
+
+SHEET_COLUMNS = [
+    "DriverID", "Name", "Salary", "EmployedDays", "UnpaidLeaveDays", "PayableDays",
+    "ProratedPay", "LeaveDeduction", "NetPay",
+]
+
+
+def month_bounds(month):
+    """(first day, last day) of a 'YYYY-MM' month."""
+    year, number = int(month[:4]), int(month[5:7])
+    return date(year, number, 1), date(year, number, calendar.monthrange(year, number)[1])
+
+
+def _days(values):
+    """ISO date text as datetime64[D]; missing or unparseable values become NaT."""
+    return pd.to_datetime(values, format="%Y-%m-%d", errors="coerce").values.astype("datetime64[D]")
+
+
+def _leave_days(leave, first, last):
+    """Days covered by the union of each driver's leave intervals, clipped to first..last.
+
+    leave has DriverID, Start and End (datetime64[D]); first and last are
+    the driver's employment window aligned to those rows. Returns a Series
+    indexed by DriverID.
+    """
+    start = np.maximum(leave["Start"].values, first)
+    end = np.minimum(leave["End"].values, last)
+    spans = pd.DataFrame({"DriverID": leave["DriverID"].values, "Start": start, "End": end})
+    spans = spans[spans["End"] >= spans["Start"]].sort_values(["DriverID", "Start"], kind="stable")
+    # Overlapping requests count once: each interval starts after the
+    # furthest end seen so far for the same driver
+    reached = spans.groupby("DriverID")["End"].cummax().groupby(spans["DriverID"]).shift(1)
+    start = np.where(reached.isna(), spans["Start"], np.maximum(spans["Start"], reached + pd.Timedelta(days=1)))
+    days = (spans["End"].values.astype("datetime64[D]") - start.astype("datetime64[D]")).astype(int) + 1
+    return pd.Series(np.clip(days, 0, None), index=spans["DriverID"].values).groupby(level=0).sum()
+
+
+def payroll_sheet(db, start, end, unpaid_leave_types=UNPAID_LEAVE_TYPES):
+    """DataFrame of SHEET_COLUMNS with one row per driver for the dates start..end (inclusive)."""
+    conn = db.connection()
+    drivers = pd.read_sql_query("""
+        SELECT DriverID, Name, COALESCE(Salary, 0) AS Salary,
+               substr(DOJ, 1, 10) AS DOJ, substr(DOR, 1, 10) AS DOR
+        FROM Drivers ORDER BY DriverID
+    """, conn)
+    placeholders = ", ".join("?" * len(unpaid_leave_types))
+    leave = pd.read_sql_query(f"""
+        SELECT DriverID, substr(StartDate, 1, 10) AS Start, substr(EndDate, 1, 10) AS End
+        FROM LeaveManagement
+        WHERE Status = 'Approved' AND LeaveType IN ({placeholders})
+          AND StartDate <= ? AND EndDate >= ?
+    """, conn, params=(*unpaid_leave_types, end.isoformat(), start.isoformat()))
+
+    period_start = np.datetime64(start, "D")
+    period_end = np.datetime64(end, "D")
+    period_days = int((period_end - period_start).astype(int)) + 1
+
+    # Employment window inside the period; no DOJ/DOR means the whole period
+    joined = _days(drivers["DOJ"])
+    resigned = _days(drivers["DOR"])
+    first = np.maximum(np.where(np.isnat(joined), period_start, joined), period_start)
+    last = np.minimum(np.where(np.isnat(resigned), period_end, resigned), period_end)
+    employed = np.clip((last - first).astype(int) + 1, 0, period_days)
+
+    if len(leave):
+        leave["Start"] = _days(leave["Start"])
+        leave["End"] = _days(leave["End"])
+        window = pd.Series(np.arange(len(drivers)), index=drivers["DriverID"].values)
+        rows = window.reindex(leave["DriverID"].values).values
+        leave = leave[~np.isnan(rows)]
+        rows = rows[~np.isnan(rows)].astype(int)
+        unpaid = _leave_days(leave, first[rows], last[rows])
+        unpaid = unpaid.reindex(drivers["DriverID"].values, fill_value=0).values
+    else:
+        unpaid = np.zeros(len(drivers), dtype=int)
+    unpaid = np.minimum(unpaid, employed)
+
+    daily = drivers["Salary"].values.astype(float) / period_days
+    sheet = pd.DataFrame({
+        "DriverID": drivers["DriverID"],
+        "Name": drivers["Name"],
+        "Salary": drivers["Salary"],
+        "EmployedDays": employed,
+        "UnpaidLeaveDays": unpaid,
+        "PayableDays": employed - unpaid,
+        "ProratedPay": np.round(daily * employed, 2),
+        "LeaveDeduction": np.round(daily * unpaid, 2),
+    })
+    sheet["NetPay"] = (sheet["ProratedPay"] - sheet["LeaveDeduction"]).round(2)
+    return sheet[SHEET_COLUMNS]
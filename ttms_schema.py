@@ -0,0 +1,811 @@
+"""
+Authoritative schema and migrations for the TTMS database backend.
+
+The schema version lives in PRAGMA user_version. migrate() applies every
+step newer than that version, each in its own transaction, and does no DDL
+at all when the database is already current. New tables, columns and
+indexes are added by appending a step to MIGRATIONS.
+
+Run this module directly to migrate a database file and print the query
+plans of the hot screen queries.
+"""
+import logging
+import re
+import sqlite3
+import sys
+from datetime import date, datetime
+
+BASE_TABLES = {
+    "Users": '''
+        CREATE TABLE IF NOT EXISTS Users (
+            UserID INTEGER PRIMARY KEY AUTOINCREMENT,
+            Username TEXT UNIQUE NOT NULL,
+            Password TEXT NOT NULL,
+            Role TEXT NOT NULL,
+            FullName TEXT,
+            Contact TEXT,
+            Address TEXT,
+            CNIC TEXT UNIQUE,
+            Email TEXT
+        )
+    ''',
+    "Drivers": '''
+        CREATE TABLE IF NOT EXISTS Drivers (
+            DriverID INTEGER PRIMARY KEY AUTOINCREMENT,
+            Name TEXT NOT NULL,
+            CNIC TEXT UNIQUE,
+            LicenseExp DATE,
+            Address TEXT,
+            Contact TEXT,
+            Salary REAL,
+            Salary_Status TEXT,
+            DOJ DATE,
+            DOR DATE,
+            Trip INTEGER,
+            Status TEXT
+        )
+    ''',
+    "Trucks": '''
+        CREATE TABLE IF NOT EXISTS Trucks (
+            TruckID INTEGER PRIMARY KEY AUTOINCREMENT,
+            Model TEXT,
+            Status TEXT,
+            Permit TEXT,
+            WeightCapacity REAL,
+            MaintenanceSchedule DATE,
+            Odometer INTEGER
+        )
+    ''',
+    "Orders": '''
+        CREATE TABLE IF NOT EXISTS Orders (
+            OrderID INTEGER PRIMARY KEY AUTOINCREMENT,
+            OrderName TEXT,
+            CustomerName TEXT,
+            Contact TEXT,
+            Pickup TEXT,
+            Destination TEXT,
+            Region TEXT,
+            Distance REAL,
+            Status TEXT,
+            Weight REAL,
+            GST REAL,
+            TotalAmount REAL,
+            PaidAmount REAL,
+            AmountStatus TEXT,
+            RemainingAmount REAL,
+            OrderDate DATE
+        )
+    ''',
+    "Dispatch": '''
+        CREATE TABLE IF NOT EXISTS Dispatch (
+            DispatchID INTEGER PRIMARY KEY AUTOINCREMENT,
+            OrderID INTEGER,
+            DriverID INTEGER,
+            TruckID INTEGER,
+            DispatchTime DATETIME,
+            Status TEXT,
+            EstimatedDeliveryTime DATETIME,
+            FOREIGN KEY (OrderID) REFERENCES Orders(OrderID),
+            FOREIGN KEY (DriverID) REFERENCES Drivers(DriverID),
+            FOREIGN KEY (TruckID) REFERENCES Trucks(TruckID)
+        )
+    ''',
+    "Financials": '''
+        CREATE TABLE IF NOT EXISTS Financials (
+            FinancialID INTEGER PRIMARY KEY AUTOINCREMENT,
+            Date DATE,
+            Type TEXT,
+            Amount REAL,
+            Description TEXT,
+            PaymentMode TEXT
+        )
+    ''',
+    "MaintenanceHistory": '''
+        CREATE TABLE IF NOT EXISTS MaintenanceHistory (
+            MaintenanceID INTEGER PRIMARY KEY AUTOINCREMENT,
+            TruckID INTEGER,
+            Amount REAL,
+            Description TEXT,
+            Date DATE,
+            Odometer INTEGER,
+            FOREIGN KEY (TruckID) REFERENCES Trucks(TruckID)
+        )
+    ''',
+    "FuelHistory": '''
+        CREATE TABLE IF NOT EXISTS FuelHistory (
+            FuelID INTEGER PRIMARY KEY AUTOINCREMENT,
+            TruckID INTEGER,
+            Amount REAL,
+            Liters REAL,
+            Date DATE,
+            FOREIGN KEY (TruckID) REFERENCES Trucks(TruckID)
+        )
+    ''',
+    "SalaryHistory": '''
+        CREATE TABLE IF NOT EXISTS SalaryHistory (
+            SalaryID INTEGER PRIMARY KEY AUTOINCREMENT,
+            DriverID INTEGER,
+            Amount REAL,
+            PaymentDate DATE,
+            Status TEXT,
+            FOREIGN KEY (DriverID) REFERENCES Drivers(DriverID)
+        )
+    ''',
+    "LeaveManagement": '''
+        CREATE TABLE IF NOT EXISTS LeaveManagement (
+            LeaveID INTEGER PRIMARY KEY AUTOINCREMENT,
+            DriverID INTEGER NOT NULL,
+            StartDate DATE NOT NULL,
+            EndDate DATE NOT NULL,
+            LeaveType TEXT NOT NULL,
+            Status TEXT NOT NULL,
+            Reason TEXT,
+            FOREIGN KEY (DriverID) REFERENCES Drivers(DriverID)
+        )
+    ''',
+}
+
+# Tables whose row changes go to the ChangeLog for point-in-time restore
+LOGGED_TABLES = tuple(BASE_TABLES) + ("PayrollRuns",)
+
+# name -> (table, columns). Trailing columns make the index covering for the
+# query listed against it in HOT_QUERIES, so SQLite never visits the table.
+INDEXES = {
+    "idx_drivers_status": ("Drivers", "Status, Name"),
+    "idx_drivers_salary_status": ("Drivers", "Salary_Status, Name"),
+    "idx_trucks_status": ("Trucks", "Status, Model, WeightCapacity, Permit"),
+    "idx_orders_status": ("Orders", "Status, CustomerName, Weight, Distance, Region"),
+    "idx_dispatch_truck": ("Dispatch", "TruckID"),
+    "idx_dispatch_driver": ("Dispatch", "DriverID, Status"),
+    "idx_dispatch_order": ("Dispatch", "OrderID"),
+    "idx_dispatch_time": ("Dispatch", "DispatchTime"),
+    "idx_financials_type": ("Financials", "Type, Amount"),
+    "idx_financials_date": ("Financials", "Date"),
+    "idx_financials_type_date": ("Financials", "Type, Date"),
+    "idx_financials_order": ("Financials", "OrderID, Type, Amount"),
+    "idx_salary_driver": ("SalaryHistory", "DriverID"),
+    "idx_maintenance_truck": ("MaintenanceHistory", "TruckID"),
+    "idx_fuel_truck": ("FuelHistory", "TruckID"),
+    "idx_leave_driver": ("LeaveManagement", "DriverID"),
+}
+
+# FTS5 table -> (content table, key column, indexed columns). These are
+# external-content tables: they hold only the token index and read the text
+# back from the content table, kept in sync by the triggers below.
+SEARCH_INDEXES = {
+    "drivers_fts": ("Drivers", "DriverID", ("Name", "Contact")),
+    "trucks_fts": ("Trucks", "TruckID", ("Model", "Permit")),
+    "orders_fts": ("Orders", "OrderID", ("CustomerName", "Pickup", "Destination")),
+    "users_fts": ("Users", "UserID", ("Username", "FullName", "CNIC")),
+}
+
+# table -> key column. Triggers stamp every insert, update and delete in
+# RowChanges so screens can fetch just the rows changed since they last looked.
+TRACKED_TABLES = {
+    "Drivers": "DriverID",
+    "Trucks": "TruckID",
+    "Orders": "OrderID",
+    "Dispatch": "DispatchID",
+}
+
+# index name -> a query from the screens that should be served by it
+HOT_QUERIES = {
+    "idx_drivers_status": "SELECT DriverID, Name, Status FROM Drivers WHERE Status = 'Available'",
+    "idx_drivers_salary_status": "SELECT DriverID, Name FROM Drivers WHERE Salary_Status = 'Unpaid'",
+    "idx_trucks_status": ("SELECT TruckID, Model, Status, WeightCapacity, Permit "
+                          "FROM Trucks WHERE Status = 'Operational'"),
+    "idx_orders_status": ("SELECT OrderID, CustomerName, Weight, Distance, Region "
+                          "FROM Orders WHERE Status = 'Pending'"),
+    "idx_dispatch_truck": ("SELECT t.TruckID, COUNT(d.DispatchID) FROM Trucks t "
+                           "LEFT JOIN Dispatch d ON t.TruckID = d.TruckID GROUP BY t.TruckID"),
+    "idx_dispatch_driver": ("SELECT d.DriverID, COUNT(CASE WHEN di.Status = 'Delivered' THEN 1 END) "
+                            "FROM Drivers d LEFT JOIN Dispatch di ON d.DriverID = di.DriverID "
+                            "GROUP BY d.DriverID"),
+    "idx_dispatch_order": "SELECT DispatchID FROM Dispatch WHERE OrderID = 1",
+    "idx_dispatch_time": "SELECT * FROM Dispatch ORDER BY DispatchTime DESC",
+    "idx_financials_type": "SELECT SUM(Amount) FROM Financials WHERE Type = 'Order Payment'",
+    "idx_financials_date": "SELECT * FROM Financials ORDER BY Date DESC",
+    "idx_financials_type_date": ("SELECT * FROM Financials WHERE Type = 'Fuel' "
+                                 "AND Date >= '2024-01-01' AND Date < '2024-02-01'"),
+    "idx_financials_order": ("SELECT OrderID, SUM(Amount) FROM Financials "
+                             "WHERE OrderID IS NOT NULL AND +Type = 'Order Payment' GROUP BY OrderID"),
+    "idx_salary_driver": "SELECT * FROM SalaryHistory WHERE DriverID = 1",
+    "idx_maintenance_truck": "SELECT * FROM MaintenanceHistory WHERE TruckID = 1",
+    "idx_fuel_truck": "SELECT * FROM FuelHistory WHERE TruckID = 1",
+    "idx_leave_driver": "UPDATE LeaveManagement SET Status = 'Approved' WHERE DriverID = 1",
+}
+
+
+# Columns holding dates or timestamps. They are stored as ISO 8601 text,
+# 'YYYY-MM-DD' or 'YYYY-MM-DD HH:MM:SS', so text order is time order and a
+# date range is an index range.
+DATE_COLUMNS = {
+    "Drivers": ("LicenseExp", "DOJ", "DOR"),
+    "Trucks": ("MaintenanceSchedule",),
+    "Orders": ("OrderDate",),
+    "Dispatch": ("DispatchTime", "EstimatedDeliveryTime"),
+    "Financials": ("Date",),
+    "MaintenanceHistory": ("Date",),
+    "FuelHistory": ("Date",),
+    "SalaryHistory": ("PaymentDate",),
+    "LeaveManagement": ("StartDate", "EndDate"),
+}
+
+# Shapes written by this and earlier TTMS versions, as (pattern, field order).
+# DateEntry without a date_pattern writes the locale's month-first short date.
+# Matched with regexes because strptime is far too slow for a migration.
+_DATE_SHAPES = (
+    (re.compile(r"(\d{4})-(\d{1,2})-(\d{1,2})(?:[ T](\d{1,2}):(\d{2})(?::(\d{2})(?:\.\d*)?)?)?$"), "ymd"),
+    (re.compile(r"(\d{4})/(\d{1,2})/(\d{1,2})$"), "ymd"),
+    (re.compile(r"(\d{1,2})/(\d{1,2})/(\d{4}|\d{2})$"), "mdy"),
+    (re.compile(r"(\d{1,2})-(\d{1,2})-(\d{4})$"), "dmy"),
+)
+
+
+def iso_date(value):
+    """value as 'YYYY-MM-DD' or 'YYYY-MM-DD HH:MM:SS'; anything unparseable is returned as is."""
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%d %H:%M:%S")
+    if isinstance(value, date):
+        return value.isoformat()
+    if not isinstance(value, str):
+        return value
+    text = value.strip()
+    for pattern, order in _DATE_SHAPES:
+        match = pattern.match(text)
+        if not match:
+            continue
+        fields = match.groups()
+        year, month, day = (int(fields[order.index(part)]) for part in "ymd")
+        if len(fields[order.index("y")]) == 2:
+            year += 1900 if year >= 69 else 2000  # same pivot as strptime's %y
+        hour, minute, second = (int(field or 0) for field in fields[3:6]) if len(fields) > 3 else (0, 0, 0)
+        try:
+            parsed = datetime(year, month, day, hour, minute, second)
+        except ValueError:
+            return value
+        return parsed.strftime("%Y-%m-%d %H:%M:%S" if len(fields) > 3 and fields[3] else "%Y-%m-%d")
+    return value
+
+
+def ensure_indexes(conn, names=None):
+    """Create the named indexes (all by default) if they are missing."""
+    for name in names or INDEXES:
+        table, columns = INDEXES[name]
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})")
+
+
+def _create_base_tables(conn):
+    # IF NOT EXISTS / OR IGNORE so databases created before versioning adopt cleanly
+    for create_table_sql in BASE_TABLES.values():
+        conn.execute(create_table_sql)
+    conn.execute("""
+        INSERT OR IGNORE INTO Users (Username, Password, Role)
+        VALUES (?, ?, ?)
+    """, ("admin", "admin123", "Admin"))
+
+
+def _create_indexes(conn):
+    # Indexes over columns added by later steps are created by those steps
+    existing = {}
+    for name, (table, columns) in INDEXES.items():
+        if table not in existing:
+            existing[table] = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+        if {c.strip() for c in columns.split(",")} <= existing[table]:
+            ensure_indexes(conn, [name])
+
+
+def _rebuild_fuel_history(conn):
+    """Replace a FuelHistory left by the old inline schema (no FuelID, TEXT TruckID)."""
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(FuelHistory)")]
+    if "FuelID" in columns:
+        return
+    conn.execute("ALTER TABLE FuelHistory RENAME TO FuelHistory_old")
+    conn.execute(BASE_TABLES["FuelHistory"])
+    conn.execute("""
+        INSERT INTO FuelHistory (TruckID, Amount, Liters, Date)
+        SELECT CAST(TruckID AS INTEGER), Amount, Liters, Date FROM FuelHistory_old
+    """)
+    conn.execute("DROP TABLE FuelHistory_old")
+    ensure_indexes(conn, ["idx_fuel_truck"])
+
+
+def _create_search_indexes(conn):
+    for fts, (table, key, columns) in SEARCH_INDEXES.items():
+        column_list = ", ".join(columns)
+        new_values = ", ".join(f"new.{column}" for column in columns)
+        old_values = ", ".join(f"old.{column}" for column in columns)
+        try:
+            conn.execute(f"""
+                CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5(
+                    {column_list},
+                    content='{table}', content_rowid='{key}',
+                    tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+                )
+            """)
+        except sqlite3.OperationalError as e:
+            # Python builds without FTS5 keep the LIKE search in ttms_db
+            logging.warning("Full-text search unavailable: %s", e)
+            return
+        # An external-content row is removed by replaying its old values
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN
+                INSERT INTO {fts} (rowid, {column_list}) VALUES (new.{key}, {new_values});
+            END
+        """)
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN
+                INSERT INTO {fts} ({fts}, rowid, {column_list}) VALUES ('delete', old.{key}, {old_values});
+            END
+        """)
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {key}, {column_list} ON {table} BEGIN
+                INSERT INTO {fts} ({fts}, rowid, {column_list}) VALUES ('delete', old.{key}, {old_values});
+                INSERT INTO {fts} (rowid, {column_list}) VALUES (new.{key}, {new_values});
+            END
+        """)
+        conn.execute(f"INSERT INTO {fts} ({fts}) VALUES ('rebuild')")
+
+
+def _create_change_tracking(conn):
+    # One row per changed key; REPLACE moves it to a fresh, higher ChangeID
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS RowChanges (
+            ChangeID INTEGER PRIMARY KEY AUTOINCREMENT,
+            TableName TEXT NOT NULL,
+            RowKey INTEGER NOT NULL,
+            UNIQUE (TableName, RowKey)
+        )
+    """)
+    for table, key in TRACKED_TABLES.items():
+        stamp = "INSERT OR REPLACE INTO RowChanges (TableName, RowKey) VALUES ('{}', {}.{});"
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {table}_changes_ai AFTER INSERT ON {table} BEGIN
+                {stamp.format(table, "new", key)}
+            END
+        """)
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {table}_changes_au AFTER UPDATE ON {table} BEGIN
+                {stamp.format(table, "old", key)}
+                {stamp.format(table, "new", key)}
+            END
+        """)
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {table}_changes_ad AFTER DELETE ON {table} BEGIN
+                {stamp.format(table, "old", key)}
+            END
+        """)
+
+
+def _create_table_versions(conn):
+    # Bumped by every row change; ttms_notify compares them to find what changed
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS TableVersions (
+            TableName TEXT PRIMARY KEY,
+            Version INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+    """)
+    for table in BASE_TABLES:
+        conn.execute("INSERT OR IGNORE INTO TableVersions (TableName) VALUES (?)", (table,))
+        bump = f"UPDATE TableVersions SET Version = Version + 1 WHERE TableName = '{table}';"
+        for suffix, event in (("ai", "INSERT"), ("au", "UPDATE"), ("ad", "DELETE")):
+            conn.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS {table}_version_{suffix} AFTER {event} ON {table} BEGIN
+                    {bump}
+                END
+            """)
+
+
+def create_change_log_triggers(conn, tables=None):
+    """(Re)create the ChangeLog triggers; rerun after adding columns to a table."""
+    for table in tables or BASE_TABLES:
+        columns = [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+        row_data = "json_object({})".format(", ".join(f"'{c}', new.{c}" for c in columns))
+        log = "INSERT INTO ChangeLog (TableName, Operation, RowKey, RowData)"
+        for suffix in ("ai", "au", "ad"):
+            conn.execute(f"DROP TRIGGER IF EXISTS {table}_log_{suffix}")
+        conn.execute(f"""
+            CREATE TRIGGER {table}_log_ai AFTER INSERT ON {table} BEGIN
+                {log} VALUES ('{table}', 'I', new.rowid, {row_data});
+            END
+        """)
+        # A key change is logged as delete + upsert so replay never leaves the old row
+        conn.execute(f"""
+            CREATE TRIGGER {table}_log_au AFTER UPDATE ON {table} BEGIN
+                {log} SELECT '{table}', 'D', old.rowid, NULL WHERE old.rowid IS NOT new.rowid;
+                {log} VALUES ('{table}', 'U', new.rowid, {row_data});
+            END
+        """)
+        conn.execute(f"""
+            CREATE TRIGGER {table}_log_ad AFTER DELETE ON {table} BEGIN
+                {log} VALUES ('{table}', 'D', old.rowid, NULL);
+            END
+        """)
+
+
+def _create_change_log(conn):
+    # Written by triggers inside each writer's own transaction and drained
+    # to segment files by ttms_backup.ship_changes
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS ChangeLog (
+            LogID INTEGER PRIMARY KEY AUTOINCREMENT,
+            LoggedAt TEXT NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime')),
+            TableName TEXT NOT NULL,
+            Operation TEXT NOT NULL,
+            RowKey INTEGER NOT NULL,
+            RowData TEXT
+        )
+    """)
+    create_change_log_triggers(conn)
+
+
+_ISO_DATE_GLOB = "[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]"
+_ISO_DATETIME_GLOB = _ISO_DATE_GLOB + " [0-9][0-9]:[0-9][0-9]:[0-9][0-9]"
+
+
+def _normalize_dates(conn):
+    conn.create_function("iso_date", 1, iso_date, deterministic=True)
+    for table, columns in DATE_COLUMNS.items():
+        for column in columns:
+            # Values already in shape are skipped in SQL, and only rows that
+            # actually change are written, so the change log stays small
+            conn.execute(f"""
+                UPDATE {table} SET {column} = iso_date({column})
+                WHERE {column} NOT GLOB '{_ISO_DATE_GLOB}'
+                  AND {column} NOT GLOB '{_ISO_DATETIME_GLOB}'
+                  AND {column} IS NOT iso_date({column})
+            """)
+            unparsed = conn.execute(f"""
+                SELECT COUNT(*) FROM {table}
+                WHERE {column} NOT GLOB '{_ISO_DATE_GLOB}*' AND {column} <> ''
+            """).fetchone()[0]
+            if unparsed:
+                logging.warning("%d %s.%s values are not dates and were left as they are",
+                                unparsed, table, column)
+    ensure_indexes(conn, ["idx_financials_type_date"])
+
+
+# Running ledger totals: table -> (amount column, columns the totals depend
+# on, {dimension: value expression}). Amounts are kept in integer cents so adding and removing
+# rows in any order lands on exactly the same totals as a fresh SUM.
+LEDGER_SOURCES = {
+    "Financials": ("Amount", "Date, Type, Amount, PaymentMode", {
+        "type": "COALESCE({row}.Type, '')",
+        "mode": "COALESCE({row}.PaymentMode, '')",
+        "day": "COALESCE(substr({row}.Date, 1, 10), '')",
+    }),
+    "Orders": ("TotalAmount", "TotalAmount", {
+        "order_total": "''",
+    }),
+}
+
+
+def _ledger_apply(dimensions, amount, row, sign):
+    """Trigger statements adding (sign '') or removing (sign '-') one row's amount."""
+    cents = f"CAST(ROUND(COALESCE({row}.{amount}, 0) * 100) AS INTEGER)"
+    return "\n".join(f"""
+        INSERT INTO LedgerSummary (Dimension, Value, TotalCents, Entries)
+        VALUES ('{name}', {expression.format(row=row)}, {sign}{cents}, {sign}1)
+        ON CONFLICT (Dimension, Value) DO UPDATE SET
+            TotalCents = TotalCents + excluded.TotalCents,
+            Entries = Entries + excluded.Entries;""" for name, expression in dimensions.items())
+
+
+def _create_ledger_summary(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS LedgerSummary (
+            Dimension TEXT NOT NULL,
+            Value TEXT NOT NULL,
+            TotalCents INTEGER NOT NULL DEFAULT 0,
+            Entries INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (Dimension, Value)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("DELETE FROM LedgerSummary")
+    for table, (amount, watched, dimensions) in LEDGER_SOURCES.items():
+        # Backfill from the rows already there, then keep up row by row
+        for name, expression in dimensions.items():
+            conn.execute(f"""
+                INSERT INTO LedgerSummary (Dimension, Value, TotalCents, Entries)
+                SELECT '{name}', {expression.format(row=table)},
+                       SUM(CAST(ROUND(COALESCE({amount}, 0) * 100) AS INTEGER)), COUNT(*)
+                FROM {table} GROUP BY 2
+            """)
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {table}_ledger_ai AFTER INSERT ON {table} BEGIN
+                {_ledger_apply(dimensions, amount, "new", "")}
+            END
+        """)
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {table}_ledger_ad AFTER DELETE ON {table} BEGIN
+                {_ledger_apply(dimensions, amount, "old", "-")}
+            END
+        """)
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {table}_ledger_au AFTER UPDATE OF {watched} ON {table} BEGIN
+                {_ledger_apply(dimensions, amount, "old", "-")}
+                {_ledger_apply(dimensions, amount, "new", "")}
+            END
+        """)
+
+
+# Orders rollup cube: one row per (day, region, status, customer) cell.
+# Money is in integer cents like LedgerSummary; empty cells are deleted.
+ORDERS_CUBE_KEY = {
+    "Day": "COALESCE(substr({row}.OrderDate, 1, 10), '')",
+    "Region": "COALESCE({row}.Region, '')",
+    "Status": "COALESCE({row}.Status, '')",
+    "Customer": "COALESCE({row}.CustomerName, '')",
+}
+ORDERS_CUBE_MEASURES = {
+    "Orders": "1",
+    "Weight": "COALESCE({row}.Weight, 0)",
+    "Distance": "COALESCE({row}.Distance, 0)",
+    "RevenueCents": "CAST(ROUND(COALESCE({row}.TotalAmount, 0) * 100) AS INTEGER)",
+    "OutstandingCents": "CAST(ROUND(COALESCE({row}.RemainingAmount, 0) * 100) AS INTEGER)",
+}
+
+
+def _cube_apply(row, sign):
+    """Trigger statements adding (sign '') or removing (sign '-') one order."""
+    keys = ", ".join(ORDERS_CUBE_KEY)
+    measures = ", ".join(ORDERS_CUBE_MEASURES)
+    values = ", ".join([e.format(row=row) for e in ORDERS_CUBE_KEY.values()] +
+                       [f"{sign}{e.format(row=row)}" for e in ORDERS_CUBE_MEASURES.values()])
+    updates = ", ".join(f"{m} = {m} + excluded.{m}" for m in ORDERS_CUBE_MEASURES)
+    statements = f"""
+        INSERT INTO OrdersCube ({keys}, {measures}) VALUES ({values})
+        ON CONFLICT ({keys}) DO UPDATE SET {updates};"""
+    if sign:
+        cell = " AND ".join(f"{k} = {e.format(row=row)}" for k, e in ORDERS_CUBE_KEY.items())
+        statements += f"""
+        DELETE FROM OrdersCube WHERE {cell} AND Orders = 0;"""
+    return statements
+
+
+def _create_orders_cube(conn):
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS OrdersCube (
+            {", ".join(f"{k} TEXT NOT NULL" for k in ORDERS_CUBE_KEY)},
+            Orders INTEGER NOT NULL,
+            Weight REAL NOT NULL,
+            Distance REAL NOT NULL,
+            RevenueCents INTEGER NOT NULL,
+            OutstandingCents INTEGER NOT NULL,
+            PRIMARY KEY ({", ".join(ORDERS_CUBE_KEY)})
+        ) WITHOUT ROWID
+    """)
+    conn.execute("DELETE FROM OrdersCube")
+    keys = [e.format(row="Orders") for e in ORDERS_CUBE_KEY.values()]
+    conn.execute(f"""
+        INSERT INTO OrdersCube ({", ".join(ORDERS_CUBE_KEY)}, {", ".join(ORDERS_CUBE_MEASURES)})
+        SELECT {", ".join(keys)}, {", ".join(f"SUM({e.format(row='Orders')})" for e in ORDERS_CUBE_MEASURES.values())}
+        FROM Orders GROUP BY {", ".join(keys)}
+    """)
+    columns = "OrderDate, Region, Status, CustomerName, Weight, Distance, TotalAmount, RemainingAmount"
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS Orders_cube_ai AFTER INSERT ON Orders BEGIN
+            {_cube_apply("new", "")}
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS Orders_cube_ad AFTER DELETE ON Orders BEGIN
+            {_cube_apply("old", "-")}
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS Orders_cube_au AFTER UPDATE OF {columns} ON Orders BEGIN
+            {_cube_apply("old", "-")}
+            {_cube_apply("new", "")}
+        END
+    """)
+    # Status and region slices without a day range
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_orders_cube_status ON OrdersCube (Status, Region)")
+
+
+# Payroll summary: one row per (month, driver) of SalaryHistory, keyed on
+# the 'YYYY-MM' prefix of PaymentDate. Cents as in LedgerSummary.
+PAYROLL_MONTH = "COALESCE(substr({row}.PaymentDate, 1, 7), '')"
+
+
+def _payroll_apply(row, sign):
+    """Trigger statements adding (sign '') or removing (sign '-') one payment."""
+    month = PAYROLL_MONTH.format(row=row)
+    cents = f"CAST(ROUND(COALESCE({row}.Amount, 0) * 100) AS INTEGER)"
+    statements = f"""
+        INSERT INTO PayrollMonthly (Month, DriverID, Payments, AmountCents)
+        VALUES ({month}, COALESCE({row}.DriverID, 0), {sign}1, {sign}{cents})
+        ON CONFLICT (Month, DriverID) DO UPDATE SET
+            Payments = Payments + excluded.Payments,
+            AmountCents = AmountCents + excluded.AmountCents;"""
+    if sign:
+        statements += f"""
+        DELETE FROM PayrollMonthly
+        WHERE Month = {month} AND DriverID = COALESCE({row}.DriverID, 0) AND Payments = 0;"""
+    return statements
+
+
+def _create_payroll_monthly(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS PayrollMonthly (
+            Month TEXT NOT NULL,
+            DriverID INTEGER NOT NULL,
+            Payments INTEGER NOT NULL,
+            AmountCents INTEGER NOT NULL,
+            PRIMARY KEY (Month, DriverID)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("DELETE FROM PayrollMonthly")
+    month = PAYROLL_MONTH.format(row="SalaryHistory")
+    conn.execute(f"""
+        INSERT INTO PayrollMonthly (Month, DriverID, Payments, AmountCents)
+        SELECT {month}, COALESCE(DriverID, 0), COUNT(*),
+               SUM(CAST(ROUND(COALESCE(Amount, 0) * 100) AS INTEGER))
+        FROM SalaryHistory GROUP BY 1, 2
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS SalaryHistory_payroll_ai AFTER INSERT ON SalaryHistory BEGIN
+            {_payroll_apply("new", "")}
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS SalaryHistory_payroll_ad AFTER DELETE ON SalaryHistory BEGIN
+            {_payroll_apply("old", "-")}
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS SalaryHistory_payroll_au
+        AFTER UPDATE OF DriverID, Amount, PaymentDate ON SalaryHistory BEGIN
+            {_payroll_apply("old", "-")}
+            {_payroll_apply("new", "")}
+        END
+    """)
+    # One driver's months, for year-to-date totals
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_payroll_driver ON PayrollMonthly (DriverID, Month)")
+    ensure_indexes(conn, ["idx_drivers_salary_status"])
+
+
+def _create_payroll_runs(conn):
+    # One row per bulk payroll run; its SalaryHistory rows carry the RunID
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS PayrollRuns (
+            RunID INTEGER PRIMARY KEY AUTOINCREMENT,
+            RunAt TEXT NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%S', 'now', 'localtime')),
+            PaymentDate TEXT NOT NULL,
+            Drivers INTEGER NOT NULL,
+            AmountCents INTEGER NOT NULL
+        )
+    """)
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(SalaryHistory)")]
+    if "RunID" not in columns:
+        conn.execute("ALTER TABLE SalaryHistory ADD COLUMN RunID INTEGER REFERENCES PayrollRuns(RunID)")
+    create_change_log_triggers(conn, ["SalaryHistory", "PayrollRuns"])
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_salary_run ON SalaryHistory (RunID)")
+
+
+# record_payment has always described order payments this way
+ORDER_REFERENCE_PREFIX = "Order ID: "
+
+
+def _link_financials_to_orders(conn):
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(Financials)")]
+    if "OrderID" not in columns:
+        conn.execute("ALTER TABLE Financials ADD COLUMN OrderID INTEGER REFERENCES Orders(OrderID)")
+    # Triggers first, so the backfill is logged with the new column
+    create_change_log_triggers(conn, ["Financials"])
+    start = len(ORDER_REFERENCE_PREFIX) + 1
+    reference = f"trim(substr(Description, {start}))"
+    conn.execute(f"""
+        UPDATE Financials SET OrderID = CAST({reference} AS INTEGER)
+        WHERE OrderID IS NULL
+          AND Description GLOB '{ORDER_REFERENCE_PREFIX}*[0-9]*'
+          AND {reference} NOT GLOB '*[^0-9]*' AND {reference} <> ''
+    """)
+    unlinked = conn.execute(f"""
+        SELECT COUNT(*) FROM Financials
+        WHERE OrderID IS NULL AND Description GLOB '{ORDER_REFERENCE_PREFIX}*'
+    """).fetchone()[0]
+    if unlinked:
+        logging.warning("%d order payments name no usable order ID and were left unlinked", unlinked)
+    ensure_indexes(conn, ["idx_financials_order"])
+
+
+def _count_table_rows(conn):
+    # Exact row counts for paging, kept by the triggers that already bump
+    # each table's TableVersions row, so counting costs no extra write
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(TableVersions)")]
+    if "RowCount" not in columns:
+        conn.execute("ALTER TABLE TableVersions ADD COLUMN RowCount INTEGER NOT NULL DEFAULT 0")
+    for table in BASE_TABLES:
+        conn.execute(f"UPDATE TableVersions SET RowCount = (SELECT COUNT(*) FROM {table}) "
+                     "WHERE TableName = ?", (table,))
+        for suffix, event, delta in (("ai", "INSERT", "+ 1"), ("ad", "DELETE", "- 1")):
+            conn.execute(f"DROP TRIGGER IF EXISTS {table}_version_{suffix}")
+            conn.execute(f"""
+                CREATE TRIGGER {table}_version_{suffix} AFTER {event} ON {table} BEGIN
+                    UPDATE TableVersions SET Version = Version + 1, RowCount = RowCount {delta}
+                    WHERE TableName = '{table}';
+                END
+            """)
+
+
+# (version, description, step). Append only; never edit a released step.
+MIGRATIONS = [
+    (1, "base tables and default admin user", _create_base_tables),
+    (2, "secondary indexes for hot screen queries", _create_indexes),
+    (3, "rebuild FuelHistory with the authoritative schema", _rebuild_fuel_history),
+    (4, "FTS5 search indexes for drivers, trucks, orders and users", _create_search_indexes),
+    (5, "row change tracking for incremental screen refresh", _create_change_tracking),
+    (6, "per-table change counters for cross-window notification", _create_table_versions),
+    (7, "append-only change log for point-in-time recovery", _create_change_log),
+    (8, "ISO 8601 dates in every date column", _normalize_dates),
+    (9, "trigger-maintained ledger totals by type, payment mode and day", _create_ledger_summary),
+    (10, "orders rollup cube by day, region, status and customer", _create_orders_cube),
+    (11, "per-driver monthly payroll summary and unpaid-salary index", _create_payroll_monthly),
+    (12, "payroll runs and the run that paid each SalaryHistory row", _create_payroll_runs),
+    (13, "Financials.OrderID parsed from payment descriptions", _link_financials_to_orders),
+    (14, "trigger-maintained row counts in TableVersions", _count_table_rows),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn):
+    """Apply pending migrations and return the resulting schema version.
+
+    conn must be in autocommit mode (isolation_level=None). Each step runs
+    in a BEGIN IMMEDIATE transaction together with its user_version bump,
+    so a failed step leaves the database at the previous version.
+    """
+    if schema_version(conn) >= SCHEMA_VERSION:
+        return SCHEMA_VERSION
+
+    for version, description, step in MIGRATIONS:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Re-read under the write lock in case another instance got here first
+            if schema_version(conn) >= version:
+                conn.rollback()
+                continue
+            step(conn)
+            conn.execute(f"PRAGMA user_version = {version}")
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+
+    # Refresh planner statistics after schema changes
+    conn.execute("PRAGMA optimize")
+    return schema_version(conn)
+
+
+def explain(conn, sql, params=()):
+    """EXPLAIN QUERY PLAN detail lines for a statement."""
+    return [row[-1] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+
+
+def verify_indexes(conn):
+    """Return (index, uses_index, plan) for every hot query."""
+    results = []
+    for name, sql in HOT_QUERIES.items():
+        plan = explain(conn, sql)
+        results.append((name, any(name in line for line in plan), plan))
+    return results
+
+
+if __name__ == "__main__":
+    database_path = sys.argv[1] if len(sys.argv) > 1 else "TTMS.db"
+    conn = sqlite3.connect(database_path, isolation_level=None)
+    print(f"Schema version {migrate(conn)}")
+    missing = 0
+    for name, used, plan in verify_indexes(conn):
+        missing += not used
+        print(f"{'OK  ' if used else 'SCAN'} {name}")
+        for line in plan:
+            print(f"       {line}")
+    conn.close()
+    sys.exit(1 if missing else 0)
@@ -0,0 +1,178 @@
+"""
+Background task runner for the TTMS screens.
+
+Tk may only be touched from the thread running mainloop. TaskRunner runs
+blocking work (queries, exports, backups, report generation) on a small
+thread pool and hands progress, results and errors back to the Tk thread
+by draining a queue from widget.after() callbacks.
+"""
+import logging
+import queue
+import threading
+import tkinter as tk
+from concurrent.futures import ThreadPoolExecutor
+from tkinter import messagebox
+
+
+class TaskCancelled(Exception):
+    """Raised inside a task once cancellation has been requested."""
+
+
+class Task:
+    """Handle for one submitted job; also passed to the job itself.
+
+    The job calls task.progress() to report how far it got, which doubles
+    as a cancellation point, and may call task.check() in tight loops.
+    """
+
+    def __init__(self, runner, description=""):
+        self.description = description
+        self.future = None
+        self._runner = runner
+        self._cancel_requested = threading.Event()
+
+    @property
+    def cancelled(self):
+        return self._cancel_requested.is_set()
+
+    def cancel(self):
+        """Ask the job to stop; a job that hasn't started never runs."""
+        self._cancel_requested.set()
+        if self.future is not None and self.future.cancel():
+            self._runner._post(self, "cancelled", None)
+
+    def check(self):
+        if self.cancelled:
+            raise TaskCancelled(self.description)
+
+    def progress(self, done, total=None, message=""):
+        """Report progress from the worker thread."""
+        self.check()
+        self._runner._post(self, "progress", (done, total, message))
+
+
+class TaskRunner:
+    """Run jobs off the Tk thread and deliver their outcome on it."""
+
+    def __init__(self, widget, max_workers=2, poll_ms=50):
+        self.widget = widget
+        self.poll_ms = poll_ms
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ttms-task")
+        self._events = queue.Queue()
+        self._handlers = {}  # task -> dict of callbacks
+        self._polling = False
+        widget.bind("<Destroy>", self._on_destroy, add="+")
+
+    def submit(self, job, *args, on_done=None, on_error=None, on_progress=None,
+               on_cancel=None, status=None, description="", **kwargs):
+        """Run job(task, *args, **kwargs) on a worker thread and return the Task.
+
+        Callbacks run on the Tk thread: on_done(result), on_error(exception),
+        on_progress(done, total, message) and on_cancel(). status is an
+        optional ttms_widgets.TaskStatus shown while the job runs.
+        """
+        task = Task(self, description)
+        self._handlers[task] = {
+            "done": on_done, "error": on_error, "progress": on_progress,
+            "cancelled": on_cancel, "status": status,
+        }
+        if status is not None:
+            status.start(task, description)
+        task.future = self._executor.submit(self._run, task, job, args, kwargs)
+        self._schedule_poll()
+        return task
+
+    def every(self, interval_ms, job, *args, description="", **kwargs):
+        """Run job(task, *args, **kwargs) now and again every interval_ms while the widget lives.
+
+        The next run is armed only once the previous one finished, so runs
+        never overlap; failures are logged and the schedule carries on.
+        """
+        def rearm(_=None):
+            try:
+                self.widget.after(interval_ms, start)
+            except tk.TclError:  # window closed while the job ran
+                pass
+
+        def start():
+            self.submit(job, *args, on_done=rearm, on_error=rearm, on_cancel=lambda: None,
+                        description=description, **kwargs)
+
+        start()
+
+    def cancel_all(self):
+        for task in list(self._handlers):
+            task.cancel()
+
+    def _run(self, task, job, args, kwargs):
+        try:
+            task.check()
+            result = job(task, *args, **kwargs)
+        except TaskCancelled:
+            self._post(task, "cancelled", None)
+        except Exception as e:
+            logging.exception("Background task %r failed", task.description)
+            self._post(task, "error", e)
+        else:
+            self._post(task, "done", result)
+
+    def _post(self, task, kind, payload):
+        # Only ever called from worker threads; the Tk thread drains it
+        self._events.put((task, kind, payload))
+
+    def _schedule_poll(self):
+        if not self._polling:
+            self._polling = True
+            self.widget.after(self.poll_ms, self._poll)
+
+    def _poll(self):
+        self._polling = False
+        latest_progress = {}
+        finished = []
+        while True:
+            try:
+                task, kind, payload = self._events.get_nowait()
+            except queue.Empty:
+                break
+            if kind == "progress":
+                latest_progress[task] = payload  # only the newest report matters
+            else:
+                latest_progress.pop(task, None)
+                finished.append((task, kind, payload))
+
+        for task, (done, total, message) in latest_progress.items():
+            handlers = self._handlers.get(task)
+            if handlers is None:
+                continue
+            if handlers["status"] is not None:
+                handlers["status"].update_progress(done, total, message)
+            if handlers["progress"] is not None:
+                handlers["progress"](done, total, message)
+
+        for task, kind, payload in finished:
+            handlers = self._handlers.pop(task, None)
+            if handlers is None:
+                continue
+            if handlers["status"] is not None:
+                handlers["status"].finish(task)
+            callback = handlers[kind]
+            if kind == "error" and callback is None:
+                messagebox.showerror("Error", f"{task.description or 'Task'} failed: {payload}")
+            elif callback is not None:
+                try:
+                    callback() if kind == "cancelled" else callback(payload)
+                except Exception:
+                    # Keep delivering the other results; Tk would drop them
+                    logging.exception("Callback for task %r failed", task.description)
+
+        if self._handlers:
+            try:
+                self._schedule_poll()
+            except tk.TclError:  # window closed between polls
+                pass
+
+    def _on_destroy(self, event):
+        if event.widget is self.widget:
+            self.cancel_all()
+            self._handlers.clear()
+            self._executor.shutdown(wait=False)
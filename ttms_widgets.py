@@ -0,0 +1,399 @@
+"""
+Reusable Tk widgets for the TTMS management screens.
+
+TaskStatus is the busy overlay shown while a ttms_tasks job runs.
+
+VirtualTable is a ttk.Treeview that only ever holds the rows currently on
+screen. Rows are read on demand from a row source, any object with
+count() and rows(offset, limit) -- ttms_db.PagedQuery / KeysetQuery for
+database tables or RowList for results already in memory. Sources that
+also provide row_key(row), sync_point() and changes(since) get incremental
+refresh, and sources with sorted_by(column, descending) can be re-sorted
+from the column headings. A source's sort_value(row), if it has one, tells
+sync() when an update moved a row in the sort order.
+"""
+from collections import OrderedDict
+from tkinter import ttk
+
+
+class RowList:
+    """Row source over a list already in memory (search and filter results)."""
+
+    def __init__(self, rows):
+        self._rows = list(rows)
+
+    def count(self):
+        return len(self._rows)
+
+    def rows(self, offset, limit):
+        return self._rows[offset:offset + limit]
+
+
+class VirtualTable(ttk.Treeview):
+    """Treeview that renders only the visible window of a row source.
+
+    Rows are fetched page_size at a time as the view scrolls and the last
+    cached_pages pages are kept. The vertical scrollbar is driven through
+    the usual yscrollcommand / yview pair but reflects the position in the
+    whole source, so scrollbars are wired exactly as for a plain Treeview.
+    """
+
+    def __init__(self, master=None, page_size=200, cached_pages=8, **kw):
+        self._yscrollcommand = kw.pop("yscrollcommand", None)
+        super().__init__(master, **kw)
+        self.page_size = page_size
+        self.cached_pages = cached_pages
+        self._source = None
+        self._format_row = None
+        self._key = None
+        self._synced = 0  # source sync point of the rows on cached pages
+        self._total = 0
+        self._first = 0
+        self._pages = OrderedDict()  # page number -> rows
+        self._row_metrics = None  # (top, row height) measured from a rendered row
+        self._kept_selection = set()  # selected rows, including scrolled-out ones
+        self._rendered_selection = set()
+        self._sort_columns = {}  # heading column -> (source column, heading text)
+        self._sorted = None  # (heading column, descending) currently shown
+
+        self.bind("<Configure>", lambda event: self._render())
+        self.bind("<MouseWheel>", self._on_mousewheel)
+        self.bind("<Button-4>", lambda event: self._scroll_units(-3))
+        self.bind("<Button-5>", lambda event: self._scroll_units(3))
+        self.bind("<Up>", lambda event: self._on_arrow(-1))
+        self.bind("<Down>", lambda event: self._on_arrow(1))
+        self.bind("<Prior>", lambda event: self._scroll_units(-self._visible_rows()))
+        self.bind("<Next>", lambda event: self._scroll_units(self._visible_rows()))
+
+    # ------------------------------------------------------------------
+    # Data
+    # ------------------------------------------------------------------
+    def set_source(self, source, format_row=None, key=None):
+        """Show rows from source.
+
+        format_row(index, row) maps a row to its values; key(row) gives the
+        item iid (the source's row_key by default, else the row position).
+        """
+        if self._sorted is not None:
+            # A new source comes in its own order
+            heading = self._sorted[0]
+            self.heading(heading, text=self._sort_columns[heading][1])
+            self._sorted = None
+        self._source = source
+        self._format_row = format_row
+        self._key = key or getattr(source, "row_key", None)
+        self._first = 0
+        self._kept_selection = set()
+        self._rendered_selection = set()
+        self.refresh()
+
+    def refresh(self):
+        """Re-read the source, keeping the scroll position."""
+        self._pages.clear()
+        if hasattr(self._source, "sync_point"):
+            # Taken first so nothing changed while reading is missed
+            self._synced = self._source.sync_point()
+        self._total = self._source.count() if self._source is not None else 0
+        self._render()
+
+    def sync(self):
+        """Patch in only the rows changed since the last refresh or sync.
+
+        Updated rows on cached pages are replaced in place and their items
+        re-valued; inserts and deletes re-read just the visible window, and
+        an update to the sort column re-reads the pages in the new order.
+        Returns False when the source can't report changes, in which case
+        the caller should set_source() again.
+        """
+        if not hasattr(self._source, "changes") or self._key is None:
+            return False
+        self._synced, changed, removed = self._source.changes(self._synced)
+        if not changed and not removed:
+            return True
+
+        located = {}
+        for number, rows in self._pages.items():
+            for position, row in enumerate(rows):
+                located[self._key(row)] = (number, position)
+
+        sort_value = getattr(self._source, "sort_value", None)
+        unplaced = False
+        for row in changed:
+            key = self._key(row)
+            if key not in located:
+                unplaced = True  # new row, or one on a page not cached
+                continue
+            number, position = located[key]
+            if sort_value is not None and sort_value(row) != sort_value(self._pages[number][position]):
+                # The row belongs somewhere else in the order now
+                self.refresh()
+                return True
+            self._pages[number][position] = row
+            if self.exists(str(key)):
+                self.item(str(key), values=self._values(number * self.page_size + position, row))
+
+        if removed or unplaced:
+            total = self._source.count()
+            if removed or total != self._total:
+                # Offsets have shifted; drop the pages and redraw the window
+                self._total = total
+                self._pages.clear()
+                self._render()
+        return True
+
+    def bind_sort(self, columns):
+        """Sort by a column on the server when its heading is clicked.
+
+        columns maps heading column ids to the source's column names; a
+        second click on the same heading reverses the order.
+        """
+        for heading, column in columns.items():
+            self._sort_columns[heading] = (column, self.heading(heading, "text"))
+            self.heading(heading, command=lambda heading=heading: self.sort_by(heading))
+
+    def sort_by(self, heading, descending=None):
+        if not hasattr(self._source, "sorted_by"):
+            return  # search and filter results keep their own order
+        if descending is None:
+            descending = self._sorted == (heading, False)
+        column, text = self._sort_columns[heading]
+        self.set_source(self._source.sorted_by(column, descending), self._format_row, self._key)
+        self._sorted = (heading, descending)
+        self.heading(heading, text=f"{text} {'▼' if descending else '▲'}")
+
+    def row_count(self):
+        return self._total
+
+    def iter_values(self):
+        """Formatted values of every row in the source as shown, for exports.
+
+        The source, its order and the formatter are captured when this is
+        called, so the returned iterator can be drained on a worker thread
+        while the table moves on to another filter or sort.
+        """
+        source, format_row, page_size = self._source, self._format_row, self.page_size
+        if hasattr(source, "copy"):
+            source = source.copy()  # its own page bookmarks, not the view's
+
+        def values():
+            start = 0
+            while source is not None:
+                rows = source.rows(start, page_size)
+                for index, row in enumerate(rows, start=start):
+                    yield tuple(format_row(index, row)) if format_row else tuple(row)
+                if len(rows) < page_size:
+                    return
+                start += page_size
+        return values()
+
+    def _values(self, index, row):
+        return tuple(self._format_row(index, row)) if self._format_row else tuple(row)
+
+    def _iid(self, index, row):
+        return str(self._key(row)) if self._key else f"row{index}"
+
+    def _page(self, number):
+        rows = self._pages.pop(number, None)
+        if rows is None:
+            rows = list(self._source.rows(number * self.page_size, self.page_size))
+        self._pages[number] = rows
+        while len(self._pages) > self.cached_pages:
+            self._pages.popitem(last=False)
+        return rows
+
+    def _window(self, first, count):
+        """(index, row) pairs for rows first .. first + count - 1."""
+        window = []
+        index = first
+        end = min(first + count, self._total)
+        while index < end:
+            number, start = divmod(index, self.page_size)
+            page = self._page(number)
+            if len(page) < self.page_size:
+                # Short page: the source ends here whatever count() said
+                self._total = min(self._total, number * self.page_size + len(page))
+                end = min(end, self._total)
+            rows = page[start:start + end - index]
+            if not rows:
+                break
+            window.extend(enumerate(rows, start=index))
+            index += len(rows)
+        return window
+
+    # ------------------------------------------------------------------
+    # Rendering
+    # ------------------------------------------------------------------
+    def _visible_rows(self):
+        if self._row_metrics is None or self.winfo_height() <= 1:
+            return max(int(self.cget("height")), 1)
+        top, row_height = self._row_metrics
+        return max((self.winfo_height() - top) // row_height, 1)
+
+    def _render(self):
+        if self._source is None:
+            return
+        visible = self._visible_rows()
+        self._first = max(0, min(self._first, self._total - visible))
+        total = self._total
+        window = self._window(self._first, visible)
+        if self._total < total:
+            # Rows went away since count(); show the source's real end
+            self._first = max(0, self._total - visible)
+            window = self._window(self._first, visible)
+
+        # Remember the selection of rows about to scroll out of view, unless
+        # the user picked something else since the last render
+        shown = set(self.get_children())
+        selected = set(self.selection())
+        if selected != self._rendered_selection:
+            self._kept_selection = selected
+        else:
+            self._kept_selection = (self._kept_selection - shown) | selected
+
+        wanted = [(self._iid(index, row), self._values(index, row)) for index, row in window]
+        wanted_ids = {iid for iid, _ in wanted}
+        stale = [iid for iid in shown if iid not in wanted_ids]
+        if stale:
+            self.delete(*stale)
+        for position, (iid, values) in enumerate(wanted):
+            if iid in shown:
+                self.item(iid, values=values)
+                self.move(iid, "", position)
+            else:
+                self.insert("", position, iid=iid, values=values)
+
+        reselect = [iid for iid in wanted_ids & self._kept_selection if iid not in self.selection()]
+        if reselect:
+            self.selection_add(reselect)
+        self._rendered_selection = set(self.selection())
+
+        # Rows past the bottom edge are never rendered, so pin Tk's own view
+        super().yview("moveto", 0)
+        self._measure_rows(wanted)
+        self._update_scrollbar()
+
+    def _measure_rows(self, wanted):
+        """Learn the real header and row height once a row is on screen."""
+        if self._row_metrics is not None or not wanted:
+            return
+        bbox = self.bbox(wanted[0][0])
+        if bbox and bbox[3] > 0:
+            self._row_metrics = (bbox[1], bbox[3])
+            self.after_idle(self._render)
+
+    def _update_scrollbar(self):
+        if self._yscrollcommand:
+            self._yscrollcommand(*self._fractions())
+
+    def _fractions(self):
+        if self._total == 0:
+            return 0.0, 1.0
+        last = min(self._first + self._visible_rows(), self._total)
+        return self._first / self._total, last / self._total
+
+    # ------------------------------------------------------------------
+    # Scrolling
+    # ------------------------------------------------------------------
+    def _scroll_to(self, first):
+        first = max(0, min(int(first), self._total - self._visible_rows()))
+        if first != self._first:
+            self._first = first
+            self._render()
+        return "break"
+
+    def _scroll_units(self, units):
+        return self._scroll_to(self._first + units)
+
+    def _on_mousewheel(self, event):
+        # Windows reports multiples of 120 per notch, macOS small deltas
+        notches = event.delta // 120 if abs(event.delta) >= 120 else event.delta
+        return self._scroll_units(-3 * notches)
+
+    def _on_arrow(self, step):
+        """Scroll instead of stopping when the arrow keys reach an edge row."""
+        children = self.get_children()
+        if not children or self.focus() != children[0 if step < 0 else -1]:
+            return None
+        position = self.index(self.focus())
+        self._scroll_units(step)
+        children = self.get_children()
+        target = children[min(position, len(children) - 1)]
+        self.focus(target)
+        self.selection_set(target)
+        return "break"
+
+    def yview(self, *args):
+        if not args:
+            return self._fractions()
+        if args[0] == "moveto":
+            return self._scroll_to(round(float(args[1]) * self._total))
+        if args[0] == "scroll":
+            units = int(args[1])
+            if args[2] == "pages":
+                units *= self._visible_rows()
+            return self._scroll_units(units)
+        return None
+
+    def yview_moveto(self, fraction):
+        self.yview("moveto", fraction)
+
+    def yview_scroll(self, number, what):
+        self.yview("scroll", number, what)
+
+    def configure(self, cnf=None, **kw):
+        # The Tk-level yscrollcommand would report the few rendered rows;
+        # keep the callback here and feed it whole-source fractions instead
+        if isinstance(cnf, dict) and "yscrollcommand" in cnf:
+            cnf = dict(cnf)
+            self._yscrollcommand = cnf.pop("yscrollcommand")
+            self._update_scrollbar()
+        if "yscrollcommand" in kw:
+            self._yscrollcommand = kw.pop("yscrollcommand")
+            self._update_scrollbar()
+        return super().configure(cnf, **kw)
+
+    config = configure
+
+
+class TaskStatus(ttk.Frame):
+    """Progress bar, message and Cancel button laid over a window while jobs run.
+
+    Placed centred over its master on start() and removed again when the
+    last tracked task finishes, whichever geometry manager the master uses.
+    """
+
+    def __init__(self, master, **kw):
+        super().__init__(master, padding=10, relief="raised", **kw)
+        self._tasks = []
+        self.message = ttk.Label(self, text="Working...", font=("Helvetica", 11))
+        self.message.pack(fill="x")
+        self.bar = ttk.Progressbar(self, length=260, mode="indeterminate")
+        self.bar.pack(fill="x", pady=5)
+        ttk.Button(self, text="Cancel", command=self.cancel).pack()
+
+    def start(self, task, message=""):
+        self._tasks.append(task)
+        self.message.config(text=f"{message or 'Working'}...")
+        self.bar.config(mode="indeterminate", value=0)
+        self.bar.start(15)
+        self.place(relx=0.5, rely=0.5, anchor="center")
+        self.lift()
+
+    def update_progress(self, done, total=None, message=""):
+        if total:
+            self.bar.stop()
+            self.bar.config(mode="determinate", maximum=total, value=done)
+        if message:
+            self.message.config(text=message)
+
+    def finish(self, task):
+        if task in self._tasks:
+            self._tasks.remove(task)
+        if not self._tasks:
+            self.bar.stop()
+            self.place_forget()
+
+    def cancel(self):
+        for task in list(self._tasks):
+            task.cancel()
+        self.message.config(text="Cancelling...")
@@ -0,0 +1,435 @@
+"""
+Process-wide workbook engine for the Excel backend (TTMS1.4.py).
+
+TTMS.xlsx is parsed once and the Workbook is shared by every screen. It is
+parsed again only when the file's modification time or size changes, i.e.
+when another TTMS instance saved it. Each sheet gets a lazily built index
+from the value in its ID column to the row number, so finding a driver,
+truck or order is a dict lookup instead of an iter_rows scan.
+
+Rows appended through append() go straight into the index. Code that moves
+rows or rewrites an ID cell calls invalidate(); a stale entry is also caught
+on lookup, because the row it points at no longer holds the key.
+
+delete() does not move rows: it marks the row in a hidden tombstone column
+and drops its key from the index, so row numbers stay put between
+refreshes. rows() skips tombstoned rows. Tombstoned rows are removed
+physically in one sweep per sheet just before the next flush writes the file;
+merged ranges, row heights and hyperlinks below them move up with the cells.
+
+Reports and exports read through stream(). Unless there are unflushed
+changes, it reads the file with openpyxl's read-only reader. That reader
+parses one row at a time and keeps no Cell objects, so a large sheet costs
+the memory of a row instead of the whole sheet. lookup() and sheet_names()
+read the same way while the Workbook is not loaded, so logging in and the
+report screens never parse the whole file.
+
+save() only marks the workbook dirty. Dirty changes are written once
+FLUSH_DELAY_MS later from the attached window's event loop, or at once by
+commit(), when that window closes and at exit. A flush writes a temp file
+next to TTMS.xlsx and renames it over the original, so a crash mid-save
+leaves the old file intact. It holds an exclusive lock on TTMS.xlsx.lock
+while it does so. If another instance saved in the meantime, our copy is
+written aside as a conflict file instead of overwriting theirs. This module
+shows no dialogs: the on_conflict and on_error callbacks let the app report
+flushes it didn't call itself, and the flush at exit only logs.
+"""
+import atexit
+import bisect
+import logging
+import os
+import time
+from contextlib import contextmanager
+
+import openpyxl
+from openpyxl.cell import MergedCell
+from openpyxl.utils import get_column_letter
+from openpyxl.worksheet.cell_range import MultiCellRange
+
+if os.name == "nt":
+    import msvcrt
+else:
+    import fcntl
+
+FLUSH_DELAY_MS = 2000
+FLUSH_RETRIES = 5  # failed delayed flushes retried before the user is told
+LOCK_TIMEOUT = 10.0  # seconds to wait for another instance's save
+# Hidden column marking deleted rows until the next flush compacts the sheet
+TOMBSTONE_COLUMN = 50
+TOMBSTONE_HEADER = "_Deleted"
+TOMBSTONE_LETTER = get_column_letter(TOMBSTONE_COLUMN)
+
+
+class WorkbookLocked(Exception):
+    """Another TTMS instance held the workbook lock for too long."""
+
+
+@contextmanager
+def file_lock(path, timeout=LOCK_TIMEOUT):
+    """Hold an exclusive lock on path (created if missing) across processes."""
+    handle = open(path, "a+b")
+    deadline = time.monotonic() + timeout
+    try:
+        while True:
+            try:
+                if os.name == "nt":
+                    handle.seek(0)
+                    msvcrt.locking(handle.fileno(), msvcrt.LK_NBLCK, 1)
+                else:
+                    fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except OSError:
+                if time.monotonic() >= deadline:
+                    raise WorkbookLocked(f"{path} is held by another TTMS instance")
+                time.sleep(0.05)
+        try:
+            yield
+        finally:
+            if os.name == "nt":
+                handle.seek(0)
+                msvcrt.locking(handle.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+    finally:
+        handle.close()
+
+# sheet -> 1-based column holding the row's identifier; others use column 1
+KEY_COLUMNS = {
+    "Users": 1,
+    "Drivers": 1,
+    "Trucks": 1,
+    "Orders": 1,
+    "Dispatch": 1,
+}
+
+
+def row_key(value):
+    """An ID from a cell, an Entry or a Treeview in one comparable form."""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return "" if value is None else str(value).strip()
+
+
+class WorkbookEngine:
+    """The shared, cached Workbook for one XLSX file."""
+
+    def __init__(self, path, on_conflict=None, on_error=None):
+        self.path = path
+        # How the UI hears about a flush it didn't call: on_conflict(conflict
+        # path) after our changes were written aside, on_error(exception)
+        # once a delayed flush has failed for good. At exit both are only logged.
+        self.on_conflict = on_conflict
+        self.on_error = on_error
+        self._workbook = None
+        self._stamp = None
+        self._indexes = {}  # sheet name -> {key: row number}
+        self._widths = {}  # sheet name -> columns in use, found with the index
+        self._dead = {}  # sheet name -> tombstoned row numbers
+        self._dirty = False
+        self._widget = None  # window whose event loop runs delayed flushes
+        self._flush_pending = False
+        self._failed_flushes = 0
+        atexit.register(self.commit)
+
+    def _file_stamp(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def load(self):
+        """The shared Workbook, parsed again only if the file changed on disk.
+
+        Unflushed changes are never dropped for a newer file; the next flush
+        sorts that out.
+        """
+        stamp = self._file_stamp()
+        if self._workbook is None or (stamp != self._stamp and not self._dirty):
+            self._workbook = openpyxl.load_workbook(self.path)
+            self._stamp = stamp
+            self.invalidate()
+        return self._workbook
+
+    def adopt(self, workbook):
+        """Make an already loaded or newly created Workbook the shared one."""
+        self._workbook = workbook
+        self.invalidate()
+
+    def attach(self, widget):
+        """Run delayed flushes on widget's event loop; flush when it is destroyed."""
+        self._widget = widget
+        widget.bind("<Destroy>", self._on_destroy, add="+")
+
+    def save(self):
+        """Mark the shared Workbook changed; it is written within FLUSH_DELAY_MS."""
+        self._dirty = True
+        if self._flush_pending or self._schedule_flush():
+            return
+        # No live window to wait on
+        self.flush()
+
+    def _schedule_flush(self):
+        """Flush FLUSH_DELAY_MS from now on the attached window; False if there is none."""
+        try:
+            self._widget.after(FLUSH_DELAY_MS, self._timed_flush)
+        except Exception:
+            return False
+        self._flush_pending = True
+        return True
+
+    def commit(self):
+        """Write pending changes now.
+
+        Returns the conflict file our changes went to if another instance
+        saved first, else None.
+        """
+        if not self._dirty:
+            return None
+        conflict_path = None
+        lock_path = self.path + ".lock"
+        with file_lock(lock_path):
+            self._compact()
+            if self._stamp is not None and self._file_stamp() != self._stamp:
+                conflict_path = self._write_conflict()
+            else:
+                self._write(self.path)
+        self._dirty = False
+        return conflict_path
+
+    def flush(self):
+        """commit(), passing a conflict on to on_conflict."""
+        conflict_path = self.commit()
+        if conflict_path is not None and self.on_conflict is not None:
+            self.on_conflict(conflict_path)
+
+    def _write(self, path):
+        # Temp file in the same directory, so the rename can't cross filesystems
+        directory, name = os.path.split(os.path.abspath(path))
+        temp_path = os.path.join(directory, f".{name}.{os.getpid()}.tmp")
+        try:
+            self._workbook.save(temp_path)
+            with open(temp_path, "rb+") as handle:
+                os.fsync(handle.fileno())
+            os.replace(temp_path, path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        # Our own save must not look like another instance's
+        self._stamp = self._file_stamp()
+
+    def _write_conflict(self):
+        """Another instance saved since we loaded: keep theirs, put ours aside, reload."""
+        root, ext = os.path.splitext(self.path)
+        conflict_path = f"{root}.conflict-{time.strftime('%Y%m%d_%H%M%S')}{ext}"
+        self._workbook.save(conflict_path)
+        self._workbook = openpyxl.load_workbook(self.path)
+        self._stamp = self._file_stamp()
+        self.invalidate()
+        logging.warning("%s changed in another instance; unsaved changes written to %s",
+                        self.path, conflict_path)
+        return conflict_path
+
+    def _timed_flush(self):
+        self._flush_pending = False
+        try:
+            self.flush()
+        except Exception as e:
+            # The lock may still be held or the file open elsewhere; until
+            # the retries run out, try again rather than sit on the changes
+            self._failed_flushes += 1
+            logging.exception("Failed to save %s (attempt %d)", self.path, self._failed_flushes)
+            if self._failed_flushes <= FLUSH_RETRIES and self._schedule_flush():
+                return
+            self._failed_flushes = 0
+            if self.on_error is not None:
+                self.on_error(e)
+        else:
+            self._failed_flushes = 0
+
+    def _on_destroy(self, event):
+        if event.widget is not self._widget:
+            return
+        self._widget = None
+        self._flush_pending = False
+        self._timed_flush()
+
+    def sheet(self, name):
+        return self.load()[name]
+
+    def index(self, name):
+        """{key: row number} for a sheet's live rows; the first row wins on duplicates."""
+        sheet = self.sheet(name)
+        index = self._indexes.get(name)
+        if index is None:
+            dead = {row for (row, col), cell in sheet._cells.items()
+                    if col == TOMBSTONE_COLUMN and row > 1 and cell.value}
+            column = KEY_COLUMNS.get(name, 1)
+            index = {}
+            for row_num, (value,) in enumerate(
+                    sheet.iter_rows(min_row=2, min_col=column, max_col=column, values_only=True), start=2):
+                if value is not None and row_num not in dead:
+                    index.setdefault(row_key(value), row_num)
+            self._indexes[name] = index
+            self._dead[name] = dead
+            self._widths[name] = max((col for _, col in sheet._cells if col != TOMBSTONE_COLUMN), default=1)
+        return index
+
+    def find_row(self, name, key):
+        """Row number holding key in the sheet's ID column, or None."""
+        key = row_key(key)
+        row_num = self.index(name).get(key)
+        if row_num is not None:
+            # Peek without cell(), which would create a cell past a shrunk sheet
+            cell = self.sheet(name)._cells.get((row_num, KEY_COLUMNS.get(name, 1)))
+            if cell is None or row_key(cell.value) != key:
+                # Rows moved under the index; rebuild it once
+                self.invalidate(name)
+                row_num = self.index(name).get(key)
+        return row_num
+
+    def contains(self, name, key):
+        return self.find_row(name, key) is not None
+
+    def row_values(self, name, key):
+        """The row holding key as a tuple of values (like iter_rows(values_only=True)), or None."""
+        row_num = self.find_row(name, key)
+        if row_num is None:
+            return None
+        rows = self.sheet(name).iter_rows(min_row=row_num, max_row=row_num,
+                                          max_col=self._widths[name], values_only=True)
+        return next(rows)
+
+    def rows(self, name):
+        """Values of each live row below the header, like iter_rows(min_row=2, values_only=True)."""
+        self.index(name)
+        dead = self._dead[name]
+        rows = self.sheet(name).iter_rows(min_row=2, max_col=self._widths[name], values_only=True)
+        for row_num, values in enumerate(rows, start=2):
+            if row_num not in dead:
+                yield values
+
+    def stream(self, name):
+        """Values of each live row below the header, for reports and exports.
+
+        Streams the file without loading it into the cache; only unflushed
+        changes, which exist nowhere else, are read from the shared Workbook.
+        """
+        if self._dirty:
+            yield from self.rows(name)
+            return
+        workbook = openpyxl.load_workbook(self.path, read_only=True)
+        try:
+            yield from workbook[name].iter_rows(min_row=2, values_only=True)
+        finally:
+            # Read-only workbooks keep the zip archive open until closed
+            workbook.close()
+
+    def lookup(self, name, key):
+        """Like row_values(), but scans the file instead of loading it if it isn't loaded yet."""
+        if self._workbook is not None:
+            return self.row_values(name, key)
+        key = row_key(key)
+        column = KEY_COLUMNS.get(name, 1)
+        for values in self.stream(name):
+            if len(values) >= column and values[column - 1] is not None and row_key(values[column - 1]) == key:
+                return values
+        return None
+
+    def sheet_names(self):
+        """The workbook's sheet names, without parsing any cells if it isn't loaded."""
+        if self._workbook is not None:
+            return self._workbook.sheetnames
+        workbook = openpyxl.load_workbook(self.path, read_only=True)
+        try:
+            return workbook.sheetnames
+        finally:
+            workbook.close()
+
+    def delete(self, name, key):
+        """Tombstone the row holding key; False if there is none.
+
+        The row keeps its number until the next flush compacts the sheet.
+        """
+        row_num = self.find_row(name, key)
+        if row_num is None:
+            return False
+        sheet = self.sheet(name)
+        if sheet.cell(row=1, column=TOMBSTONE_COLUMN).value is None:
+            sheet.cell(row=1, column=TOMBSTONE_COLUMN, value=TOMBSTONE_HEADER)
+            sheet.column_dimensions[TOMBSTONE_LETTER].hidden = True
+        sheet.cell(row=row_num, column=TOMBSTONE_COLUMN, value=1)
+        del self._indexes[name][row_key(key)]
+        self._dead[name].add(row_num)
+        return True
+
+    def _compact(self):
+        """Drop tombstoned rows and the tombstone column from every sheet, one sweep each."""
+        for sheet in self._workbook.worksheets:
+            if (1, TOMBSTONE_COLUMN) not in sheet._cells:
+                continue
+            # Read from the cells rather than _dead, which invalidate() may have dropped
+            removed = sorted(row for (row, col), cell in sheet._cells.items()
+                             if col == TOMBSTONE_COLUMN and row > 1 and cell.value)
+            dead = set(removed)
+
+            def shifted(row):
+                # Rows shift up by the number of tombstones above them
+                return row - bisect.bisect_left(removed, row)
+
+            # A merge spanning a removed row is undone; the rest move with their cells
+            merged = []
+            for cell_range in sheet.merged_cells.ranges:
+                if dead.isdisjoint(range(cell_range.min_row, cell_range.max_row + 1)):
+                    merged.append(cell_range)
+                else:
+                    for row, col in cell_range.cells:
+                        if isinstance(sheet._cells.get((row, col)), MergedCell):
+                            del sheet._cells[(row, col)]
+            cells = {}
+            for (row, col), cell in sheet._cells.items():
+                if col == TOMBSTONE_COLUMN or row in dead:
+                    continue
+                new_row = shifted(row)
+                cell.row = new_row
+                if cell.hyperlink is not None:
+                    cell.hyperlink.ref = cell.coordinate
+                cells[(new_row, col)] = cell
+            sheet._cells = cells
+            sheet._current_row = max((row for row, _ in cells), default=0)
+            for cell_range in merged:
+                cell_range.shift(row_shift=shifted(cell_range.min_row) - cell_range.min_row)
+            sheet.merged_cells = MultiCellRange(merged)
+
+            # Heights and hidden flags are keyed by row number too
+            dimensions = [(shifted(row), dimension) for row, dimension in sheet.row_dimensions.items()
+                          if row not in dead]
+            sheet.row_dimensions.clear()
+            for row, dimension in dimensions:
+                dimension.index = row
+                sheet.row_dimensions[row] = dimension
+            sheet.column_dimensions.pop(TOMBSTONE_LETTER, None)
+            self.invalidate(sheet.title)
+
+    def append(self, name, values):
+        """Append a row to a sheet and index it; returns its row number."""
+        sheet = self.sheet(name)
+        index = self.index(name)
+        sheet.append(values)
+        # Set by append(); max_row would walk every cell in the sheet
+        row_num = sheet._current_row
+        column = KEY_COLUMNS.get(name, 1)
+        key = values[column - 1] if len(values) >= column else None
+        if key is not None:
+            index.setdefault(row_key(key), row_num)
+        self._widths[name] = max(self._widths[name], len(values))
+        return row_num
+
+    def invalidate(self, name=None):
+        """Drop one sheet's index (all by default) after rows moved or IDs changed."""
+        if name is None:
+            self._indexes.clear()
+            self._dead.clear()
+        else:
+            self._indexes.pop(name, None)
+            self._dead.pop(name, None)